@@ -21,6 +21,7 @@ datastore.
 """
 
 import base64
+import collections
 import time
 
 from oslo.config import cfg
@@ -89,6 +90,10 @@ LOG = logging.getLogger(__name__)
 
 QUOTAS = quota.QUOTAS
 
+# Minimum number of volumes for which _get_volumes() lists all the volumes
+# of the tenant instead of getting each of them.
+_VOLUME_LISTING_THRESHOLD = 20
+
 
 def validate_ec2_id(val):
     if not validator.validate_str()(val):
@@ -1051,12 +1056,19 @@ class CloudController(object):
         return {'instancesSet': instances_set}
 
     def _format_instance_bdm(self, context, instance_uuid, root_device_name,
-                             result):
-        """Format InstanceBlockDeviceMappingResponseItemType."""
+                             result, bdms=None, volumes=None):
+        """Format InstanceBlockDeviceMappingResponseItemType.
+
+        The block device mappings of the instance and its volumes are
+        looked up unless given, volumes being a dict keyed by volume id.
+        """
         root_device_type = 'instance-store'
         mapping = []
-        bdms = block_device_obj.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance_uuid)
+        if bdms is None:
+            bdms = block_device_obj.BlockDeviceMappingList.\
+                    get_by_instance_uuid(context, instance_uuid)
+        if volumes is None:
+            volumes = {}
         for bdm in bdms:
             volume_id = bdm.volume_id
             if volume_id is None or bdm.no_device:
@@ -1065,7 +1077,9 @@ class CloudController(object):
             if bdm.device_name == root_device_name and bdm.is_volume:
                 root_device_type = 'ebs'
 
-            vol = self.volume_api.get(context, volume_id)
+            vol = volumes.get(volume_id)
+            if vol is None:
+                vol = self.volume_api.get(context, volume_id)
             LOG.debug("vol = %s\n", vol)
             # TODO(yamahata): volume attach time
             ebs = {'volumeId': ec2utils.id_to_ec2_vol_id(volume_id),
@@ -1136,14 +1150,34 @@ class CloudController(object):
             except exception.NotFound:
                 instances = []
 
+        if not context.is_admin:
+            instances = [instance for instance in instances
+                         if not pipelib.is_vpn_image(instance['image_ref'])]
+
+        # Resolve the EC2 ids, client tokens, block device mappings and
+        # availability zones of the whole result set up front rather than with
+        # several lookups per instance. The image ids are only looked up to
+        # fill the cache glance_id_to_ec2_id() reads.
+        instance_uuids = [instance['uuid'] for instance in instances]
+        ec2_ids = ec2utils.ids_to_ec2_inst_ids(instance_uuids)
+        ec2utils.glance_ids_to_ids(context,
+            [instance[key] for instance in instances
+             for key in ('image_ref', 'kernel_id', 'ramdisk_id')])
+        client_tokens = self._get_client_tokens(context, instances)
+        bdms = collections.defaultdict(list)
+        for bdm in block_device_obj.BlockDeviceMappingList.\
+                get_by_instance_uuids(context, instance_uuids):
+            bdms[bdm.instance_uuid].append(bdm)
+        volumes = self._get_volumes(context,
+            [bdm.volume_id for instance_bdms in bdms.values()
+             for bdm in instance_bdms])
+        zones = ec2utils.get_availability_zones_by_hosts(
+            set(instance['host'] for instance in instances))
+
         for instance in instances:
-            if not context.is_admin:
-                if pipelib.is_vpn_image(instance['image_ref']):
-                    continue
             i = {}
             instance_uuid = instance['uuid']
-            ec2_id = ec2utils.id_to_ec2_inst_id(instance_uuid)
-            i['instanceId'] = ec2_id
+            i['instanceId'] = ec2_ids[instance_uuid]
             image_uuid = instance['image_ref']
             i['imageId'] = ec2utils.glance_id_to_ec2_id(context, image_uuid)
             self._format_kernel_id(context, instance, i, 'kernelId')
@@ -1174,7 +1208,7 @@ class CloudController(object):
             for k, v in utils.instance_meta(instance).iteritems():
                 i['tagSet'].append({'key': k, 'value': v})
 
-            client_token = self._get_client_token(context, instance_uuid)
+            client_token = client_tokens[instance_uuid]
             if client_token:
                 i['clientToken'] = client_token
 
@@ -1189,10 +1223,10 @@ class CloudController(object):
             i['amiLaunchIndex'] = instance['launch_index']
             self._format_instance_root_device_name(instance, i)
             self._format_instance_bdm(context, instance['uuid'],
-                                      i['rootDeviceName'], i)
-            host = instance['host']
-            zone = ec2utils.get_availability_zone_by_host(host)
-            i['placement'] = {'availabilityZone': zone}
+                                      i['rootDeviceName'], i,
+                                      bdms=bdms[instance_uuid],
+                                      volumes=volumes)
+            i['placement'] = {'availabilityZone': zones[instance['host']]}
             if instance['reservation_id'] not in reservations:
                 r = {}
                 r['reservationId'] = instance['reservation_id']
@@ -1371,6 +1405,35 @@ class CloudController(object):
                 instance_uuid, expected_attrs=['system_metadata'])
         return instance.system_metadata.get('EC2_client_token')
 
+    def _get_client_tokens(self, context, instances):
+        """Get a dict of the client token of each of the instances."""
+        client_tokens = {}
+        for instance in instances:
+            if (isinstance(instance, instance_obj.Instance) and
+                    instance.obj_attr_is_set('system_metadata')):
+                client_tokens[instance.uuid] = (
+                    instance.system_metadata.get('EC2_client_token'))
+            else:
+                client_tokens[instance['uuid']] = self._get_client_token(
+                    context, instance['uuid'])
+        return client_tokens
+
+    def _get_volumes(self, context, volume_ids):
+        """Get a dict of volumes by id for the volume ids given.
+
+        Each volume is fetched once, however many mappings refer to it.
+        From _VOLUME_LISTING_THRESHOLD volumes on they are taken from a
+        single listing instead, volumes missing from it are left to be
+        looked up individually.
+        """
+        volume_ids = set(volume_id for volume_id in volume_ids if volume_id)
+        if len(volume_ids) >= _VOLUME_LISTING_THRESHOLD:
+            return dict((vol['id'], vol)
+                        for vol in self.volume_api.get_all(context)
+                        if vol['id'] in volume_ids)
+        return dict((volume_id, self.volume_api.get(context, volume_id))
+                    for volume_id in volume_ids)
+
     def _remove_client_token(self, context, instance_ids):
         """Remove client token to reservation ID mapping."""
 
@@ -36,22 +36,60 @@ _CACHE_TIME = 7 * 24 * 60 * 60
 _CACHE = None
 
 
+def _get_cache():
+    global _CACHE
+    if not _CACHE:
+        _CACHE = memorycache.get_client()
+    return _CACHE
+
+
+def _make_cache_key(func_name, reqid):
+    return str("%s:%s" % (func_name, reqid))
+
+
 def memoize(func):
     @functools.wraps(func)
     def memoizer(context, reqid):
-        global _CACHE
-        if not _CACHE:
-            _CACHE = memorycache.get_client()
-        key = "%s:%s" % (func.__name__, reqid)
-        key = str(key)
-        value = _CACHE.get(key)
+        cache = _get_cache()
+        key = _make_cache_key(func.__name__, reqid)
+        value = cache.get(key)
         if value is None:
             value = func(context, reqid)
-            _CACHE.set(key, value, time=_CACHE_TIME)
+            cache.set(key, value, time=_CACHE_TIME)
         return value
     return memoizer
 
 
+def _memoize_many(func_name, reqids, get_missing):
+    """Bulk counterpart of memoize.
+
+    Returns a dict of the values of func_name for reqids, taken from the
+    cache where possible. The others are obtained with a single call to
+    get_missing, given the list of reqids not found, which returns them
+    as a dict.
+    """
+    cache = _get_cache()
+    values = {}
+    missing = []
+    seen = set()
+    for reqid in reqids:
+        if reqid in seen:
+            continue
+        seen.add(reqid)
+        value = cache.get(_make_cache_key(func_name, reqid))
+        if value is None:
+            missing.append(reqid)
+        else:
+            values[reqid] = value
+    if missing:
+        found = get_missing(missing)
+        for reqid, value in found.iteritems():
+            cache.set(_make_cache_key(func_name, reqid), value,
+                      time=_CACHE_TIME)
+        values.update(found)
+    return values
+
+
 def reset_cache():
     global _CACHE
     _CACHE = None
@@ -116,6 +154,20 @@ def glance_id_to_id(context, glance_id):
         return db.s3_image_create(context, glance_id)['id']
 
 
+def glance_ids_to_ids(context, glance_ids):
+    """Convert a list of glance ids to a dict of internal (db) ids."""
+    def _get_missing(glance_ids):
+        ids = dict((image['uuid'], image['id']) for image in
+                   db.s3_image_get_all_by_uuids(context, glance_ids))
+        for glance_id in glance_ids:
+            if glance_id not in ids:
+                ids[glance_id] = db.s3_image_create(context, glance_id)['id']
+        return ids
+    return _memoize_many('glance_id_to_id',
+                         [glance_id for glance_id in glance_ids if glance_id],
+                         _get_missing)
+
+
 def ec2_id_to_glance_id(context, ec2_id):
     image_id = ec2_id_to_id(ec2_id)
     return id_to_glance_id(context, image_id)
@@ -177,6 +229,11 @@ def get_availability_zone_by_host(host, conductor_api=None):
         context.get_admin_context(), host, conductor_api)
 
 
+def get_availability_zones_by_hosts(hosts):
+    return availability_zones.get_hosts_availability_zones(
+        context.get_admin_context(), hosts)
+
+
 def id_to_ec2_id(instance_id, template='i-%08x'):
     """Convert an instance ID (int) to an ec2 ID (i-[base 16 number])."""
     return template % int(instance_id)
@@ -194,6 +251,17 @@ def id_to_ec2_inst_id(instance_id):
         return id_to_ec2_id(instance_id)
 
 
+def ids_to_ec2_inst_ids(instance_uuids):
+    """Get or create the ec2 instance IDs of a list of uuids.
+
+    Returns a dict of uuid to ec2 instance ID.
+    """
+    ctxt = context.get_admin_context()
+    int_ids = get_int_ids_from_instance_uuids(ctxt, instance_uuids)
+    return dict((instance_uuid, id_to_ec2_id(int_id))
+                for instance_uuid, int_id in int_ids.iteritems())
+
+
 def ec2_inst_id_to_uuid(context, ec2_id):
     """"Convert an instance id to uuid."""
     int_id = ec2_id_to_id(ec2_id)
@@ -287,6 +355,20 @@ def get_int_id_from_instance_uuid(context, instance_uuid):
         return db.ec2_instance_create(context, instance_uuid)['id']
 
 
+def get_int_ids_from_instance_uuids(context, instance_uuids):
+    def _get_missing(instance_uuids):
+        int_ids = db.get_ec2_instance_ids_by_uuids(context, instance_uuids)
+        for instance_uuid in instance_uuids:
+            if instance_uuid not in int_ids:
+                int_ids[instance_uuid] = db.ec2_instance_create(
+                    context, instance_uuid)['id']
+        return int_ids
+    return _memoize_many('get_int_id_from_instance_uuid',
+                         [instance_uuid for instance_uuid in instance_uuids
+                          if instance_uuid],
+                         _get_missing)
+
+
 @memoize
 def get_int_id_from_volume_uuid(context, volume_uuid):
     if volume_uuid is None:
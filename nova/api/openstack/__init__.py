@@ -18,6 +18,9 @@
 WSGI middleware for OpenStack API controllers.
 """
 
+import sys
+import time
+
 from oslo.config import cfg
 import routes
 import stevedore
@@ -183,6 +186,8 @@ class APIRouter(base_wsgi.Router):
         return cls()
 
     def __init__(self, ext_mgr=None, init_only=None):
+        start = time.time()
+        modules = len(sys.modules)
         if ext_mgr is None:
             if self.ExtensionManager:
                 ext_mgr = self.ExtensionManager()
@@ -196,6 +201,15 @@ class APIRouter(base_wsgi.Router):
         self._setup_extensions(ext_mgr)
         super(APIRouter, self).__init__(mapper)
 
+        loaded = getattr(ext_mgr, 'extensions', {})
+        deferred = len([ext for ext in loaded.values()
+                        if isinstance(ext, extensions.LazyExtension)])
+        LOG.info(_("Loaded %(count)d API extensions (%(deferred)d deferred) "
+                   "in %(time).2fs, importing %(modules)d modules"),
+                 {'count': len(loaded), 'deferred': deferred,
+                  'time': time.time() - start,
+                  'modules': len(sys.modules) - modules})
+
     def _setup_ext_routes(self, mapper, ext_mgr, init_only):
         for resource in ext_mgr.get_resources():
             LOG.debug('Extending resource: %s',
@@ -295,6 +309,8 @@ class APIRouterV3(base_wsgi.Router):
             LOG.info("V3 API has been disabled by configuration")
             return
 
+        start = time.time()
+        modules = len(sys.modules)
         self.init_only = init_only
         LOG.debug("v3 API Extension Blacklist: %s",
                   CONF.osapi_v3.extensions_blacklist)
@@ -334,6 +350,12 @@ class APIRouterV3(base_wsgi.Router):
             raise exception.CoreAPIMissing(
                 missing_apis=missing_core_extensions)
 
+        LOG.info(_("Loaded %(count)d v3 API extensions in %(time).2fs, "
+                   "importing %(modules)d modules"),
+                 {'count': len(self.loaded_extension_info.get_extensions()),
+                  'time': time.time() - start,
+                  'modules': len(sys.modules) - modules})
+
         super(APIRouterV3, self).__init__(mapper)
 
     @staticmethod
@@ -29,6 +29,7 @@ from nova.compute import task_states
 from nova.compute import utils as compute_utils
 from nova.compute import vm_states
 from nova import exception
+from nova.objects import block_device as block_device_obj
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import log as logging
 from nova import quota
@@ -593,6 +594,24 @@ def get_instance(compute_api, context, instance_id, want_objects=False,
         raise exc.HTTPNotFound(explanation=e.format_message())
 
 
+def prefetch_block_device_mappings(req):
+    """Cache the block device mappings of all the instances cached in the
+    request, fetched with a single query, for the API extensions.
+    """
+    try:
+        instances = req.get_db_instances()
+    except KeyError:
+        return
+    if not instances:
+        return
+    context = req.environ['nova.context']
+    bdms = dict((instance_uuid, []) for instance_uuid in instances)
+    for bdm in block_device_obj.BlockDeviceMappingList.get_by_instance_uuids(
+            context, list(instances)):
+        bdms[bdm.instance_uuid].append(bdm)
+    req.cache_prefetched_items('block_device_mappings', bdms)
+
+
 def check_cells_enabled(function):
     @functools.wraps(function)
     def inner(*args, **kwargs):
@@ -30,6 +30,14 @@ ext_opts = [
                 help='Specify list of extensions to load when using osapi_'
                      'compute_extension option with nova.api.openstack.'
                      'compute.contrib.select_extensions'),
+    cfg.StrOpt('osapi_compute_extension_manifest',
+               help='Path of a manifest caching what the standard '
+                    'extensions add to the API.  When set, an extension '
+                    'described by an up to date manifest entry is only '
+                    'imported when a request first reaches one of the '
+                    'resources it adds or extends.  The manifest is '
+                    'written when missing or out of date, so the path '
+                    'must be writable by the API service'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(ext_opts)
@@ -38,9 +46,12 @@ LOG = logging.getLogger(__name__)
 
 
 def standard_extensions(ext_mgr):
-    extensions.load_standard_extensions(ext_mgr, LOG, __path__, __package__)
+    extensions.load_standard_extensions(
+        ext_mgr, LOG, __path__, __package__,
+        manifest_path=CONF.osapi_compute_extension_manifest)
 
 
 def select_extensions(ext_mgr):
-    extensions.load_standard_extensions(ext_mgr, LOG, __path__, __package__,
-                                        CONF.osapi_compute_ext_list)
+    extensions.load_standard_extensions(
+        ext_mgr, LOG, __path__, __package__, CONF.osapi_compute_ext_list,
+        manifest_path=CONF.osapi_compute_extension_manifest)
@@ -45,9 +45,10 @@ class ExtendedVolumesController(wsgi.Controller):
         self.compute_api = compute.API()
         self.volume_api = volume.API()
 
-    def _extend_server(self, context, server, instance):
-        bdms = block_device_obj.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance['uuid'])
+    def _extend_server(self, context, server, instance, bdms=None):
+        if bdms is None:
+            bdms = (block_device_obj.BlockDeviceMappingList.
+                    get_by_instance_uuid(context, instance['uuid']))
         volume_ids = [bdm['volume_id'] for bdm in bdms if bdm['volume_id']]
         key = "%s:volumes_attached" % ExtendedVolumes.alias
         server[key] = [{'id': volume_id} for volume_id in volume_ids]
@@ -111,7 +112,7 @@ class ExtendedVolumesController(wsgi.Controller):
             # the core API adding it in its 'show' method.
             self._extend_server(context, server, db_instance)
 
-    @wsgi.extends
+    @wsgi.extends(prefetch=['block_device_mappings'])
     def detail(self, req, resp_obj):
         context = req.environ['nova.context']
         if authorize(context):
@@ -120,7 +121,9 @@ class ExtendedVolumesController(wsgi.Controller):
                 db_instance = req.get_db_instance(server['id'])
                 # server['id'] is guaranteed to be in the cache due to
                 # the core API adding it in its 'detail' method.
-                self._extend_server(context, server, db_instance)
+                bdms = req.get_prefetched_items('block_device_mappings',
+                                                server['id'])
+                self._extend_server(context, server, db_instance, bdms)
 
     @extensions.expected_errors((400, 404, 409))
     @wsgi.response(202)
@@ -522,6 +522,10 @@ class Controller(wsgi.Controller):
             raise exc.HTTPBadRequest(explanation=err.format_message())
         return servers
 
+    @wsgi.prefetcher('block_device_mappings')
+    def _prefetch_block_device_mappings(self, req):
+        common.prefetch_block_device_mappings(req)
+
     def _get_servers(self, req, is_detail):
         """Returns a list of servers, based on any search options specified."""
 
@@ -15,6 +15,7 @@
 #    under the License.
 
 import abc
+import errno
 import functools
 import os
 
@@ -28,6 +29,7 @@ from nova.api.openstack import xmlutil
 from nova import exception
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 import nova.policy
 
@@ -280,6 +282,183 @@ class ExtensionManager(object):
                          {'ext_factory': ext_factory, 'exc': exc})
 
 
+class _ExtensionRecorder(object):
+    """Extension manager stand-in capturing the extensions registered by
+    an extension factory, for the real manager to decide what to do with
+    them.
+    """
+
+    def __init__(self, ext_mgr):
+        self.ext_mgr = ext_mgr
+        self.extensions = []
+
+    def register(self, ext):
+        self.extensions.append(ext)
+
+    def __getattr__(self, name):
+        return getattr(self.ext_mgr, name)
+
+
+class LazyExtension(object):
+    """Extension described by a manifest entry.
+
+    Stands in for the extension descriptor registered by an extension
+    factory.  The factory is only imported and called when a request
+    reaches one of the resources the extension adds or extends.
+    """
+
+    def __init__(self, ext_mgr, factory, index, entry):
+        """Initialize the extension.
+
+        :param ext_mgr: The extension manager.
+        :param factory: The name of the extension factory.
+        :param index: The position of the extension among the extensions
+                      registered by the factory.
+        :param entry: The manifest entry of the extension, as returned
+                      by describe_extension().
+        """
+
+        self.ext_mgr = ext_mgr
+        self.factory = factory
+        self.index = index
+        self.name = entry['name']
+        self.alias = entry['alias']
+        self.namespace = entry['namespace']
+        self.updated = entry['updated']
+        self.__doc__ = entry['description']
+        self._resources = entry['resources']
+        self._controller_collections = entry['controller_extensions']
+        self._extension = None
+
+    def load(self):
+        """Import and return the actual extension descriptor."""
+
+        if self._extension is None:
+            LOG.debug("Loading deferred extension %s", self.alias)
+            recorder = _ExtensionRecorder(self.ext_mgr)
+            importutils.import_class(self.factory)(recorder)
+            self._extension = recorder.extensions[self.index]
+        return self._extension
+
+    def _get_resource_controller(self, index):
+        return self.load().get_resources()[index].controller
+
+    def _get_controller_extension(self, index):
+        return self.load().get_controller_extensions()[index].controller
+
+    def get_resources(self):
+        resources = []
+        for index, resource in enumerate(self._resources):
+            controller = wsgi.LazyController(
+                functools.partial(self._get_resource_controller, index))
+            resources.append(ResourceExtension(
+                resource['collection'], controller=controller,
+                parent=resource['parent'],
+                collection_actions=resource['collection_actions'],
+                member_actions=resource['member_actions'],
+                inherits=resource['inherits'],
+                member_name=resource['member_name']))
+        return resources
+
+    def get_controller_extensions(self):
+        controller_exts = []
+        for index, collection in enumerate(self._controller_collections):
+            controller = wsgi.LazyController(
+                functools.partial(self._get_controller_extension, index))
+            controller_exts.append(
+                ControllerExtension(self, collection, controller))
+        return controller_exts
+
+
+def describe_extension(ext):
+    """Return the manifest entry of an extension descriptor.
+
+    Returns None if the extension cannot be deferred, because it adds
+    routes of its own.
+    """
+
+    resources = []
+    for resource in getattr(ext, 'get_resources', lambda: [])():
+        if resource.custom_routes_fn or resource.controller is None:
+            return None
+        resources.append({'collection': resource.collection,
+                          'parent': resource.parent,
+                          'collection_actions': resource.collection_actions,
+                          'member_actions': resource.member_actions,
+                          'inherits': resource.inherits,
+                          'member_name': resource.member_name})
+    controller_exts = getattr(ext, 'get_controller_extensions', lambda: [])()
+    return {'name': ext.name,
+            'alias': ext.alias,
+            'namespace': ext.namespace,
+            'updated': ext.updated,
+            'description': ext.__doc__,
+            'resources': resources,
+            'controller_extensions': [controller_ext.collection
+                                      for controller_ext in controller_exts]}
+
+
+def _load_manifest(manifest_path):
+    try:
+        with open(manifest_path) as f:
+            return jsonutils.load(f)
+    except IOError as e:
+        if e.errno != errno.ENOENT:
+            LOG.warn(_('Unable to read extension manifest %(path)s: '
+                       '%(error)s'), {'path': manifest_path, 'error': e})
+    except ValueError as e:
+        LOG.warn(_('Ignoring corrupt extension manifest %(path)s: '
+                   '%(error)s'), {'path': manifest_path, 'error': e})
+    return {}
+
+
+def _save_manifest(manifest_path, manifest):
+    # API workers may all regenerate the manifest as they start, so write each
+    # copy aside and rename it into place.
+    tmp_path = '%s.%d' % (manifest_path, os.getpid())
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(jsonutils.dumps(manifest))
+        os.rename(tmp_path, manifest_path)
+    except (IOError, OSError) as e:
+        LOG.warn(_('Unable to write extension manifest %(path)s: '
+                   '%(error)s'), {'path': manifest_path, 'error': e})
+
+
+def _load_extension_from_manifest(ext_mgr, classpath, filepath, manifest):
+    """Register the extensions of a factory, deferring them if possible.
+
+    Extensions with an up to date manifest entry are registered as
+    LazyExtension without importing the factory.  Otherwise the factory
+    is imported and called, and the manifest entry refreshed.
+
+    :returns: True if the manifest was changed.
+    """
+
+    stat = os.stat(filepath)
+    fingerprint = [int(stat.st_mtime), stat.st_size]
+    entry = manifest.get(classpath)
+    if (entry is not None and entry.get('fingerprint') == fingerprint and
+            entry.get('extensions') is not None):
+        for index, ext_entry in enumerate(entry['extensions']):
+            ext_mgr.register(LazyExtension(ext_mgr, classpath, index,
+                                           ext_entry))
+        return False
+
+    recorder = _ExtensionRecorder(ext_mgr)
+    importutils.import_class(classpath)(recorder)
+    for ext in recorder.extensions:
+        ext_mgr.register(ext)
+    ext_entries = [describe_extension(ext) for ext in recorder.extensions]
+    if None in ext_entries:
+        ext_entries = None
+    new_entry = {'fingerprint': fingerprint, 'extensions': ext_entries}
+    if entry == new_entry:
+        return False
+    manifest[classpath] = new_entry
+    return True
+
+
 class ControllerExtension(object):
     """Extend core controllers of nova OpenStack API.
 
@@ -313,8 +492,19 @@ class ResourceExtension(object):
         self.member_name = member_name
 
 
-def load_standard_extensions(ext_mgr, logger, path, package, ext_list=None):
-    """Registers all standard API extensions."""
+def load_standard_extensions(ext_mgr, logger, path, package, ext_list=None,
+                             manifest_path=None):
+    """Registers all standard API extensions.
+
+    If manifest_path is given, the extensions described by an up to date
+    entry of the manifest stored there are registered without importing
+    them, see LazyExtension.  The manifest is updated for the others.
+    """
+
+    manifest = None
+    manifest_changed = False
+    if manifest_path:
+        manifest = _load_manifest(manifest_path)
 
     # Walk through all the modules in our directory...
     our_dir = path[0]
@@ -344,7 +534,12 @@ def load_standard_extensions(ext_mgr, logger, path, package, ext_list=None):
                 continue
 
             try:
-                ext_mgr.load_extension(classpath)
+                if manifest is None:
+                    ext_mgr.load_extension(classpath)
+                elif _load_extension_from_manifest(
+                        ext_mgr, classpath, os.path.join(dirpath, fname),
+                        manifest):
+                    manifest_changed = True
             except Exception as exc:
                 logger.warn(_('Failed to load extension %(classpath)s: '
                               '%(exc)s'),
@@ -376,6 +571,9 @@ def load_standard_extensions(ext_mgr, logger, path, package, ext_list=None):
         # Update the list of directories we'll explore...
         dirnames[:] = subdirs
 
+    if manifest_changed:
+        _save_manifest(manifest_path, manifest)
+
 
 def core_authorizer(api_name, extension_name):
     def authorize(context, target=None, action=None):
@@ -75,7 +75,7 @@ class Request(webob.Request):
 
     def __init__(self, *args, **kwargs):
         super(Request, self).__init__(*args, **kwargs)
-        self._extension_data = {'db_items': {}}
+        self._extension_data = {'db_items': {}, 'prefetched': {}}
 
     def cache_db_items(self, key, items, item_key='id'):
         """Allow API methods to store objects from a DB query to be
@@ -105,6 +105,27 @@ class Request(webob.Request):
         """
         return self.get_db_items(key).get(item_key)
 
+    def cache_prefetched_items(self, relation, items_by_key):
+        """Store data related to the items of a response, fetched once for
+        the whole response on behalf of the API extensions.
+
+        :param relation: The name of the relation, as declared by the
+                         extensions with @extends(prefetch=...).
+        :param items_by_key: A dict mapping the key of every item in the
+                             response to its related data.
+        """
+        self._extension_data['prefetched'][relation] = items_by_key
+
+    def get_prefetched_items(self, relation, item_key):
+        """Allow an API extension to get the data prefetched for an item.
+
+        Returns None if the relation was not prefetched for the item, in
+        which case the extension has to look it up itself.
+        """
+        items_by_key = self._extension_data['prefetched'].get(relation)
+        if items_by_key is not None:
+            return items_by_key.get(item_key)
+
     def cache_db_instances(self, instances):
         self.cache_db_items('instances', instances, 'uuid')
 
@@ -747,6 +768,10 @@ class Resource(wsgi.Application):
                                 json=action_peek_json)
         self.action_peek.update(action_peek or {})
 
+        # Controllers registered before one of them could be loaded,
+        # in registration order; see LazyController
+        self._pending = []
+
         # Copy over the actions dictionary
         self.wsgi_actions = {}
         if controller:
@@ -757,9 +782,38 @@ class Resource(wsgi.Application):
         self.wsgi_action_extensions = {}
         self.inherits = inherits
 
+    def _defer(self, method, controller):
+        """Queue the registration of a controller that is not loaded yet.
+
+        Once one controller is queued, the registrations following it are
+        queued as well, so that they are all applied in order.
+        """
+
+        if not self._pending and not isinstance(controller, LazyController):
+            return False
+        self._pending.append((method, controller))
+        return True
+
+    def _load_pending(self):
+        """Load the lazy controllers and apply the queued registrations."""
+
+        # The queue is emptied first, so that the registrations applied
+        # here are not queued again.
+        pending, self._pending = self._pending, []
+        for method, controller in pending:
+            if isinstance(controller, LazyController):
+                lazy = controller
+                controller = lazy.load()
+                if self.controller is lazy:
+                    self.controller = controller
+            method(controller)
+
     def register_actions(self, controller):
         """Registers controller actions with this resource."""
 
+        if self._defer(self.register_actions, controller):
+            return
+
         actions = getattr(controller, 'wsgi_actions', {})
         for key, method_name in actions.items():
             self.wsgi_actions[key] = getattr(controller, method_name)
@@ -767,6 +821,9 @@ class Resource(wsgi.Application):
     def register_extensions(self, controller):
         """Registers controller extensions with this resource."""
 
+        if self._defer(self.register_extensions, controller):
+            return
+
         extensions = getattr(controller, 'wsgi_extensions', [])
         for method_name, action_name in extensions:
             # Look up the extending method
@@ -864,6 +921,30 @@ class Resource(wsgi.Application):
         # Run post-processing in the reverse order
         return None, reversed(post)
 
+    def prefetch(self, extensions, request):
+        """Fetch the related data declared by the extensions.
+
+        Each relation that some extension declared with
+        @extends(prefetch=...) and the controller has a @prefetcher for is
+        fetched once, for all the items of the response, before the
+        extensions run.
+        """
+        prefetchers = getattr(self.controller, 'wsgi_prefetchers', {})
+        relations = set()
+        for ext in extensions:
+            relations.update(getattr(ext, 'wsgi_prefetch', ()))
+
+        for relation in sorted(relations):
+            if relation not in prefetchers:
+                continue
+            try:
+                with ResourceExceptionHandler():
+                    getattr(self.controller, prefetchers[relation])(request)
+            except Fault as ex:
+                return ex
+
+        return None
+
     def post_process_extensions(self, extensions, resp_obj, request,
                                 action_args):
         for ext in extensions:
@@ -901,6 +982,8 @@ class Resource(wsgi.Application):
     def __call__(self, request):
         """WSGI method that controls (de)serialization and method dispatch."""
 
+        self._load_pending()
+
         # Identify the action, its arguments, and the requested
         # content type
         action_args = self.get_action_args(request.environ)
@@ -1004,6 +1087,10 @@ class Resource(wsgi.Application):
                     resp_obj._default_code = meth.wsgi_code
                 resp_obj.preserialize(accept, self.default_serializers)
 
+                # Fetch what the extensions need for the whole response
+                response = self.prefetch(extensions, request)
+
+            if resp_obj and not response:
                 # Process post-processing extensions
                 response = self.post_process_extensions(post, resp_obj,
                                                         request, action_args)
@@ -1021,6 +1108,7 @@ class Resource(wsgi.Application):
         return response
 
     def get_method(self, request, action, content_type, body):
+        self._load_pending()
         meth, extensions = self._get_method(request,
                                             action,
                                             content_type,
@@ -1096,11 +1184,19 @@ def extends(*args, **kwargs):
         @extends(action='resize')
         def _action_resize(...):
             pass
+
+    An extension that needs data related to each of the items listed in
+    the response can name the relations it needs with the prefetch
+    keyword, e.g. @extends(prefetch=['block_device_mappings']).  If the
+    extended controller has a prefetcher for a relation, it is called
+    once for the whole response before the extensions run, and the data
+    can be read with Request.get_prefetched_items().
     """
 
     def decorator(func):
         # Store enough information to find what we're extending
         func.wsgi_extends = (func.__name__, kwargs.get('action'))
+        func.wsgi_prefetch = tuple(kwargs.get('prefetch', ()))
         return func
 
     # If we have positional arguments, call the decorator
@@ -1111,6 +1207,21 @@ def extends(*args, **kwargs):
     return decorator
 
 
+def prefetcher(relation):
+    """Mark a controller method as the prefetcher of a relation.
+
+    The method is called with the request after the controller method has
+    run, when one of the extensions of the request declared it needs the
+    relation, and is expected to store the related data of all the items
+    in the response with Request.cache_prefetched_items().
+    """
+
+    def decorator(func):
+        func.wsgi_prefetcher = relation
+        return func
+    return decorator
+
+
 class ControllerMetaclass(type):
     """Controller metaclass.
 
@@ -1124,9 +1235,11 @@ class ControllerMetaclass(type):
         # Find all actions
         actions = {}
         extensions = []
-        # start with wsgi actions from base classes
+        prefetchers = {}
+        # start with wsgi actions and prefetchers from base classes
         for base in bases:
             actions.update(getattr(base, 'wsgi_actions', {}))
+            prefetchers.update(getattr(base, 'wsgi_prefetchers', {}))
         for key, value in cls_dict.items():
             if not callable(value):
                 continue
@@ -1134,10 +1247,13 @@ class ControllerMetaclass(type):
                 actions[value.wsgi_action] = key
             elif getattr(value, 'wsgi_extends', None):
                 extensions.append(value.wsgi_extends)
+            elif getattr(value, 'wsgi_prefetcher', None):
+                prefetchers[value.wsgi_prefetcher] = key
 
-        # Add the actions and extensions to the class dict
+        # Add the actions, extensions and prefetchers to the class dict
         cls_dict['wsgi_actions'] = actions
         cls_dict['wsgi_extensions'] = extensions
+        cls_dict['wsgi_prefetchers'] = prefetchers
 
         return super(ControllerMetaclass, mcs).__new__(mcs, name, bases,
                                                        cls_dict)
@@ -1176,6 +1292,30 @@ class Controller(object):
         return True
 
 
+class LazyController(object):
+    """Placeholder for a controller that is only loaded when needed.
+
+    A Resource given a LazyController, as its controller or through
+    register_actions() or register_extensions(), calls load() and
+    registers the controller it returns when it handles its first
+    request.
+    """
+
+    def __init__(self, loader):
+        """Initialize the placeholder.
+
+        :param loader: A callable returning the controller.
+        """
+
+        self.loader = loader
+        self._controller = None
+
+    def load(self):
+        if self._controller is None:
+            self._controller = self.loader()
+        return self._controller
+
+
 class Fault(webob.exc.HTTPException):
     """Wrap webob.exc.HTTPException to provide API friendly response."""
 
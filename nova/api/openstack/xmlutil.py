@@ -148,6 +148,16 @@ class ConstantSelector(object):
         return self.value
 
 
+# Bumped whenever children are added to or removed from any template
+# element, invalidating the render plans compiled from the old structure.
+_template_generation = 0
+
+
+def _template_changed():
+    global _template_generation
+    _template_generation += 1
+
+
 class TemplateElement(object):
     """Represent an element in the template."""
 
@@ -192,6 +202,7 @@ class TemplateElement(object):
         self._text = None
         self._children = []
         self._childmap = {}
+        self._plans = {}
         self.colon_ns = colon_ns
 
         # Run the incoming attributes through set() so that they
@@ -240,6 +251,7 @@ class TemplateElement(object):
 
         self._children.append(elem)
         self._childmap[elem.tag] = elem
+        _template_changed()
 
     def extend(self, elems):
         """Append children to the element."""
@@ -261,6 +273,7 @@ class TemplateElement(object):
         # Update the children
         self._children.extend(elemlist)
         self._childmap.update(elemmap)
+        _template_changed()
 
     def insert(self, idx, elem):
         """Insert a child element at the given index."""
@@ -274,6 +287,7 @@ class TemplateElement(object):
 
         self._children.insert(idx, elem)
         self._childmap[elem.tag] = elem
+        _template_changed()
 
     def remove(self, elem):
         """Remove a child element."""
@@ -287,6 +301,7 @@ class TemplateElement(object):
 
         self._children.remove(elem)
         del self._childmap[elem.tag]
+        _template_changed()
 
     def get(self, key):
         """Get an attribute.
@@ -519,6 +534,77 @@ class TemplateElement(object):
                 (' '.join(contents), ''.join(children), self.tag))
 
 
+class _RenderPlan(object):
+    """Compiled rendering of a list of sibling template elements.
+
+    The first sibling is the element rendered, the others are applied to
+    it as patches.  The siblings of each child element are merged from
+    the children of all the siblings the first time the plan renders, and
+    reused for every datum and every later rendering.
+    """
+
+    def __init__(self, siblings):
+        self.element = siblings[0]
+        self.patches = siblings[1:]
+        self._siblings = siblings
+        self._children = None
+
+    def _compile_children(self):
+        children = []
+        seen = set()
+        for idx, sibling in enumerate(self._siblings):
+            for child in sibling:
+                # Have we handled this child already?
+                if child.tag in seen:
+                    continue
+                seen.add(child.tag)
+
+                # Determine the child's siblings
+                nieces = [child]
+                for sib in self._siblings[idx + 1:]:
+                    if child.tag in sib:
+                        nieces.append(sib[child.tag])
+                children.append(_RenderPlan(nieces))
+        return children
+
+    def render(self, parent, obj, nsmap=None):
+        """Render obj under parent.
+
+        Returns the first etree.Element instance rendered, or None.
+        """
+
+        elems = self.element.render(parent, obj, self.patches, nsmap)
+        if not elems:
+            return None
+
+        children = self._children
+        if children is None:
+            children = self._children = self._compile_children()
+
+        # Now we recurse for every data element
+        for child in children:
+            for elem, datum in elems:
+                child.render(elem, datum)
+
+        return elems[0][0]
+
+
+def _get_render_plan(siblings):
+    """Return the render plan of a list of sibling template elements.
+
+    Plans are cached on the first sibling, keyed by the others, and
+    recompiled if any template element has gained or lost children since.
+    """
+
+    root = siblings[0]
+    key = tuple(siblings[1:])
+    generation, plan = root._plans.get(key, (None, None))
+    if generation != _template_generation:
+        plan = _RenderPlan(list(siblings))
+        root._plans[key] = (_template_generation, plan)
+    return plan
+
+
 def SubTemplateElement(parent, tag, attrib=None, selector=None,
                        subselector=None, colon_ns=False, **extra):
     """Create a template element as a child of another.
@@ -575,32 +661,7 @@ class Template(object):
                       rendered.
         """
 
-        # First step, render the element
-        elems = siblings[0].render(parent, obj, siblings[1:], nsmap)
-
-        # Now, recurse to all child elements
-        seen = set()
-        for idx, sibling in enumerate(siblings):
-            for child in sibling:
-                # Have we handled this child already?
-                if child.tag in seen:
-                    continue
-                seen.add(child.tag)
-
-                # Determine the child's siblings
-                nieces = [child]
-                for sib in siblings[idx + 1:]:
-                    if child.tag in sib:
-                        nieces.append(sib[child.tag])
-
-                # Now we recurse for every data element
-                for elem, datum in elems:
-                    self._serialize(elem, datum, nieces)
-
-        # Return the first element; at the top level, this will be the
-        # root element
-        if elems:
-            return elems[0][0]
+        return _get_render_plan(siblings).render(parent, obj, nsmap)
 
     def serialize(self, obj, *args, **kwargs):
         """Serialize an object.
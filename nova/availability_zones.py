@@ -94,6 +94,22 @@ def get_host_availability_zone(context, host, conductor_api=None):
     return az
 
 
+def get_hosts_availability_zones(context, hosts):
+    """Return a dict of the availability zone of each host in hosts.
+
+    The aggregate metadata of all the hosts is looked up at once.
+    """
+    metadata = db.aggregate_host_get_by_metadata_key(context,
+            key='availability_zone')
+    azs = {}
+    for host in hosts:
+        if metadata.get(host):
+            azs[host] = list(metadata[host])[0]
+        else:
+            azs[host] = CONF.default_availability_zone
+    return azs
+
+
 def update_host_availability_zone_cache(context, host, availability_zone=None):
     if not availability_zone:
         availability_zone = get_host_availability_zone(context, host)
@@ -72,7 +72,7 @@ class CellsManager(manager.Manager):
     Scheduling requests get passed to the scheduler class.
     """
 
-    target = oslo_messaging.Target(version='1.27')
+    target = oslo_messaging.Target(version='1.28')
 
     def __init__(self, *args, **kwargs):
         LOG.warn(_('The cells feature of Nova is considered experimental '
@@ -248,6 +248,14 @@ class CellsManager(manager.Manager):
         """Update bandwidth usage at top level cell."""
         self.msg_runner.bw_usage_update_at_top(ctxt, bw_update_info)
 
+    def bw_usage_update_bulk_at_top(self, ctxt, start_period, usages,
+                                    last_refreshed):
+        """Update the bandwidth usage of several networks at top level
+        cell.
+        """
+        self.msg_runner.bw_usage_update_bulk_at_top(ctxt, start_period,
+                                                    usages, last_refreshed)
+
     def sync_instances(self, ctxt, project_id, updated_since, deleted):
         """Force a sync of all instances, potentially by project_id,
         and potentially since a certain date/time.
@@ -1110,6 +1110,17 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
             return
         self.db.bw_usage_update(message.ctxt, **bw_update_info)
 
+    def bw_usage_update_bulk_at_top(self, message, start_period, usages,
+                                    last_refreshed, **kwargs):
+        """Update the Bandwidth usage of several networks in the DB if
+        we're a top level cell.
+        """
+        if not self._at_the_top():
+            return
+        self.db.bw_usage_update_bulk(message.ctxt, start_period, usages,
+                                     last_refreshed=last_refreshed,
+                                     update_cells=False)
+
     def _sync_instance(self, ctxt, instance):
         if instance['deleted']:
             self.msg_runner.instance_destroy_at_top(ctxt, instance)
@@ -1478,6 +1489,18 @@ class MessageRunner(object):
                                     'up', run_locally=False)
         message.process()
 
+    def bw_usage_update_bulk_at_top(self, ctxt, start_period, usages,
+                                    last_refreshed):
+        """Update the bandwidth usage of several networks at top level
+        cell.
+        """
+        message = _BroadcastMessage(self, ctxt, 'bw_usage_update_bulk_at_top',
+                                    dict(start_period=start_period,
+                                         usages=usages,
+                                         last_refreshed=last_refreshed),
+                                    'up', run_locally=False)
+        message.process()
+
     def sync_instances(self, ctxt, project_id, updated_since, deleted):
         """Force a sync of all instances, potentially by project_id,
         and potentially since a certain date/time.
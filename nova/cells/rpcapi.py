@@ -94,6 +94,8 @@ class CellsAPI(object):
         ... Icehouse supports message version 1.27.  So, any changes to
         existing methods in 1.x after that point should be done such that they
         can handle the version_cap being set to 1.27.
+
+        1.28 - Adds bw_usage_update_bulk_at_top()
     '''
 
     VERSION_ALIASES = {
@@ -207,6 +209,25 @@ class CellsAPI(object):
         self.client.cast(ctxt, 'bw_usage_update_at_top',
                          bw_update_info=bw_update_info)
 
+    def bw_usage_update_bulk_at_top(self, ctxt, start_period, usages,
+                                    last_refreshed=None):
+        """Broadcast upwards that the bw_usage of several networks was
+        updated.
+        """
+        if not CONF.cells.enable:
+            return
+        if not self.client.can_send_version('1.28'):
+            for usage in usages:
+                self.bw_usage_update_at_top(ctxt, usage['uuid'],
+                        usage['mac'], start_period, usage['bw_in'],
+                        usage['bw_out'], usage['last_ctr_in'],
+                        usage['last_ctr_out'], last_refreshed)
+            return
+        cctxt = self.client.prepare(version='1.28')
+        cctxt.cast(ctxt, 'bw_usage_update_bulk_at_top',
+                   start_period=start_period, usages=usages,
+                   last_refreshed=last_refreshed)
+
     def instance_info_cache_update_at_top(self, ctxt, instance_info_cache):
         """Broadcast up that an instance's info_cache has changed."""
         if not CONF.cells.enable:
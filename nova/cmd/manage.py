@@ -55,8 +55,10 @@
 from __future__ import print_function
 
 import argparse
+import errno
 import os
 import sys
+import time
 
 import netaddr
 from oslo.config import cfg
@@ -75,7 +77,9 @@ from nova.openstack.common import cliutils
 from nova.openstack.common.db import exception as db_exc
 from nova.openstack.common.gettextutils import _
 from nova.openstack.common import importutils
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
+from nova import paths
 from nova import quota
 from nova import rpc
 from nova import servicegroup
@@ -92,6 +96,7 @@ CONF.import_opt('network_size', 'nova.network.manager')
 CONF.import_opt('vlan_start', 'nova.network.manager')
 CONF.import_opt('vpn_start', 'nova.network.manager')
 CONF.import_opt('default_floating_pool', 'nova.network.floating_ips')
+CONF.import_opt('compact_flavor_info', 'nova.compute.flavors')
 CONF.import_opt('public_interface', 'nova.network.linux_net')
 
 QUOTAS = quota.QUOTAS
@@ -907,8 +912,20 @@ class DbCommands(object):
         print(migration.db_version())
 
     @args('--max_rows', metavar='<number>',
-            help='Maximum number of deleted rows to archive')
-    def archive_deleted_rows(self, max_rows):
+            help='Maximum number of deleted rows to archive, per batch '
+                 'with --background')
+    @args('--background', action='store_true', default=False,
+            help='Keep archiving throttled batches of max_rows rows until '
+                 'no deleted rows are left, reporting progress')
+    @args('--sleep', metavar='<seconds>',
+            help='Time to wait between two batches with --background '
+                 '(default: 1)')
+    @args('--state_file', metavar='<path>',
+            help='File recording how far each table has been archived, so '
+                 'that an interrupted --background run resumes where it '
+                 'stopped (default: $state_path/archive_deleted_rows.json)')
+    def archive_deleted_rows(self, max_rows, background=False, sleep=None,
+                             state_file=None):
         """Move up to max_rows deleted rows from production tables to shadow
         tables.
         """
@@ -918,7 +935,81 @@ class DbCommands(object):
                 print(_("Must supply a positive value for max_rows"))
                 return(1)
         admin_context = context.get_admin_context()
-        db.archive_deleted_rows(admin_context, max_rows)
+        if not background:
+            db.archive_deleted_rows(admin_context, max_rows)
+            return
+
+        if max_rows is None:
+            max_rows = 1000
+        sleep = 1.0 if sleep is None else float(sleep)
+        if state_file is None:
+            state_file = paths.state_path_rel('archive_deleted_rows.json')
+        markers = self._load_archive_markers(state_file)
+        total = 0
+        start = time.time()
+        while True:
+            rows = db.archive_deleted_rows(admin_context, max_rows,
+                                           markers=markers)
+            self._save_archive_markers(state_file, markers)
+            total += rows
+            elapsed = time.time() - start
+            print(_("Archived %(rows)d rows (%(total)d in total, "
+                    "%(rate).1f rows/s)") %
+                  {'rows': rows, 'total': total,
+                   'rate': total / elapsed if elapsed else 0.0})
+            if not rows and not markers:
+                break
+            time.sleep(sleep)
+
+    @staticmethod
+    def _load_archive_markers(state_file):
+        try:
+            with open(state_file) as f:
+                return jsonutils.load(f)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return {}
+
+    @staticmethod
+    def _save_archive_markers(state_file, markers):
+        tmp_file = state_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write(jsonutils.dumps(markers))
+        os.rename(tmp_file, state_file)
+
+    @args('--max_count', metavar='<number>',
+            help='Maximum number of instances to convert')
+    def migrate_flavor_info(self, max_count=None):
+        """Convert the flavor information of existing instances to the
+        compact system_metadata form.
+        """
+        if not CONF.compact_flavor_info:
+            print(_("compact_flavor_info must be enabled before converting "
+                    "instances"))
+            return(1)
+        if max_count is not None:
+            max_count = int(max_count)
+        admin_context = context.get_admin_context()
+        marker = None
+        converted = 0
+        while max_count is None or converted < max_count:
+            instances = db.instance_get_all_by_filters(
+                admin_context, {}, sort_key='created_at', sort_dir='asc',
+                limit=50, marker=marker, columns_to_join=['system_metadata'])
+            if not instances:
+                break
+            for instance in instances:
+                sys_meta = utils.instance_sys_meta(instance)
+                if flavors.compact_flavor_info(sys_meta):
+                    db.instance_system_metadata_update(
+                        admin_context, instance['uuid'], sys_meta, True)
+                    converted += 1
+                    if max_count is not None and converted >= max_count:
+                        break
+            marker = instances[-1]['uuid']
+        print(_("Converted the flavor information of %d instances") %
+              converted)
 
 
 class FlavorCommands(object):
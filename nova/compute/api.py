@@ -111,6 +111,13 @@ compute_opts = [
                     'behavior of every instance having the same name, set '
                     'this option to "%(name)s".  Valid keys for the '
                     'template are: name, uuid, count.'),
+    cfg.IntOpt('bulk_create_min_instances',
+               default=10,
+               help='Requests creating at least this many instances have '
+                    'them written to the database, along with their block '
+                    'device mappings and create actions, in a single '
+                    'transaction. Set to 0 to always create instances one '
+                    'by one'),
      cfg.IntOpt('max_local_block_devices',
                 default=3,
                 help='Maximum number of devices that will result '
@@ -561,6 +568,11 @@ class API(base.Base):
         }
 
     def _apply_instance_name_template(self, context, instance, index):
+        self._set_instance_name_from_template(instance, index)
+        instance.save()
+        return instance
+
+    def _set_instance_name_from_template(self, instance, index):
         params = {
             'uuid': instance['uuid'],
             'name': instance['display_name'],
@@ -576,8 +588,6 @@ class API(base.Base):
         instance.display_name = new_name
         if not instance.get('hostname', None):
             instance.hostname = utils.sanitize_hostname(new_name)
-        instance.save()
-        return instance
 
     def _check_config_drive(self, config_drive):
         if config_drive:
@@ -820,15 +830,25 @@ class API(base.Base):
         LOG.debug("Going to run %s instances..." % num_instances)
         instances = []
         try:
-            for i in xrange(num_instances):
-                instance = instance_obj.Instance()
-                instance.update(base_options)
-                instance = self.create_db_entry_for_new_instance(
-                        context, instance_type, boot_meta, instance,
+            if (CONF.bulk_create_min_instances > 0 and
+                    num_instances >= CONF.bulk_create_min_instances):
+                instances = self._create_db_entries_for_new_instances(
+                        context, instance_type, boot_meta, base_options,
                         security_groups, block_device_mapping,
-                        num_instances, i)
+                        num_instances)
+            else:
+                for i in xrange(num_instances):
+                    instance = instance_obj.Instance()
+                    instance.update(base_options)
+                    instance = self.create_db_entry_for_new_instance(
+                            context, instance_type, boot_meta, instance,
+                            security_groups, block_device_mapping,
+                            num_instances, i)
+                    instances.append(instance)
+                    self._record_action_start(context, instance,
+                                              instance_actions.CREATE)
 
-                instances.append(instance)
+            for instance in instances:
                 # send a state update notification for the initial create to
                 # show it going from non-existent to BUILDING
                 notifications.send_update_with_states(context, instance, None,
@@ -1000,10 +1020,6 @@ class API(base.Base):
 
         self._update_instance_group(context, instances, scheduler_hints)
 
-        for instance in instances:
-            self._record_action_start(context, instance,
-                                      instance_actions.CREATE)
-
         self.compute_task_api.build_instances(context,
                 instances=instances, image=boot_meta,
                 filter_properties=filter_properties,
@@ -1271,6 +1287,44 @@ class API(base.Base):
 
         return instance
 
+    def _create_db_entries_for_new_instances(self, context, instance_type,
+            image, base_options, security_groups, block_device_mapping,
+            num_instances):
+        """Create the DB entries of num_instances new instances at once.
+
+        This is the bulk counterpart of create_db_entry_for_new_instance():
+        the instances, their block device mappings and their create actions
+        are all written in a single transaction.
+        """
+        instances = []
+        for i in xrange(num_instances):
+            instance = instance_obj.Instance()
+            instance.update(base_options)
+            self._populate_instance_for_create(instance, image, i,
+                                               security_groups, instance_type)
+            self._populate_instance_names(instance, num_instances)
+            self._populate_instance_shutdown_terminate(instance, image,
+                                                       block_device_mapping)
+            if num_instances > 1:
+                self._set_instance_name_from_template(instance, i)
+            instances.append(instance)
+
+        # Every instance gets the same block device mappings, so they only need
+        # to be validated once.
+        self._validate_bdm(context, instances[0], instance_type,
+                           block_device_mapping)
+        LOG.debug("block_device_mapping %s", block_device_mapping)
+        bdms = []
+        for bdm in block_device_mapping:
+            bdm['volume_size'] = self._volume_size(instance_type, bdm)
+            if bdm.get('volume_size') != 0:
+                bdms.append(bdm)
+
+        self.security_group_api.ensure_default(context)
+        return instance_obj.InstanceList.create(
+            context, instances, block_device_mappings=bdms,
+            action=instance_actions.CREATE).objects
+
     def _check_create_policies(self, context, availability_zone,
             requested_networks, block_device_mapping):
         """Check policies for create()."""
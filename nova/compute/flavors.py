@@ -29,6 +29,7 @@ from nova import db
 from nova import exception
 from nova.openstack.common.db import exception as db_exc
 from nova.openstack.common.gettextutils import _
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import strutils
 from nova.pci import pci_request
@@ -39,6 +40,13 @@ flavor_opts = [
                default='m1.small',
                help='Default flavor to use for the EC2 API only. The Nova API '
                'does not support a default flavor.'),
+    cfg.BoolOpt('compact_flavor_info',
+                default=False,
+                help='Store the flavor of an instance in system_metadata as '
+                     'a single compact, versioned key rather than one '
+                     'instance_type_* key per property. Only enable this '
+                     'once every service is able to read the compact '
+                     'form.'),
 ]
 
 CONF = cfg.CONF
@@ -277,13 +285,58 @@ def remove_flavor_access(flavorid, projectid, ctxt=None):
     return db.flavor_access_remove(ctxt, flavorid, projectid)
 
 
+# The properties of the compact flavor representation, in the order they
+# are stored in. Bump FLAVOR_INFO_VERSION when changing the layout.
+FLAVOR_INFO_VERSION = 1
+FLAVOR_INFO_FIELDS = ('id', 'name', 'memory_mb', 'vcpus', 'root_gb',
+                      'ephemeral_gb', 'flavorid', 'swap', 'rxtx_factor',
+                      'vcpu_weight')
+# system_metadata values are limited to 255 characters; flavors that do not
+# fit (i.e. with very long names) keep the flattened keys.
+_FLAVOR_INFO_MAX_LENGTH = 255
+_FLAVOR_INFO_PREFIXES = ('', 'old_', 'new_')
+
+
+def _flavor_info_key(prefix):
+    return '%sflavor' % prefix
+
+
+def _encode_flavor_info(instance_type):
+    values = [FLAVOR_INFO_VERSION]
+    for key in FLAVOR_INFO_FIELDS:
+        values.append(system_metadata_flavor_props[key](instance_type[key]))
+    return jsonutils.dumps(values, separators=(',', ':'))
+
+
+def decode_flavor_info(value):
+    """Create an InstanceType-like dict from a compact '[prefix]flavor'
+    system_metadata value.
+    """
+    values = jsonutils.loads(value)
+    if values[0] != FLAVOR_INFO_VERSION:
+        raise exception.NovaException(
+            _('Unsupported flavor info version %s') % values[0])
+    instance_type = {}
+    for key, val in zip(FLAVOR_INFO_FIELDS, values[1:]):
+        instance_type[key] = system_metadata_flavor_props[key](val)
+    return instance_type
+
+
 def extract_flavor(instance, prefix=''):
     """Create an InstanceType-like object from instance's system_metadata
     information.
+
+    Compact flavors are decoded by the instance itself when it knows how,
+    so that an Instance object only deserializes each of them once.
     """
 
-    instance_type = {}
     sys_meta = utils.instance_sys_meta(instance)
+    value = sys_meta.get(_flavor_info_key(prefix))
+    if value is not None:
+        decode = getattr(instance, 'decode_flavor_info', decode_flavor_info)
+        return decode(value)
+
+    instance_type = {}
     for key, type_fn in system_metadata_flavor_props.items():
         type_key = '%sinstance_type_%s' % (prefix, key)
         instance_type[key] = type_fn(sys_meta[type_key])
@@ -296,14 +349,29 @@ def save_flavor_info(metadata, instance_type, prefix=''):
 
       [prefix]instance_type_[key]
 
+    or, if compact_flavor_info is enabled, as a single [prefix]flavor key.
+
     This can be used to update system_metadata in place from a type, as well
     as stash information about another instance_type for later use (such as
     during resize).
     """
 
+    value = None
+    if CONF.compact_flavor_info:
+        value = _encode_flavor_info(instance_type)
+        if len(value) > _FLAVOR_INFO_MAX_LENGTH:
+            value = None
+
     for key in system_metadata_flavor_props.keys():
         to_key = '%sinstance_type_%s' % (prefix, key)
-        metadata[to_key] = instance_type[key]
+        if value is None:
+            metadata[to_key] = instance_type[key]
+        else:
+            metadata.pop(to_key, None)
+    if value is None:
+        metadata.pop(_flavor_info_key(prefix), None)
+    else:
+        metadata[_flavor_info_key(prefix)] = value
     pci_request.save_flavor_pci_info(metadata, instance_type, prefix)
     return metadata
 
@@ -313,14 +381,40 @@ def delete_flavor_info(metadata, *prefixes):
     by prefix.
     """
 
-    for key in system_metadata_flavor_props.keys():
-        for prefix in prefixes:
+    for prefix in prefixes:
+        if _flavor_info_key(prefix) in metadata:
+            del metadata[_flavor_info_key(prefix)]
+            continue
+        for key in system_metadata_flavor_props.keys():
             to_key = '%sinstance_type_%s' % (prefix, key)
             del metadata[to_key]
     pci_request.delete_flavor_pci_info(metadata, *prefixes)
     return metadata
 
 
+def compact_flavor_info(metadata):
+    """Convert the flattened flavor information in system_metadata to the
+    compact form, in place.
+
+    Returns True if metadata was changed.
+    """
+
+    changed = False
+    for prefix in _FLAVOR_INFO_PREFIXES:
+        if ('%sinstance_type_id' % prefix not in metadata or
+                _flavor_info_key(prefix) in metadata):
+            continue
+        instance_type = extract_flavor({'system_metadata': metadata}, prefix)
+        value = _encode_flavor_info(instance_type)
+        if len(value) > _FLAVOR_INFO_MAX_LENGTH:
+            continue
+        for key in system_metadata_flavor_props.keys():
+            del metadata['%sinstance_type_%s' % (prefix, key)]
+        metadata[_flavor_info_key(prefix)] = value
+        changed = True
+    return changed
+
+
 def validate_extra_spec_keys(key_names_list):
     for key_name in key_names_list:
         if not VALID_EXTRASPEC_NAME_REGEX.match(key_name):
@@ -143,6 +143,10 @@ interval_opts = [
                default=60,
                help="Number of seconds between instance info_cache self "
                     "healing updates"),
+    cfg.IntOpt("heal_instance_info_cache_batch_size",
+               default=10,
+               help="Number of instances whose info_cache is refreshed on "
+                    "each self healing update"),
     cfg.IntOpt('reclaim_instance_interval',
                default=0,
                help='Interval in seconds for reclaiming deleted instances'),
@@ -425,6 +429,29 @@ def _get_image_meta(context, image_ref):
     return image_service.show(context, image_id)
 
 
+def _power_state_in_sync(vm_state, db_power_state, vm_power_state):
+    """Return True if ComputeManager._sync_instance_power_state() would
+    have nothing to update, stop or report for an instance in vm_state
+    whose power state is db_power_state in the database and
+    vm_power_state on the hypervisor.
+    """
+    if vm_power_state != db_power_state:
+        return False
+    if vm_state == vm_states.ACTIVE:
+        return vm_power_state == power_state.RUNNING
+    if vm_state == vm_states.STOPPED:
+        return vm_power_state in (power_state.NOSTATE,
+                                  power_state.SHUTDOWN,
+                                  power_state.CRASHED)
+    if vm_state == vm_states.PAUSED:
+        return vm_power_state not in (power_state.SHUTDOWN,
+                                      power_state.CRASHED)
+    if vm_state in (vm_states.SOFT_DELETED, vm_states.DELETED):
+        return vm_power_state in (power_state.NOSTATE,
+                                  power_state.SHUTDOWN)
+    return True
+
+
 class InstanceEvents(object):
     def __init__(self):
         self._events = {}
@@ -584,6 +611,8 @@ class ComputeManager(manager.Manager):
         self._last_bw_usage_poll = 0
         self._bw_usage_supported = True
         self._last_bw_usage_cell_update = 0
+        self._instance_uuids_to_heal = []
+        self._instance_uuids_to_heal_first = []
         self.compute_api = compute.API()
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
         self.conductor_api = conductor.API()
@@ -4839,25 +4868,25 @@ class ComputeManager(manager.Manager):
         spacing=CONF.heal_instance_info_cache_interval)
     def _heal_instance_info_cache(self, context):
         """Called periodically.  On every call, try to update the
-        info_cache's network information for another instance by
-        calling to the network manager.
+        info_cache's network information for the next batch of instances
+        by calling to the network API.
 
         This is implemented by keeping a cache of uuids of instances
-        that live on this host.  On each call, we pop one off of a
-        list, pull the DB record, and try the call to the network API.
-        If anything errors don't fail, as it's possible the instance
-        has been deleted, etc.
+        that live on this host.  On each call, we pop a batch of
+        heal_instance_info_cache_batch_size uuids off of the list, pull
+        their DB records in one query, and refresh them with one network
+        API call.  Instances whose ports were reported as plugged or
+        unplugged by an external event go first.  If anything errors
+        don't fail, as it's possible an instance has been deleted, etc.
         """
         heal_interval = CONF.heal_instance_info_cache_interval
         if not heal_interval:
             return
 
-        instance_uuids = getattr(self, '_instance_uuids_to_heal', [])
-        instance = None
-
         LOG.debug('Starting heal instance info cache')
 
-        if not instance_uuids:
+        if (not self._instance_uuids_to_heal and
+                not self._instance_uuids_to_heal_first):
             # The list of instances to heal is empty so rebuild it
             LOG.debug('Rebuilding the list of instances to heal')
             db_instances = instance_obj.InstanceList.get_by_host(
@@ -4875,27 +4904,25 @@ class ComputeManager(manager.Manager):
                     LOG.debug('Skipping network cache update for instance '
                                 'because it is being deleted.', instance=inst)
                     continue
-
-                if not instance:
-                    # Save the first one we find so we don't
-                    # have to get it again
-                    instance = inst
-                else:
-                    instance_uuids.append(inst['uuid'])
-
-            self._instance_uuids_to_heal = instance_uuids
-        else:
-            # Find the next valid instance on the list
-            while instance_uuids:
-                try:
-                    inst = instance_obj.Instance.get_by_uuid(
-                            context, instance_uuids.pop(0),
-                            expected_attrs=['system_metadata', 'info_cache'],
-                            use_slave=True)
-                except exception.InstanceNotFound:
-                    # Instance is gone.  Try to grab another.
-                    continue
-
+                self._instance_uuids_to_heal.append(inst['uuid'])
+
+        batch_size = max(1, CONF.heal_instance_info_cache_batch_size)
+        instance_uuids = []
+        for uuids in (self._instance_uuids_to_heal_first,
+                      self._instance_uuids_to_heal):
+            while uuids and len(instance_uuids) < batch_size:
+                instance_uuid = uuids.pop(0)
+                if instance_uuid not in instance_uuids:
+                    instance_uuids.append(instance_uuid)
+
+        instances = []
+        if instance_uuids:
+            filters = {'uuid': instance_uuids, 'deleted': False}
+            db_instances = instance_obj.InstanceList.get_by_filters(
+                context, filters,
+                expected_attrs=['system_metadata', 'info_cache'],
+                use_slave=True)
+            for inst in db_instances:
                 # Check the instance hasn't been migrated
                 if inst.host != self.host:
                     LOG.debug('Skipping network cache update for instance '
@@ -4906,20 +4933,19 @@ class ComputeManager(manager.Manager):
                     LOG.debug('Skipping network cache update for instance '
                                 'because it is being deleted.', instance=inst)
                 else:
-                    instance = inst
-                    break
+                    instances.append(inst)
 
-        if instance:
-            # We have an instance now to refresh
+        if instances:
+            # We have instances now to refresh
             try:
-                # Call to network API to get instance info.. this will
-                # force an update to the instance's info_cache
-                self._get_instance_nw_info(context, instance, use_slave=True)
-                LOG.debug('Updated the network info_cache for instance',
-                          instance=instance)
+                # Call to network API to get the instances info.. this will
+                # force an update to the instances' info_cache
+                self.network_api.get_instances_nw_info(context, instances)
+                LOG.debug('Updated the network info_cache for %d instances',
+                          len(instances))
             except Exception:
                 LOG.error(_('An error occurred while refreshing the network '
-                            'cache.'), instance=instance, exc_info=True)
+                            'cache.'), exc_info=True)
         else:
             LOG.debug("Didn't find any instances for network info cache "
                         "update.")
@@ -5144,29 +5170,32 @@ class ComputeManager(manager.Manager):
                 return
 
             refreshed = timeutils.utcnow()
-            for bw_ctr in bw_counters:
-                # Allow switching of greenthreads between queries.
-                greenthread.sleep(0)
+            # TODO(geekinutah): Once bw_usage_cache object is created
+            #                   need to revisit this and slaveify.
+            keys = [(bw_ctr['uuid'], bw_ctr['mac_address'])
+                    for bw_ctr in bw_counters]
+            usages = self._get_bw_usages(context, start_time, keys)
+            missing = [key for key in keys if key not in usages]
+            prev_usages = {}
+            if missing:
+                # TODO(geekinutah): Same here, pls slaveify
+                prev_usages = self._get_bw_usages(context, prev_time,
+                                                  missing)
+
+            updates = []
+            for bw_ctr, key in zip(bw_counters, keys):
                 bw_in = 0
                 bw_out = 0
                 last_ctr_in = None
                 last_ctr_out = None
-                # TODO(geekinutah): Once bw_usage_cache object is created
-                #                   need to revisit this and slaveify.
-                usage = self.conductor_api.bw_usage_get(context,
-                                                        bw_ctr['uuid'],
-                                                        start_time,
-                                                        bw_ctr['mac_address'])
+                usage = usages.get(key)
                 if usage:
                     bw_in = usage['bw_in']
                     bw_out = usage['bw_out']
                     last_ctr_in = usage['last_ctr_in']
                     last_ctr_out = usage['last_ctr_out']
                 else:
-                    # TODO(geekinutah): Same here, pls slaveify
-                    usage = self.conductor_api.bw_usage_get(
-                        context, bw_ctr['uuid'], prev_time,
-                        bw_ctr['mac_address'])
+                    usage = prev_usages.get(key)
                     if usage:
                         last_ctr_in = usage['last_ctr_in']
                         last_ctr_out = usage['last_ctr_out']
@@ -5185,16 +5214,24 @@ class ComputeManager(manager.Manager):
                     else:
                         bw_out += (bw_ctr['bw_out'] - last_ctr_out)
 
-                self.conductor_api.bw_usage_update(context,
-                                                   bw_ctr['uuid'],
-                                                   bw_ctr['mac_address'],
-                                                   start_time,
-                                                   bw_in,
-                                                   bw_out,
-                                                   bw_ctr['bw_in'],
-                                                   bw_ctr['bw_out'],
-                                                   last_refreshed=refreshed,
-                                                   update_cells=update_cells)
+                updates.append({'uuid': bw_ctr['uuid'],
+                                'mac': bw_ctr['mac_address'],
+                                'bw_in': bw_in,
+                                'bw_out': bw_out,
+                                'last_ctr_in': bw_ctr['bw_in'],
+                                'last_ctr_out': bw_ctr['bw_out']})
+
+            if updates:
+                self.conductor_api.bw_usage_update_bulk(
+                    context, start_time, updates,
+                    last_refreshed=refreshed, update_cells=update_cells)
+
+    def _get_bw_usages(self, context, start_period, keys):
+        """Return the bandwidth usages of (uuid, mac) keys in a period."""
+        usages = self.conductor_api.bw_usage_get_bulk(context, start_period,
+                                                      keys)
+        return dict(((usage['uuid'], usage['mac']), usage)
+                    for usage in usages)
 
     def _get_host_volume_bdms(self, context):
         """Return all block device mappings on a compute host."""
@@ -5254,6 +5291,10 @@ class ComputeManager(manager.Manager):
         number of virtual machines known by the database, we proceed in a lazy
         loop, one database record at a time, checking if the hypervisor has the
         same power state as is in the database.
+
+        Drivers implementing get_power_states() report the power state of
+        every instance at once; only the instances whose power state does
+        not match the database are then re-read and synced.
         """
         db_instances = instance_obj.InstanceList.get_by_host(context,
                                                              self.host,
@@ -5268,6 +5309,11 @@ class ComputeManager(manager.Manager):
                      {'num_db_instances': num_db_instances,
                       'num_vm_instances': num_vm_instances})
 
+        try:
+            vm_power_states = self.driver.get_power_states(db_instances)
+        except NotImplementedError:
+            vm_power_states = None
+
         for db_instance in db_instances:
             if db_instance['task_state'] is not None:
                 LOG.info(_("During sync_power_state the instance has a "
@@ -5277,11 +5323,19 @@ class ComputeManager(manager.Manager):
                 continue
             # No pending tasks. Now try to figure out the real vm_power_state.
             try:
-                try:
-                    vm_instance = self.driver.get_info(db_instance)
-                    vm_power_state = vm_instance['state']
-                except exception.InstanceNotFound:
-                    vm_power_state = power_state.NOSTATE
+                if vm_power_states is not None:
+                    vm_power_state = vm_power_states.get(db_instance['uuid'],
+                                                         power_state.NOSTATE)
+                    if _power_state_in_sync(db_instance['vm_state'],
+                                            db_instance['power_state'],
+                                            vm_power_state):
+                        continue
+                else:
+                    try:
+                        vm_instance = self.driver.get_info(db_instance)
+                        vm_power_state = vm_instance['state']
+                    except exception.InstanceNotFound:
+                        vm_power_state = power_state.NOSTATE
                 # Note(maoy): the above get_info call might take a long time,
                 # for example, because of a broken libvirt driver.
                 try:
@@ -5680,13 +5734,24 @@ class ComputeManager(manager.Manager):
         # as when we're asked to update the instance's info_cache. If it's
         # not one of those, look for some thread(s) waiting for the event and
         # unblock them if so.
+        network_changed = []
         for event in events:
             instance = [inst for inst in instances
                         if inst.uuid == event.instance_uuid][0]
             if event.name == 'network-changed':
-                self.network_api.get_instance_nw_info(context, instance)
+                if instance not in network_changed:
+                    network_changed.append(instance)
             else:
+                if (event.name in ('network-vif-plugged',
+                                   'network-vif-unplugged') and
+                        instance.uuid not in
+                        self._instance_uuids_to_heal_first):
+                    # The ports of the instance changed, refresh its info_cache
+                    # ahead of the others on the next healing update.
+                    self._instance_uuids_to_heal_first.append(instance.uuid)
                 self._process_instance_event(instance, event)
+        if network_changed:
+            self.network_api.get_instances_nw_info(context, network_changed)
 
     @compute_utils.periodic_task_spacing_warn("image_cache_manager_interval")
     @periodic_task.periodic_task(spacing=CONF.image_cache_manager_interval,
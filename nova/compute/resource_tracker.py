@@ -19,6 +19,7 @@ scheduler with useful information about availability through the ComputeNode
 model.
 """
 
+from eventlet import greenthread
 from oslo.config import cfg
 
 from nova.compute import claims
@@ -48,7 +49,12 @@ resource_tracker_opts = [
                help='Amount of memory in MB to reserve for the host'),
     cfg.StrOpt('compute_stats_class',
                default='nova.compute.stats.Stats',
-               help='Class that will manage stats for the local compute host')
+               help='Class that will manage stats for the local compute host'),
+    cfg.FloatOpt('compute_node_update_interval', default=0,
+                 help='Number of seconds over which the compute node updates '
+                      'resulting from resource claims are coalesced into a '
+                      'single write, done in the background. 0 writes each '
+                      'update synchronously')
 ]
 
 CONF = cfg.CONF
@@ -71,6 +77,9 @@ class ResourceTracker(object):
         self.pci_tracker = None
         self.nodename = nodename
         self.compute_node = None
+        # The compute node values last written to the DB, or None if unknown
+        self._persisted = None
+        self._pending_update = None
         self.stats = importutils.import_object(CONF.compute_stats_class)
         self.tracked_instances = {}
         self.tracked_migrations = {}
@@ -128,7 +137,7 @@ class ResourceTracker(object):
 
         elevated = context.elevated()
         # persist changes to the compute node:
-        self._update(elevated, self.compute_node)
+        self._schedule_update(elevated)
 
         return claim
 
@@ -172,7 +181,7 @@ class ResourceTracker(object):
         self._update_usage_from_migration(context, instance_ref,
                                               self.compute_node, migration)
         elevated = context.elevated()
-        self._update(elevated, self.compute_node)
+        self._schedule_update(elevated)
 
         return claim
 
@@ -217,7 +226,7 @@ class ResourceTracker(object):
         self._update_usage_from_instance(self.compute_node, instance)
 
         ctxt = context.get_admin_context()
-        self._update(ctxt, self.compute_node)
+        self._schedule_update(ctxt)
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def drop_resize_claim(self, instance, instance_type=None, prefix='new_'):
@@ -238,7 +247,7 @@ class ResourceTracker(object):
                 self.compute_node['stats'] = jsonutils.dumps(self.stats)
 
                 ctxt = context.get_admin_context()
-                self._update(ctxt, self.compute_node)
+                self._schedule_update(ctxt)
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def update_usage(self, context, instance):
@@ -254,7 +263,7 @@ class ResourceTracker(object):
         # claim first:
         if uuid in self.tracked_instances:
             self._update_usage_from_instance(self.compute_node, instance)
-            self._update(context.elevated(), self.compute_node)
+            self._schedule_update(context.elevated())
 
     @property
     def disabled(self):
@@ -383,6 +392,7 @@ class ResourceTracker(object):
         # initialize load stats from existing instances:
         self.compute_node = self.conductor_api.compute_node_create(context,
                                                                    values)
+        self._persisted = dict(self.compute_node)
 
     def _get_service(self, context):
         try:
@@ -441,15 +451,84 @@ class ResourceTracker(object):
         if 'pci_devices' in resources:
             LOG.audit(_("Free PCI devices: %s") % resources['pci_devices'])
 
+    def _get_changes(self, values):
+        """Return the values differing from those last written to the DB."""
+        if self._persisted is None:
+            return dict(values)
+        return dict((key, value) for key, value in values.iteritems()
+                    if key not in self._persisted or
+                    self._persisted[key] != value)
+
     def _update(self, context, values):
-        """Persist the compute node updates to the DB."""
+        """Persist the compute node updates to the DB.
+
+        Only the values that changed since the previous update are sent.
+        """
         if "service" in self.compute_node:
             del self.compute_node['service']
+        # The write always happens, even with nothing to change, so that the
+        # periodic task keeps refreshing updated_at for the scheduler.
         self.compute_node = self.conductor_api.compute_node_update(
-            context, self.compute_node, values)
+            context, {'id': self.compute_node['id']},
+            self._get_changes(values))
+        self._persisted = dict(self.compute_node)
         if self.pci_tracker:
             self.pci_tracker.save(context)
 
+    def _schedule_update(self, context):
+        """Persist the in-memory compute node after a resource claim.
+
+        With compute_node_update_interval set, the changes made within that
+        interval are written at once by a background greenthread, instead of
+        one write per claim with COMPUTE_RESOURCE_SEMAPHORE held.
+        """
+        if CONF.compute_node_update_interval <= 0:
+            self._update(context, self.compute_node)
+        elif self._pending_update is None:
+            self._pending_update = greenthread.spawn_after(
+                CONF.compute_node_update_interval, self._flush_update,
+                context)
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _take_pending_update(self, context):
+        """Return the compute node id and the changes to write.
+
+        The changes are recorded as persisted right away, so that an update
+        flushed during the write does not send them again.
+        """
+        self._pending_update = None
+        if self.disabled:
+            return None, {}
+        if "service" in self.compute_node:
+            del self.compute_node['service']
+        if self.pci_tracker:
+            self.pci_tracker.save(context)
+        if self._persisted is None:
+            self._persisted = {}
+        changes = self._get_changes(self.compute_node)
+        self._persisted.update(changes)
+        return self.compute_node['id'], changes
+
+    @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
+    def _forget_persisted(self, keys):
+        """Make the next update write these keys again."""
+        for key in keys:
+            self._persisted.pop(key, None)
+
+    def _flush_update(self, context):
+        """Write the changes accumulated since the update was scheduled."""
+        compute_node_id, changes = self._take_pending_update(context)
+        if not changes:
+            return
+        try:
+            self.conductor_api.compute_node_update(
+                context, {'id': compute_node_id}, changes)
+        except Exception:
+            LOG.exception(_('Failed to update the compute node record for '
+                            '%(host)s:%(node)s'),
+                          {'host': self.host, 'node': self.nodename})
+            self._forget_persisted(changes)
+
     def _update_usage(self, resources, usage, sign=1):
         mem_usage = usage['memory_mb']
 
@@ -103,6 +103,15 @@ class LocalAPI(object):
                                              last_refreshed,
                                              update_cells=update_cells)
 
+    def bw_usage_get_bulk(self, context, start_period, keys):
+        return self._manager.bw_usage_get_bulk(context, start_period, keys)
+
+    def bw_usage_update_bulk(self, context, start_period, usages,
+                             last_refreshed=None, update_cells=True):
+        return self._manager.bw_usage_update_bulk(context, start_period,
+                                                  usages, last_refreshed,
+                                                  update_cells=update_cells)
+
     def provider_fw_rule_get_all(self, context):
         return self._manager.provider_fw_rule_get_all(context)
 
@@ -259,6 +259,20 @@ class ConductorManager(manager.Manager):
         usage = self.db.bw_usage_get(context, uuid, start_period, mac)
         return jsonutils.to_primitive(usage)
 
+    def bw_usage_get_bulk(self, context, start_period, keys):
+        keys = set(tuple(key) for key in keys)
+        uuids = sorted(set(uuid for uuid, mac in keys))
+        usages = self.db.bw_usage_get_by_uuids(context, uuids, start_period)
+        return jsonutils.to_primitive([usage for usage in usages
+                                       if (usage['uuid'], usage['mac'])
+                                       in keys])
+
+    def bw_usage_update_bulk(self, context, start_period, usages,
+                             last_refreshed=None, update_cells=True):
+        self.db.bw_usage_update_bulk(context, start_period, usages,
+                                     last_refreshed,
+                                     update_cells=update_cells)
+
     # NOTE(russellb) This method can be removed in 2.0 of this API.  It is
     # deprecated in favor of the method in the base API.
     def get_backdoor_port(self, context):
@@ -876,7 +890,7 @@ class ComputeTaskManager(base.Base):
 
 class _ConductorManagerV2Proxy(object):
 
-    target = messaging.Target(version='2.0')
+    target = messaging.Target(version='2.1')
 
     def __init__(self, manager):
         self.manager = manager
@@ -914,6 +928,14 @@ class _ConductorManagerV2Proxy(object):
                 bw_in, bw_out, last_ctr_in, last_ctr_out, last_refreshed,
                 update_cells)
 
+    def bw_usage_get_bulk(self, context, start_period, keys):
+        return self.manager.bw_usage_get_bulk(context, start_period, keys)
+
+    def bw_usage_update_bulk(self, context, start_period, usages,
+                             last_refreshed, update_cells):
+        return self.manager.bw_usage_update_bulk(context, start_period,
+                usages, last_refreshed, update_cells)
+
     def provider_fw_rule_get_all(self, context):
         return self.manager.provider_fw_rule_get_all(context)
 
@@ -146,6 +146,7 @@ class ConductorAPI(object):
     ...  - Remove instance_get_all_by_filters()
     ...  - Remove instance_get_active_by_window_joined()
     ...  - Remove instance_fault_create()
+    2.1  - Added bw_usage_get_bulk() and bw_usage_update_bulk()
     """
 
     VERSION_ALIASES = {
@@ -206,6 +207,32 @@ class ConductorAPI(object):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'bw_usage_update', **msg_kwargs)
 
+    def bw_usage_get_bulk(self, context, start_period, keys):
+        if not self.client.can_send_version('2.1'):
+            usages = [self.bw_usage_update(context, uuid, mac, start_period)
+                      for uuid, mac in keys]
+            return [usage for usage in usages if usage]
+        cctxt = self.client.prepare(version='2.1')
+        return cctxt.call(context, 'bw_usage_get_bulk',
+                          start_period=start_period, keys=keys)
+
+    def bw_usage_update_bulk(self, context, start_period, usages,
+                             last_refreshed=None, update_cells=True):
+        if not self.client.can_send_version('2.1'):
+            for usage in usages:
+                self.bw_usage_update(context, usage['uuid'], usage['mac'],
+                                     start_period, usage['bw_in'],
+                                     usage['bw_out'], usage['last_ctr_in'],
+                                     usage['last_ctr_out'],
+                                     last_refreshed=last_refreshed,
+                                     update_cells=update_cells)
+            return
+        cctxt = self.client.prepare(version='2.1')
+        return cctxt.call(context, 'bw_usage_update_bulk',
+                          start_period=start_period, usages=usages,
+                          last_refreshed=last_refreshed,
+                          update_cells=update_cells)
+
     def provider_fw_rule_get_all(self, context):
         cctxt = self.client.prepare()
         return cctxt.call(context, 'provider_fw_rule_get_all')
@@ -29,14 +29,23 @@ from nova.openstack.common.gettextutils import _
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import memorycache
+from nova.openstack.common import timeutils
 
 
 LOG = logging.getLogger(__name__)
 
+# Validated tokens kept before the expired ones are pruned
+_VALIDATED_TOKENS_MAX = 1024
+
 consoleauth_opts = [
     cfg.IntOpt('console_token_ttl',
                default=600,
-               help='How many seconds before deleting tokens')
+               help='How many seconds before deleting tokens'),
+    cfg.IntOpt('console_token_validation_ttl',
+               default=5,
+               help='How many seconds a token stays validated before its '
+                    'console port is checked with the compute node again. '
+                    '0 checks it on every connection'),
     ]
 
 CONF = cfg.CONF
@@ -55,6 +64,23 @@ class ConsoleAuthManager(manager.Manager):
         self.mc = memorycache.get_client()
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
         self.cells_rpcapi = cells_rpcapi.CellsAPI()
+        # token -> (token data, expiry) of the recently validated tokens
+        self._validated_tokens = {}
+
+    def _get_multi(self, keys):
+        """Return a dict of the values found for keys.
+
+        python-memcache fetches them in one round trip; the in-memory
+        client does not implement get_multi(), so each is looked up there.
+        """
+        if hasattr(self.mc, 'get_multi'):
+            return self.mc.get_multi(keys)
+        values = {}
+        for key in keys:
+            value = self.mc.get(key)
+            if value is not None:
+                values[key] = value
+        return values
 
     def _get_tokens_for_instance(self, instance_uuid):
         tokens_str = self.mc.get(instance_uuid.encode('UTF-8'))
@@ -78,10 +104,9 @@ class ConsoleAuthManager(manager.Manager):
         self.mc.set(token.encode('UTF-8'), data, CONF.console_token_ttl)
         tokens = self._get_tokens_for_instance(instance_uuid)
         # Remove the expired tokens from cache.
-        for tok in tokens:
-            token_str = self.mc.get(tok.encode('UTF-8'))
-            if not token_str:
-                tokens.remove(tok)
+        if tokens:
+            found = self._get_multi([tok.encode('UTF-8') for tok in tokens])
+            tokens = [tok for tok in tokens if tok.encode('UTF-8') in found]
         tokens.append(token)
         self.mc.set(instance_uuid.encode('UTF-8'),
                     jsonutils.dumps(tokens))
@@ -108,18 +133,48 @@ class ConsoleAuthManager(manager.Manager):
                                             token['port'],
                                             token['console_type'])
 
+    def _is_validated(self, token, token_str):
+        validated = self._validated_tokens.get(token)
+        if validated is None:
+            return False
+        if (validated[0] != token_str or
+                validated[1] <= timeutils.utcnow_ts()):
+            del self._validated_tokens[token]
+            return False
+        return True
+
+    def _cache_validated(self, token, token_str):
+        ttl = CONF.console_token_validation_ttl
+        if ttl <= 0:
+            return
+        now = timeutils.utcnow_ts()
+        if len(self._validated_tokens) >= _VALIDATED_TOKENS_MAX:
+            self._validated_tokens = dict(
+                (tok, validated)
+                for tok, validated in self._validated_tokens.iteritems()
+                if validated[1] > now)
+        self._validated_tokens[token] = (token_str, now + ttl)
+
     def check_token(self, context, token):
         token_str = self.mc.get(token.encode('UTF-8'))
         token_valid = (token_str is not None)
         LOG.audit(_("Checking Token: %(token)s, %(token_valid)s"),
                   {'token': token, 'token_valid': token_valid})
-        if token_valid:
-            token = jsonutils.loads(token_str)
-            if self._validate_token(context, token):
-                return token
+        if not token_valid:
+            self._validated_tokens.pop(token, None)
+            return
+        # The console port of a recently validated token is not checked again,
+        # saving a compute RPC on every proxy reconnect.
+        if self._is_validated(token, token_str):
+            return jsonutils.loads(token_str)
+        token_dict = jsonutils.loads(token_str)
+        if self._validate_token(context, token_dict):
+            self._cache_validated(token, token_str)
+            return token_dict
 
     def delete_tokens_for_instance(self, context, instance_uuid):
         tokens = self._get_tokens_for_instance(instance_uuid)
         for token in tokens:
             self.mc.delete(token.encode('UTF-8'))
+            self._validated_tokens.pop(token, None)
         self.mc.delete(instance_uuid.encode('UTF-8'))
@@ -658,6 +658,17 @@ def instance_create(context, values):
     return IMPL.instance_create(context, values)
 
 
+def instance_create_many(context, values_list, block_device_mappings=None,
+                         action=None):
+    """Create instances from a list of values dictionaries at once.
+
+    The block_device_mappings are created for every instance, as well as
+    the instance action, if any.
+    """
+    return IMPL.instance_create_many(context, values_list,
+                                     block_device_mappings, action)
+
+
 def instance_destroy(context, instance_uuid, constraint=None,
         update_cells=True):
     """Destroy the instance or raise if it does not exist."""
@@ -1237,6 +1248,13 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                                                          use_slave)
 
 
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids,
+                                                   use_slave=False):
+    """Get all block device mapping belonging to a list of instances."""
+    return IMPL.block_device_mapping_get_all_by_instance_uuids(
+            context, instance_uuids, use_slave)
+
+
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
     """Get block device mapping for a given volume."""
@@ -1694,6 +1712,25 @@ def bw_usage_update(context, uuid, mac, start_period, bw_in, bw_out,
     return rv
 
 
+def bw_usage_update_bulk(context, start_period, usages, last_refreshed=None,
+                         update_cells=True):
+    """Update cached bandwidth usage for several instance networks at once.
+
+    usages is a list of dictionaries with the uuid, mac, bw_in, bw_out,
+    last_ctr_in and last_ctr_out of each network. Creates new records if
+    needed.
+    """
+    rv = IMPL.bw_usage_update_bulk(context, start_period, usages,
+                                   last_refreshed=last_refreshed)
+    if update_cells:
+        try:
+            cells_rpcapi.CellsAPI().bw_usage_update_bulk_at_top(context,
+                    start_period, usages, last_refreshed)
+        except Exception:
+            LOG.exception(_("Failed to notify cells of bw_usage update"))
+    return rv
+
+
 ###################
 
 
@@ -1728,6 +1765,11 @@ def s3_image_get_by_uuid(context, image_uuid):
     return IMPL.s3_image_get_by_uuid(context, image_uuid)
 
 
+def s3_image_get_all_by_uuids(context, image_uuids):
+    """Find the local s3 images represented by a list of uuids."""
+    return IMPL.s3_image_get_all_by_uuids(context, image_uuids)
+
+
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid."""
     return IMPL.s3_image_create(context, image_uuid)
@@ -1888,6 +1930,14 @@ def get_ec2_instance_id_by_uuid(context, instance_id):
     return IMPL.get_ec2_instance_id_by_uuid(context, instance_id)
 
 
+def get_ec2_instance_ids_by_uuids(context, instance_uuids):
+    """Get a dict of uuid to ec2 id from instance_id_mappings table.
+
+    Instances without a mapping are not part of the result.
+    """
+    return IMPL.get_ec2_instance_ids_by_uuids(context, instance_uuids)
+
+
 def get_instance_uuid_by_ec2_id(context, ec2_id):
     """Get uuid through ec2 id from instance_id_mappings table."""
     return IMPL.get_instance_uuid_by_ec2_id(context, ec2_id)
@@ -1946,13 +1996,17 @@ def task_log_get(context, task_name, period_beginning,
 ####################
 
 
-def archive_deleted_rows(context, max_rows=None):
+def archive_deleted_rows(context, max_rows=None, markers=None):
     """Move up to max_rows rows from production tables to corresponding shadow
     tables.
 
+    :param markers: optional dict of table name to the key archiving has
+                    reached in that table, updated in place so that the
+                    next call resumes from there.
     :returns: number of rows archived.
     """
-    return IMPL.archive_deleted_rows(context, max_rows=max_rows)
+    return IMPL.archive_deleted_rows(context, max_rows=max_rows,
+                                     markers=markers)
 
 
 def archive_deleted_rows_for_table(context, tablename, max_rows=None):
@@ -31,7 +31,6 @@ from sqlalchemy import and_
 from sqlalchemy import Boolean
 from sqlalchemy.exc import DataError
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.exc import NoSuchTableError
 from sqlalchemy import Integer
 from sqlalchemy import MetaData
 from sqlalchemy import or_
@@ -39,7 +38,6 @@ from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import joinedload_all
 from sqlalchemy.orm import noload
-from sqlalchemy.schema import Table
 from sqlalchemy.sql.expression import asc
 from sqlalchemy.sql.expression import desc
 from sqlalchemy.sql.expression import select
@@ -1582,6 +1580,19 @@ def _handle_objects_related_type_conversions(values):
     convert_objects_related_datetimes(values, *datetime_keys)
 
 
+def _get_sec_group_models(context, session, security_groups):
+    models = []
+    default_group = security_group_ensure_default(context)
+    if 'default' in security_groups:
+        models.append(default_group)
+        # Generate a new list, so we don't modify the original
+        security_groups = [x for x in security_groups if x != 'default']
+    if security_groups:
+        models.extend(_security_group_get_by_names(context,
+                session, context.project_id, security_groups))
+    return models
+
+
 @require_context
 def instance_create(context, values):
     """Create a new Instance record in the database.
@@ -1607,24 +1618,12 @@ def instance_create(context, values):
     security_groups = values.pop('security_groups', [])
     instance_ref.update(values)
 
-    def _get_sec_group_models(session, security_groups):
-        models = []
-        default_group = security_group_ensure_default(context)
-        if 'default' in security_groups:
-            models.append(default_group)
-            # Generate a new list, so we don't modify the original
-            security_groups = [x for x in security_groups if x != 'default']
-        if security_groups:
-            models.extend(_security_group_get_by_names(context,
-                    session, context.project_id, security_groups))
-        return models
-
     session = get_session()
     with session.begin():
         if 'hostname' in values:
             _validate_unique_server_name(context, session, values['hostname'])
-        instance_ref.security_groups = _get_sec_group_models(session,
-                security_groups)
+        instance_ref.security_groups = _get_sec_group_models(context,
+                session, security_groups)
         session.add(instance_ref)
 
     # create the instance uuid to ec2_id mapping entry for instance
@@ -1633,6 +1632,154 @@ def instance_create(context, values):
     return instance_ref
 
 
+def _insert_many(session, model, rows):
+    """Insert rows of model with as few multi-row inserts as possible.
+
+    Rows setting the same columns are inserted together, so that the
+    defaults of the columns a row does not set still apply. A value for
+    something that is not a column of the model raises ValueError.
+    """
+    columns = set(model.__table__.columns.keys())
+    rows_by_keys = collections.defaultdict(list)
+    for row in rows:
+        unknown = set(row) - columns
+        if unknown:
+            raise ValueError(_("%(table)s has no column %(columns)s") %
+                             {'table': model.__tablename__,
+                              'columns': ', '.join(sorted(unknown))})
+        rows_by_keys[tuple(sorted(row))].append(row)
+    for same_key_rows in rows_by_keys.values():
+        session.execute(model.__table__.insert(), same_key_rows)
+
+
+def _merge_block_device_mappings(bdm_values):
+    """Return the block device mappings left by creating each of the given
+    ones with block_device_mapping_update_or_create() in turn.
+
+    A mapping for a device name that is already mapped updates the earlier
+    mapping, and a swap mapping replaces the earlier swap mappings.
+    """
+    merged = []
+    for values in bdm_values:
+        result = None
+        if values.get('device_name'):
+            for bdm in merged:
+                if bdm.get('device_name') == values['device_name']:
+                    result = bdm
+                    break
+        if result is not None:
+            result.update(values)
+        else:
+            result = dict(values)
+            merged.append(result)
+        if block_device.new_format_is_swap(values):
+            merged = [bdm for bdm in merged if bdm is result or
+                      not block_device.new_format_is_swap(bdm)]
+    return merged
+
+
+@require_context
+def instance_create_many(context, values_list, block_device_mappings=None,
+                         action=None):
+    """Create several Instance records in the database at once.
+
+    context - request context object
+    values_list - list of dicts of column values, as for instance_create()
+    block_device_mappings - list of dicts of block device mapping values
+                            to create for every instance
+    action - dict of instance action values to start for every instance
+
+    All the records are created in a single transaction, with one
+    multi-row insert per table rather than one insert per record.
+    """
+    if not values_list:
+        return []
+
+    bdm_values = []
+    for bdm in block_device_mappings or []:
+        bdm = bdm.copy()
+        _scrub_empty_str_values(bdm, ['volume_size'])
+        bdm_values.append(_from_legacy_values(bdm, False))
+    bdm_values = _merge_block_device_mappings(bdm_values)
+    if action is not None:
+        action = action.copy()
+        convert_objects_related_datetimes(action, 'start_time')
+
+    rows = collections.defaultdict(list)
+    instance_uuids = []
+    hostnames = set()
+    sec_groups_by_names = {}
+
+    session = get_session()
+    with session.begin():
+        for values in values_list:
+            values = values.copy()
+            if not values.get('uuid'):
+                values['uuid'] = str(uuid.uuid4())
+            instance_uuid = values['uuid']
+            instance_uuids.append(instance_uuid)
+
+            for key, model in (('metadata', models.InstanceMetadata),
+                               ('system_metadata',
+                                models.InstanceSystemMetadata)):
+                for k, v in (values.pop(key, None) or {}).iteritems():
+                    rows[model].append({'instance_uuid': instance_uuid,
+                                        'key': k, 'value': v})
+
+            info_cache = dict(values.pop('info_cache', None) or {})
+            info_cache['instance_uuid'] = instance_uuid
+            rows[models.InstanceInfoCache].append(info_cache)
+
+            names = tuple(values.pop('security_groups', []))
+            if names not in sec_groups_by_names:
+                sec_groups_by_names[names] = _get_sec_group_models(
+                    context, session, list(names))
+            for group in sec_groups_by_names[names]:
+                rows[models.SecurityGroupInstanceAssociation].append(
+                    {'security_group_id': group['id'],
+                     'instance_uuid': instance_uuid})
+
+            rows[models.InstanceIdMapping].append({'uuid': instance_uuid})
+
+            for bdm in bdm_values:
+                rows[models.BlockDeviceMapping].append(
+                    dict(bdm, instance_uuid=instance_uuid))
+
+            if action is not None:
+                rows[models.InstanceAction].append(
+                    dict(action, instance_uuid=instance_uuid))
+
+            _handle_objects_related_type_conversions(values)
+            if values.get('hostname'):
+                _validate_unique_server_name(context, session,
+                                             values['hostname'])
+                lowername = values['hostname'].lower()
+                if (CONF.osapi_compute_unique_server_name_scope and
+                        lowername in hostnames):
+                    raise exception.InstanceExists(name=lowername)
+                hostnames.add(lowername)
+
+            rows[models.Instance].append(values)
+
+        # The instances go first, the other records refer to them.
+        for model in (models.Instance,
+                      models.InstanceMetadata,
+                      models.InstanceSystemMetadata,
+                      models.InstanceInfoCache,
+                      models.SecurityGroupInstanceAssociation,
+                      models.InstanceIdMapping,
+                      models.BlockDeviceMapping,
+                      models.InstanceAction):
+            _insert_many(session, model, rows[model])
+
+    instances = _build_instance_get(context).\
+                    filter(models.Instance.uuid.in_(instance_uuids)).\
+                    all()
+    instances_by_uuid = dict((inst['uuid'], inst) for inst in instances)
+    return [instances_by_uuid[instance_uuid]
+            for instance_uuid in instance_uuids]
+
+
 def _instance_data_get_for_user(context, project_id, user_id, session=None):
     result = model_query(context,
                          func.count(models.Instance.id),
@@ -3566,6 +3713,17 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                  all()
 
 
+@require_context
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids,
+                                                   use_slave=False):
+    if not instance_uuids:
+        return []
+    return _block_device_mapping_get_query(context, use_slave=use_slave).\
+                 filter(models.BlockDeviceMapping.instance_uuid.in_(
+                        instance_uuids)).\
+                 all()
+
+
 @require_context
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
@@ -4826,6 +4984,55 @@ def bw_usage_update(context, uuid, mac, start_period, bw_in, bw_out,
             pass
 
 
+@require_context
+@_retry_on_deadlock
+def bw_usage_update_bulk(context, start_period, usages, last_refreshed=None):
+
+    if not usages:
+        return
+
+    session = get_session()
+
+    if last_refreshed is None:
+        last_refreshed = timeutils.utcnow()
+
+    # Read the records of all the instances at once, then update those
+    # found and create the others.
+    try:
+        with session.begin():
+            uuids = list(set(usage['uuid'] for usage in usages))
+            query = model_query(context, models.BandwidthUsage,
+                                session=session, read_deleted="yes").\
+                            filter_by(start_period=start_period).\
+                            filter(models.BandwidthUsage.uuid.in_(uuids))
+            bwusages = dict(((bwusage.uuid, bwusage.mac), bwusage)
+                            for bwusage in query.all())
+
+            for usage in usages:
+                key = (usage['uuid'], usage['mac'])
+                bwusage = bwusages.get(key)
+                if bwusage is None:
+                    bwusage = models.BandwidthUsage()
+                    bwusage.start_period = start_period
+                    bwusage.uuid = usage['uuid']
+                    bwusage.mac = usage['mac']
+                    session.add(bwusage)
+                    bwusages[key] = bwusage
+                bwusage.last_refreshed = last_refreshed
+                bwusage.bw_in = usage['bw_in']
+                bwusage.bw_out = usage['bw_out']
+                bwusage.last_ctr_in = usage['last_ctr_in']
+                bwusage.last_ctr_out = usage['last_ctr_out']
+    except db_exc.DBDuplicateEntry:
+        # Somebody else created some of the usage entries meanwhile. Go
+        # through them one by one, which copes with that.
+        for usage in usages:
+            bw_usage_update(context, usage['uuid'], usage['mac'],
+                            start_period, usage['bw_in'], usage['bw_out'],
+                            usage['last_ctr_in'], usage['last_ctr_out'],
+                            last_refreshed=last_refreshed)
+
+
 ####################
 
 
@@ -4974,6 +5181,15 @@ def s3_image_get_by_uuid(context, image_uuid):
     return result
 
 
+def s3_image_get_all_by_uuids(context, image_uuids):
+    """Find the local s3 images represented by a list of uuids."""
+    if not image_uuids:
+        return []
+    return model_query(context, models.S3Image, read_deleted="yes").\
+                 filter(models.S3Image.uuid.in_(image_uuids)).\
+                 all()
+
+
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid."""
     try:
@@ -5470,6 +5686,17 @@ def get_ec2_instance_id_by_uuid(context, instance_id):
     return result['id']
 
 
+@require_context
+def get_ec2_instance_ids_by_uuids(context, instance_uuids):
+    if not instance_uuids:
+        return {}
+    result = _ec2_instance_get_query(context).\
+                    filter(models.InstanceIdMapping.uuid.in_(
+                           instance_uuids)).\
+                    all()
+    return dict((row['uuid'], row['id']) for row in result)
+
+
 @require_context
 def get_instance_uuid_by_ec2_id(context, ec2_id):
     result = _ec2_instance_get_query(context).\
@@ -5572,86 +5799,152 @@ def _get_default_deleted_value(table):
         return None
 
 
-@require_admin_context
-def archive_deleted_rows_for_table(context, tablename, max_rows):
-    """Move up to max_rows rows from one tables to the corresponding
-    shadow table. The context argument is only used for the decorator.
+# Reflected (table, shadow table) pairs used by the archiver, cached for
+# the engine they were reflected from.
+_ARCHIVE_TABLES = (None, None)
 
-    :returns: number of rows archived
+
+def _get_archive_tables(engine):
+    """Return an OrderedDict mapping the name of every model table that has
+    a shadow table to its reflected (table, shadow_table) pair.
+
+    Tables come before the tables their foreign keys reference, so that
+    archiving them in order frees the referenced rows before their own
+    table is reached.
     """
-    # NOTE(guochbo): There is a circular import, nova.db.sqlalchemy.utils
-    # imports nova.db.sqlalchemy.api.
-    from nova.db.sqlalchemy import utils as db_utils
+    global _ARCHIVE_TABLES
+    cached_engine, tables = _ARCHIVE_TABLES
+    if cached_engine is engine:
+        return tables
+
+    tablenames = set()
+    for model_class in models.__dict__.itervalues():
+        if hasattr(model_class, "__tablename__"):
+            tablenames.add(model_class.__tablename__)
 
-    engine = get_engine()
-    conn = engine.connect()
     metadata = MetaData()
     metadata.bind = engine
-    table = Table(tablename, metadata, autoload=True)
-    default_deleted_value = _get_default_deleted_value(table)
-    shadow_tablename = _SHADOW_TABLE_PREFIX + tablename
-    rows_archived = 0
-    try:
-        shadow_table = Table(shadow_tablename, metadata, autoload=True)
-    except NoSuchTableError:
+    metadata.reflect()
+    tables = collections.OrderedDict()
+    for table in reversed(metadata.sorted_tables):
+        shadow_table = metadata.tables.get(_SHADOW_TABLE_PREFIX + table.name)
+        if (table.name in tablenames and shadow_table is not None and
+                'deleted' in table.c):
+            tables[table.name] = (table, shadow_table)
+    _ARCHIVE_TABLES = (engine, tables)
+    return tables
+
+
+def _archive_deleted_rows_for_table(engine, tablename, max_rows, marker=None):
+    """Move the first max_rows deleted rows past marker from one table to
+    the corresponding shadow table.
+
+    Rows are paged by key: the batch is bounded by a range of keys rather
+    than an OFFSET or a rescan from the start of the table, so resuming
+    from the returned marker only reads rows not looked at yet.
+
+    :returns: tuple of the number of rows archived and the marker to
+              resume from, or None if the table has no deleted rows left
+              past marker
+    """
+    tables = _get_archive_tables(engine)
+    if tablename not in tables:
         # No corresponding shadow table; skip it.
-        return rows_archived
+        return 0, None
+    table, shadow_table = tables[tablename]
 
     if tablename == "dns_domains":
         # We have one table (dns_domains) where the key is called
         # "domain" rather than "id"
         column = table.c.domain
-        column_name = "domain"
     else:
         column = table.c.id
-        column_name = "id"
-    # NOTE(guochbo): Use InsertFromSelect and DeleteFromSelect to avoid
-    # database's limit of maximum parameter in one SQL statement.
-    query_insert = select([table],
-                          table.c.deleted != default_deleted_value).\
-                          order_by(column).limit(max_rows)
-    query_delete = select([column],
-                          table.c.deleted != default_deleted_value).\
-                          order_by(column).limit(max_rows)
-
-    insert_statement = sqlalchemyutils.InsertFromSelect(
-        shadow_table, query_insert)
-    delete_statement = db_utils.DeleteFromSelect(table, query_delete, column)
+    deleted = table.c.deleted != _get_default_deleted_value(table)
+    if marker is not None:
+        deleted = and_(deleted, column > marker)
+
+    conn = engine.connect()
     try:
-        # Group the insert and delete in a transaction.
-        with conn.begin():
-            result_insert = conn.execute(insert_statement)
-            result_delete = conn.execute(delete_statement)
-    except IntegrityError:
-        # A foreign key constraint keeps us from deleting some of
-        # these rows until we clean up a dependent table.  Just
-        # skip this table for now; we'll come back to it later.
-        msg = _("IntegrityError detected when archiving table %s") % tablename
-        LOG.warn(msg)
-        return rows_archived
+        batch = select([column]).where(deleted).order_by(column).\
+                limit(max_rows).alias()
+        count, last = conn.execute(
+            select([func.count(), func.max(batch.c[column.name])])).first()
+        if not count:
+            return 0, None
+        if max_rows is not None and count >= max_rows:
+            next_marker = last
+        else:
+            next_marker = None
+
+        # NOTE(guochbo): Use InsertFromSelect to avoid database's limit of
+        # maximum parameter in one SQL statement.
+        in_batch = and_(deleted, column <= last)
+        insert_statement = sqlalchemyutils.InsertFromSelect(
+            shadow_table, select([table]).where(in_batch))
+        delete_statement = table.delete().where(in_batch)
+        try:
+            # Group the insert and delete in a transaction.
+            with conn.begin():
+                conn.execute(insert_statement)
+                result_delete = conn.execute(delete_statement)
+        except IntegrityError:
+            # A foreign key constraint keeps us from deleting some of
+            # these rows until we clean up a dependent table.  Just
+            # skip this batch for now; we'll come back to it on the next
+            # pass over the table.
+            msg = _("IntegrityError detected when archiving table %s") % \
+                    tablename
+            LOG.warn(msg)
+            return 0, next_marker
+    finally:
+        conn.close()
+
+    return result_delete.rowcount, next_marker
 
-    rows_archived = result_delete.rowcount
 
+@require_admin_context
+def archive_deleted_rows_for_table(context, tablename, max_rows):
+    """Move up to max_rows rows from one tables to the corresponding
+    shadow table. The context argument is only used for the decorator.
+
+    :returns: number of rows archived
+    """
+    rows_archived, _marker = _archive_deleted_rows_for_table(
+        get_engine(), tablename, max_rows)
     return rows_archived
 
 
 @require_admin_context
-def archive_deleted_rows(context, max_rows=None):
+def archive_deleted_rows(context, max_rows=None, markers=None):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
+    Tables are archived in foreign key dependency order. If markers is
+    given it maps table names to the key each table has been archived up
+    to; it is updated in place, so that passing it to successive calls
+    pages through each table rather than scanning it from the start every
+    time. A table is dropped from markers once it has no deleted rows left
+    past its marker, which makes the next call start a new pass over it.
+
     :returns: Number of rows archived.
     """
     # The context argument is only used for the decorator.
-    tablenames = []
-    for model_class in models.__dict__.itervalues():
-        if hasattr(model_class, "__tablename__"):
-            tablenames.append(model_class.__tablename__)
+    engine = get_engine()
     rows_archived = 0
-    for tablename in tablenames:
-        rows_archived += archive_deleted_rows_for_table(context, tablename,
-                                         max_rows=max_rows - rows_archived)
-        if rows_archived >= max_rows:
+    for tablename in _get_archive_tables(engine):
+        remaining = None
+        if max_rows is not None:
+            remaining = max_rows - rows_archived
+        marker = markers.get(tablename) if markers is not None else None
+        archived, marker = _archive_deleted_rows_for_table(
+            engine, tablename, remaining, marker=marker)
+        if markers is not None:
+            if marker is None:
+                markers.pop(tablename, None)
+            else:
+                markers[tablename] = marker
+        rows_archived += archived
+        if max_rows is not None and rows_archived >= max_rows:
             break
     return rows_archived
 
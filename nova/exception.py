@@ -1268,6 +1268,10 @@ class ConfigDriveUnknownFormat(NovaException):
                 "iso9660 or vfat.")
 
 
+class ConfigDriveTooLarge(NovaException):
+    msg_fmt = _("Config drive content does not fit in %(size)d bytes.")
+
+
 class InterfaceAttachFailed(Invalid):
     msg_fmt = _("Failed to attach network adapter device to %(instance)s")
 
@@ -231,6 +231,23 @@ class NetworkAPI(base.Base):
         """Returns all network info related to an instance."""
         raise NotImplementedError()
 
+    def get_instances_nw_info(self, context, instances):
+        """Returns a dict of instance uuid to all network info related to
+        that instance, for each of the instances.
+
+        An instance whose network info can't be retrieved is logged and
+        left out.
+        """
+        results = {}
+        for instance in instances:
+            try:
+                results[instance['uuid']] = self.get_instance_nw_info(
+                    context, instance)
+            except Exception:
+                LOG.exception(_('Failed to get the network info of the '
+                                'instance.'), instance=instance)
+        return results
+
     def validate_networks(self, context, requested_networks, num_instances):
         """validate the networks passed at the time of creating
         the server.
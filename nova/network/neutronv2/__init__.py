@@ -13,18 +13,43 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+
+import collections
+
+from eventlet import semaphore
 from neutronclient.common import exceptions
 from neutronclient.v2_0 import client as clientv20
 from oslo.config import cfg
 
 from nova.openstack.common import local
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+
+neutron_client_opts = [
+    cfg.IntOpt('neutron_client_pool_size',
+               default=0,
+               help='Maximum number of concurrent requests to the neutron '
+                    'endpoint for the admin credentials and for each '
+                    'tenant. The clients making them are pooled and reused '
+                    'by later requests. Set to 0 to create a new client '
+                    'for every get_client() call'),
+    cfg.IntOpt('neutron_admin_token_refresh_margin',
+               default=300,
+               help='Number of seconds before its expiry that the admin '
+                    'token shared by the pooled admin clients is '
+                    'refreshed'),
+    ]
 
 CONF = cfg.CONF
+CONF.register_opts(neutron_client_opts)
 LOG = logging.getLogger(__name__)
 
+# Client pools, keyed by the client parameters (admin credentials or
+# the absence of them included) and, for user clients, the tenant.
+_POOLS = {}
 
-def _get_client(token=None):
+
+def _get_client_params(admin):
     params = {
         'endpoint_url': CONF.neutron_url,
         'timeout': CONF.neutron_url_timeout,
@@ -32,10 +57,7 @@ def _get_client(token=None):
         'ca_cert': CONF.neutron_ca_certificates_file,
         'auth_strategy': CONF.neutron_auth_strategy,
     }
-
-    if token:
-        params['token'] = token
-    else:
+    if admin:
         params['username'] = CONF.neutron_admin_username
         if CONF.neutron_admin_tenant_id:
             params['tenant_id'] = CONF.neutron_admin_tenant_id
@@ -43,9 +65,152 @@ def _get_client(token=None):
             params['tenant_name'] = CONF.neutron_admin_tenant_name
         params['password'] = CONF.neutron_admin_password
         params['auth_url'] = CONF.neutron_admin_auth_url
+    return params
+
+
+def _get_client(token=None):
+    params = _get_client_params(admin=not token)
+    if token:
+        params['token'] = token
     return clientv20.Client(**params)
 
 
+class ClientPool(object):
+    """A bounded pool of neutron clients sharing the same parameters.
+
+    Clients are checked out for the duration of a single API call, so
+    that the HTTP client (and its connections, when the neutronclient
+    version keeps them open) and, for admin clients, the token they hold
+    are reused by later calls instead of being set up again for each
+    one. At most max_size calls are in flight at a time, callers beyond
+    that wait for a client to be checked back in.
+
+    Admin pools share the token obtained by any of their clients with
+    the others, and have it refreshed shortly before it expires. User
+    pools belong to a single tenant and hold no credentials: the token
+    of the caller is set on the client for the duration of the call, and
+    cleared when it is checked back in.
+    """
+
+    def __init__(self, params, max_size, project_id=None):
+        self.params = params
+        self.admin = 'password' in params
+        self.project_id = project_id
+        self.max_size = max_size
+        self._semaphore = semaphore.Semaphore(max_size)
+        self._free = collections.deque()
+        self._token = None
+        self._token_expires = None
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def get_stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'max_size': self.max_size,
+                'free': len(self._free)}
+
+    def _get(self, token):
+        if not self._semaphore.acquire(blocking=False):
+            self.waits += 1
+            self._semaphore.acquire()
+        try:
+            client = self._free.pop()
+            self.hits += 1
+        except IndexError:
+            try:
+                client = clientv20.Client(**self.params)
+            except Exception:
+                self._semaphore.release()
+                raise
+            self.misses += 1
+
+        if self.admin:
+            token = self._token
+            expires = self._token_expires
+            margin = CONF.neutron_admin_token_refresh_margin
+            if expires is not None and timeutils.is_soon(expires, margin):
+                token = None
+        client.httpclient.auth_token = token
+        return client
+
+    def _put(self, client):
+        httpclient = client.httpclient
+        if self.admin:
+            if httpclient.auth_token and httpclient.auth_token != self._token:
+                self._token = httpclient.auth_token
+                self._token_expires = self._get_token_expiry(httpclient)
+        else:
+            httpclient.auth_token = None
+        self._free.append(client)
+        self._semaphore.release()
+
+    @staticmethod
+    def _get_token_expiry(httpclient):
+        try:
+            expires = httpclient.service_catalog.get_token()['expires']
+            return timeutils.normalize_time(timeutils.parse_isotime(expires))
+        except Exception:
+            # Without a known expiry the token is used until neutron rejects
+            # it, the client then re-authenticates.
+            return None
+
+    def call(self, token, name, *args, **kwargs):
+        client = self._get(token)
+        try:
+            return getattr(client, name)(*args, **kwargs)
+        finally:
+            self._put(client)
+
+
+class PooledClient(object):
+    """Neutron client proxy making each API call with a pooled client."""
+
+    def __init__(self, pool, token=None):
+        self._pool = pool
+        self._token = token
+
+    def __getattr__(self, name):
+        if not callable(getattr(clientv20.Client, name, None)):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._pool.call(self._token, name, *args, **kwargs)
+        return call
+
+
+def _get_pool(admin, project_id=None):
+    params = _get_client_params(admin)
+    key = (project_id,) + tuple(sorted(params.items()))
+    pool = _POOLS.get(key)
+    if pool is None:
+        pool = _POOLS[key] = ClientPool(params,
+                                        CONF.neutron_client_pool_size,
+                                        project_id=project_id)
+    return pool
+
+
+def get_pool_stats():
+    """Return the usage statistics of every client pool.
+
+    This is a list of dicts with the hits, misses and waits of each pool,
+    as well as its size and number of clients not in use.
+    """
+    stats = []
+    for pool in _POOLS.values():
+        pool_stats = pool.get_stats()
+        pool_stats.update(endpoint_url=pool.params['endpoint_url'],
+                          admin=pool.admin, project_id=pool.project_id)
+        stats.append(pool_stats)
+    return stats
+
+
+def reset_pools():
+    _POOLS.clear()
+
+
 def get_client(context, admin=False):
     # NOTE(dprince): In the case where no auth_token is present
     # we allow use of neutron admin tenant credentials if
@@ -53,6 +218,8 @@ def get_client(context, admin=False):
     # This is to support some services (metadata API) where
     # an admin context is used without an auth token.
     if admin or (context.is_admin and not context.auth_token):
+        if CONF.neutron_client_pool_size > 0:
+            return PooledClient(_get_pool(admin=True))
         # NOTE(dims): We need to use admin token, let us cache a
         # thread local copy for re-using this client
         # multiple times and to avoid excessive calls
@@ -67,6 +234,10 @@ def get_client(context, admin=False):
     # We got a user token that we can use that as-is
     if context.auth_token:
         token = context.auth_token
+        if CONF.neutron_client_pool_size > 0:
+            return PooledClient(_get_pool(admin=False,
+                                          project_id=context.project_id),
+                                token=token)
         return _get_client(token=token)
 
     # We did not get a user token and we should not be using
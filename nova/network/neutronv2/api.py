@@ -468,6 +468,71 @@ class API(base_api.NetworkAPI):
                                                     result, update_cells=False)
         return result
 
+    def get_instances_nw_info(self, context, instances):
+        """Return network information for the specified instances and
+           update their caches.
+
+        The ports of all the instances, their floating IPs, subnets and DHCP
+        ports, and the networks of their cached interfaces, are listed with
+        a single call per resource type. An instance whose network info
+        can't be built is logged and left out.
+        """
+        if not instances:
+            return {}
+        instance_net_ids = {}
+        for instance in instances:
+            ifaces = compute_utils.get_nw_info_for_instance(instance)
+            instance_net_ids[instance['uuid']] = [iface['network']['id']
+                                                  for iface in ifaces]
+        net_ids = set(net_id for ids in instance_net_ids.values()
+                      for net_id in ids)
+        networks_by_id = {}
+        if net_ids:
+            networks_by_id = dict(
+                (network['id'], network) for network in
+                self._get_available_networks(context, None, list(net_ids)))
+
+        client = neutronv2.get_client(context, admin=True)
+        data = client.list_ports(
+            device_id=[instance['uuid'] for instance in instances])
+        ports_by_device_id = {}
+        for port in data.get('ports', []):
+            ports_by_device_id.setdefault(port['device_id'], []).append(port)
+
+        instance_ports = dict(
+            (instance['uuid'],
+             [port for port in ports_by_device_id.get(instance['uuid'], [])
+              if port['tenant_id'] == instance['project_id']])
+            for instance in instances)
+        port_resources = self._gather_port_resources(
+            context, client,
+            [port for ports in instance_ports.values() for port in ports])
+
+        results = {}
+        for instance in instances:
+            LOG.debug('get_instance_nw_info() for %s',
+                      instance['display_name'])
+            try:
+                net_ids = instance_net_ids[instance['uuid']]
+                networks = [networks_by_id[net_id] for net_id in set(net_ids)
+                            if net_id in networks_by_id]
+                _ensure_requested_network_ordering(
+                    lambda x: x['id'], networks, net_ids)
+                nw_info = network_model.NetworkInfo.hydrate(
+                    self._build_network_info_model(
+                        context, instance,
+                        neutron_ports=instance_ports[instance['uuid']],
+                        port_resources=port_resources,
+                        neutron_networks=networks))
+                base_api.update_instance_cache_with_nw_info(
+                    self, context, instance, nw_info, update_cells=False)
+            except Exception:
+                LOG.exception(_('Failed to get the network info of the '
+                                'instance.'), instance=instance)
+                continue
+            results[instance['uuid']] = nw_info
+        return results
+
     def _get_instance_nw_info(self, context, instance, networks=None,
                               port_ids=None):
         # keep this caching-free version of the get_instance_nw_info method
@@ -478,8 +543,12 @@ class API(base_api.NetworkAPI):
         return network_model.NetworkInfo.hydrate(nw_info)
 
     def _gather_port_ids_and_networks(self, context, instance, networks=None,
-                                      port_ids=None):
-        """Return an instance's complete list of port_ids and networks."""
+                                      port_ids=None, neutron_networks=None):
+        """Return an instance's complete list of port_ids and networks.
+
+        neutron_networks, if given, are the networks of the instance's
+        cached interfaces, already retrieved from neutron.
+        """
 
         if ((networks is None and port_ids is not None) or
             (port_ids is None and networks is not None)):
@@ -495,9 +564,11 @@ class API(base_api.NetworkAPI):
             net_ids = [iface['network']['id'] for iface in ifaces]
 
         if networks is None:
-            networks = self._get_available_networks(context,
-                                                    instance['project_id'],
-                                                    net_ids)
+            if neutron_networks is not None:
+                networks = neutron_networks
+            else:
+                networks = self._get_available_networks(
+                    context, instance['project_id'], net_ids)
         # an interface was added/removed from instance.
         else:
             # Since networks does not contain the existing networks on the
@@ -958,6 +1029,48 @@ class API(base_api.NetworkAPI):
                               {'fixed_ip': fixed_ip, 'port_id': port})
         return data['floatingips']
 
+    def _gather_port_resources(self, context, client, ports):
+        """Get the floating IPs, subnets and DHCP ports needed to build the
+        network info of ports, with one list call per resource type.
+
+        Returns a dict with the floating IPs keyed by (port id, fixed ip),
+        the subnets keyed by id and the DHCP ports keyed by network id.
+        """
+        resources = {'floatingips': {}, 'subnets': {}, 'dhcp_ports': {}}
+        port_ids = [port['id'] for port in ports]
+        if port_ids:
+            try:
+                data = client.list_floatingips(port_id=port_ids)
+            # If a neutron plugin does not implement the L3 API a 404 from
+            # list_floatingips will be raised.
+            except neutronv2.exceptions.NeutronClientException as e:
+                if e.status_code != 404:
+                    with excutils.save_and_reraise_exception():
+                        LOG.exception(_('Unable to access floating IPs for '
+                                        'ports %s'), port_ids)
+                data = {'floatingips': []}
+            for fip in data['floatingips']:
+                key = (fip['port_id'], fip['fixed_ip_address'])
+                resources['floatingips'].setdefault(key, []).append(fip)
+
+        subnet_ids = set(fixed_ip['subnet_id'] for port in ports
+                         for fixed_ip in port.get('fixed_ips', []))
+        if not subnet_ids:
+            return resources
+        data = neutronv2.get_client(context).list_subnets(id=list(subnet_ids))
+        for subnet in data.get('subnets', []):
+            resources['subnets'][subnet['id']] = subnet
+
+        network_ids = set(subnet['network_id']
+                          for subnet in resources['subnets'].values())
+        if network_ids:
+            data = neutronv2.get_client(context).list_ports(
+                network_id=list(network_ids), device_owner='network:dhcp')
+            for dhcp_port in data.get('ports', []):
+                resources['dhcp_ports'].setdefault(
+                    dhcp_port['network_id'], []).append(dhcp_port)
+        return resources
+
     def release_floating_ip(self, context, address,
                             affect_auto_assigned=False):
         """Remove a floating ip with the given address from a project."""
@@ -1019,12 +1132,16 @@ class API(base_api.NetworkAPI):
         """Force add a network to the project."""
         raise NotImplementedError()
 
-    def _nw_info_get_ips(self, client, port):
+    def _nw_info_get_ips(self, client, port, port_resources=None):
         network_IPs = []
         for fixed_ip in port['fixed_ips']:
             fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
-            floats = self._get_floating_ips_by_fixed_and_port(
-                client, fixed_ip['ip_address'], port['id'])
+            if port_resources is not None:
+                floats = port_resources['floatingips'].get(
+                    (port['id'], fixed_ip['ip_address']), [])
+            else:
+                floats = self._get_floating_ips_by_fixed_and_port(
+                    client, fixed_ip['ip_address'], port['id'])
             for ip in floats:
                 fip = network_model.IP(address=ip['floating_ip_address'],
                                        type='floating')
@@ -1032,8 +1149,9 @@ class API(base_api.NetworkAPI):
             network_IPs.append(fixed)
         return network_IPs
 
-    def _nw_info_get_subnets(self, context, port, network_IPs):
-        subnets = self._get_subnets_from_port(context, port)
+    def _nw_info_get_subnets(self, context, port, network_IPs,
+                             port_resources=None):
+        subnets = self._get_subnets_from_port(context, port, port_resources)
         for subnet in subnets:
             subnet['ips'] = [fixed_ip for fixed_ip in network_IPs
                              if fixed_ip.is_in_subnet(subnet)]
@@ -1089,7 +1207,8 @@ class API(base_api.NetworkAPI):
         return network, ovs_interfaceid
 
     def _build_network_info_model(self, context, instance, networks=None,
-                                  port_ids=None):
+                                  port_ids=None, neutron_ports=None,
+                                  port_resources=None, neutron_networks=None):
         """Return list of ordered VIFs attached to instance.
 
         :param context - request context.
@@ -1101,16 +1220,27 @@ class API(base_api.NetworkAPI):
                           instance in order of attachment. If value is None
                           this value will be populated from the existing
                           cached value.
+        :param neutron_ports - List of the instance's ports, if they were
+                               already retrieved from neutron.
+        :param port_resources - The floating IPs, subnets and DHCP ports of
+                                the instance's ports as returned by
+                                _gather_port_resources(), if they were
+                                already retrieved from neutron.
+        :param neutron_networks - The networks of the instance's cached
+                                  interfaces, in their order, if they were
+                                  already retrieved from neutron.
         """
 
-        search_opts = {'tenant_id': instance['project_id'],
-                       'device_id': instance['uuid'], }
         client = neutronv2.get_client(context, admin=True)
-        data = client.list_ports(**search_opts)
+        if neutron_ports is None:
+            search_opts = {'tenant_id': instance['project_id'],
+                           'device_id': instance['uuid'], }
+            data = client.list_ports(**search_opts)
+            neutron_ports = data.get('ports', [])
 
-        current_neutron_ports = data.get('ports', [])
+        current_neutron_ports = neutron_ports
         networks, port_ids = self._gather_port_ids_and_networks(
-                context, instance, networks, port_ids)
+                context, instance, networks, port_ids, neutron_networks)
         nw_info = network_model.NetworkInfo()
 
         current_neutron_port_map = {}
@@ -1118,6 +1248,12 @@ class API(base_api.NetworkAPI):
             current_neutron_port_map[current_neutron_port['id']] = (
                 current_neutron_port)
 
+        if port_resources is None:
+            port_resources = self._gather_port_resources(
+                context, client,
+                [current_neutron_port_map[port_id] for port_id in port_ids
+                 if port_id in current_neutron_port_map])
+
         for port_id in port_ids:
             current_neutron_port = current_neutron_port_map.get(port_id)
             if current_neutron_port:
@@ -1127,10 +1263,12 @@ class API(base_api.NetworkAPI):
                     vif_active = True
 
                 network_IPs = self._nw_info_get_ips(client,
-                                                    current_neutron_port)
+                                                    current_neutron_port,
+                                                    port_resources)
                 subnets = self._nw_info_get_subnets(context,
                                                     current_neutron_port,
-                                                    network_IPs)
+                                                    network_IPs,
+                                                    port_resources)
 
                 devname = "tap" + current_neutron_port['id']
                 devname = devname[:network_model.NIC_NAME_LEN]
@@ -1151,7 +1289,7 @@ class API(base_api.NetworkAPI):
 
         return nw_info
 
-    def _get_subnets_from_port(self, context, port):
+    def _get_subnets_from_port(self, context, port, port_resources=None):
         """Return the subnets for a given port."""
 
         fixed_ips = port['fixed_ips']
@@ -1162,38 +1300,57 @@ class API(base_api.NetworkAPI):
         # related to the port. To avoid this, the method returns here.
         if not fixed_ips:
             return []
+        if port_resources is not None:
+            subnet_ids = []
+            for ip in fixed_ips:
+                if ip['subnet_id'] not in subnet_ids:
+                    subnet_ids.append(ip['subnet_id'])
+            return [self._nw_info_build_subnet(
+                        port_resources['subnets'][subnet_id],
+                        port_resources['dhcp_ports'].get(
+                            port_resources['subnets'][subnet_id]
+                            ['network_id'], []))
+                    for subnet_id in subnet_ids
+                    if subnet_id in port_resources['subnets']]
+
         search_opts = {'id': [ip['subnet_id'] for ip in fixed_ips]}
         data = neutronv2.get_client(context).list_subnets(**search_opts)
         ipam_subnets = data.get('subnets', [])
         subnets = []
 
         for subnet in ipam_subnets:
-            subnet_dict = {'cidr': subnet['cidr'],
-                           'gateway': network_model.IP(
-                                address=subnet['gateway_ip'],
-                                type='gateway'),
-            }
-
             # attempt to populate DHCP server field
             search_opts = {'network_id': subnet['network_id'],
                            'device_owner': 'network:dhcp'}
             data = neutronv2.get_client(context).list_ports(**search_opts)
             dhcp_ports = data.get('ports', [])
-            for p in dhcp_ports:
-                for ip_pair in p['fixed_ips']:
-                    if ip_pair['subnet_id'] == subnet['id']:
-                        subnet_dict['dhcp_server'] = ip_pair['ip_address']
-                        break
-
-            subnet_object = network_model.Subnet(**subnet_dict)
-            for dns in subnet.get('dns_nameservers', []):
-                subnet_object.add_dns(
-                    network_model.IP(address=dns, type='dns'))
-
-            # TODO(gongysh) get the routes for this subnet
-            subnets.append(subnet_object)
+            subnets.append(self._nw_info_build_subnet(subnet, dhcp_ports))
         return subnets
 
+    def _nw_info_build_subnet(self, subnet, dhcp_ports):
+        """Return the Subnet model of a neutron subnet, given the DHCP ports
+        of its network.
+        """
+        subnet_dict = {'cidr': subnet['cidr'],
+                       'gateway': network_model.IP(
+                            address=subnet['gateway_ip'],
+                            type='gateway'),
+        }
+
+        for p in dhcp_ports:
+            for ip_pair in p['fixed_ips']:
+                if ip_pair['subnet_id'] == subnet['id']:
+                    subnet_dict['dhcp_server'] = ip_pair['ip_address']
+                    break
+
+        subnet_object = network_model.Subnet(**subnet_dict)
+        for dns in subnet.get('dns_nameservers', []):
+            subnet_object.add_dns(
+                network_model.IP(address=dns, type='dns'))
+
+        # TODO(gongysh) get the routes for this subnet
+        return subnet_object
+
     def get_dns_domains(self, context):
         """Return a list of available dns domains.
 
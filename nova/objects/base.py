@@ -226,6 +226,23 @@ class NovaObject(object):
                                                   objver=objver,
                                                   supported=latest_ver)
 
+    @classmethod
+    def _obj_get_codec(cls):
+        """Return the (name, attrname, field, to_primitive, from_primitive)
+        tuples describing how to (de)serialize each field of this class.
+
+        This is built once per class; the converters are None for fields
+        whose values are already primitives.
+        """
+        codec = cls.__dict__.get('_obj_codec')
+        if codec is None:
+            codec = tuple((name, get_attrname(name), field,
+                           field.primitive_converter('to_primitive'),
+                           field.primitive_converter('from_primitive'))
+                          for name, field in cls.fields.items())
+            cls._obj_codec = codec
+        return codec
+
     @classmethod
     def _obj_from_primitive(cls, context, objver, primitive):
         self = cls()
@@ -233,10 +250,21 @@ class NovaObject(object):
         self.VERSION = objver
         objdata = primitive['nova_object.data']
         changes = primitive.get('nova_object.changes', [])
-        for name, field in self.fields.items():
-            if name in objdata:
-                setattr(self, name, field.from_primitive(self, name,
-                                                         objdata[name]))
+        # This is the equivalent of setting each field through its property,
+        # without the change tracking that is reset below anyway.
+        for name, attrname, field, _to_prim, from_prim in cls._obj_get_codec():
+            if name not in objdata:
+                continue
+            value = objdata[name]
+            if from_prim is not None:
+                value = from_prim(self, name, value)
+            try:
+                setattr(self, attrname, field.coerce(self, name, value))
+            except Exception:
+                attr = "%s.%s" % (self.obj_name(), name)
+                LOG.exception(_('Error setting %(attr)s') %
+                              {'attr': attr})
+                raise
         self._changed_fields = set([x for x in changes if x in self.fields])
         return self
 
@@ -295,21 +323,27 @@ class NovaObject(object):
     def obj_to_primitive(self, target_version=None):
         """Simple base-case dehydration.
 
-        This calls to_primitive() for each item in fields.
+        This calls to_primitive() for each set field whose values need
+        converting, as determined once per class by _obj_get_codec().
         """
         primitive = dict()
-        for name, field in self.fields.items():
-            if self.obj_attr_is_set(name):
-                primitive[name] = field.to_primitive(self, name,
-                                                     getattr(self, name))
+        for name, attrname, _field, to_prim, _from_prim in (
+                self._obj_get_codec()):
+            if not hasattr(self, attrname):
+                continue
+            value = getattr(self, attrname)
+            if to_prim is not None:
+                value = to_prim(self, name, value)
+            primitive[name] = value
         if target_version:
             self.obj_make_compatible(primitive, target_version)
         obj = {'nova_object.name': self.obj_name(),
                'nova_object.namespace': 'nova',
                'nova_object.version': target_version or self.VERSION,
                'nova_object.data': primitive}
-        if self.obj_what_changed():
-            obj['nova_object.changes'] = list(self.obj_what_changed())
+        changes = self.obj_what_changed()
+        if changes:
+            obj['nova_object.changes'] = list(changes)
         return obj
 
     def obj_load_attr(self, attrname):
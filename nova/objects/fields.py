@@ -24,6 +24,12 @@ from nova.openstack.common.gettextutils import _
 from nova.openstack.common import timeutils
 
 
+def _defining_class(cls, attr):
+    for klass in cls.__mro__:
+        if attr in klass.__dict__:
+            return klass
+
+
 class KeyTypeError(TypeError):
     def __init__(self, expected, value):
         super(KeyTypeError, self).__init__(
@@ -94,6 +100,15 @@ class AbstractFieldType(six.with_metaclass(abc.ABCMeta, object)):
         """Returns a string describing the type of the field."""
         pass
 
+    def primitive_converter(self, method):
+        """Return the function implementing method for serializers.
+
+        :param:method: Either 'to_primitive' or 'from_primitive'
+        :returns: A function taking (obj, attr, value), or None if values
+                  of this type are their own primitive form
+        """
+        return getattr(self, method)
+
 
 class FieldType(AbstractFieldType):
     @staticmethod
@@ -111,6 +126,11 @@ class FieldType(AbstractFieldType):
     def describe(self):
         return self.__class__.__name__
 
+    def primitive_converter(self, method):
+        if _defining_class(self.__class__, method) is FieldType:
+            return None
+        return getattr(self, method)
+
 
 class UnspecifiedDefault(object):
     pass
@@ -199,6 +219,25 @@ class Field(object):
         else:
             return self._type.to_primitive(obj, attr, value)
 
+    def primitive_converter(self, method):
+        """Return a function equivalent to to_primitive() or
+        from_primitive(), or None if values need no conversion.
+
+        Serializers use this to skip the per-value calls for the (common)
+        fields whose values are already primitives.
+        """
+        if _defining_class(self.__class__, method) is not Field:
+            return getattr(self, method)
+        convert = self._type.primitive_converter(method)
+        if convert is None:
+            return None
+
+        def converter(obj, attr, value):
+            if value is None:
+                return None
+            return convert(obj, attr, value)
+        return converter
+
     def describe(self):
         """Return a short string describing the type of this field."""
         name = self._type.describe()
@@ -357,6 +396,11 @@ class List(CompoundFieldType):
     def from_primitive(self, obj, attr, value):
         return [self._element_type.from_primitive(obj, attr, x) for x in value]
 
+    def primitive_converter(self, method):
+        if self._element_type.primitive_converter(method) is not None:
+            return getattr(self, method)
+        return lambda obj, attr, value: list(value)
+
 
 class Dict(CompoundFieldType):
     def coerce(self, obj, attr, value):
@@ -387,6 +431,11 @@ class Dict(CompoundFieldType):
                 obj, '%s["%s"]' % (attr, key), element)
         return concrete
 
+    def primitive_converter(self, method):
+        if self._element_type.primitive_converter(method) is not None:
+            return getattr(self, method)
+        return lambda obj, attr, value: dict(value)
+
 
 class Object(FieldType):
     def __init__(self, obj_name, **kwargs):
@@ -21,6 +21,7 @@ from nova import notifications
 from nova.objects import base
 from nova.objects import fields
 from nova.objects import flavor as flavor_obj
+from nova.objects import instance_action
 from nova.objects import instance_fault
 from nova.objects import instance_info_cache
 from nova.objects import pci_device
@@ -169,6 +170,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
     def __init__(self, *args, **kwargs):
         super(Instance, self).__init__(*args, **kwargs)
         self._reset_metadata_tracking()
+        self._decoded_flavors = {}
 
     def _reset_metadata_tracking(self, fields=None):
         if fields is None or 'system_metadata' in fields:
@@ -329,6 +331,14 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
         if self.obj_attr_is_set('id'):
             raise exception.ObjectActionError(action='create',
                                               reason='already created')
+        updates, expected_attrs = self._get_create_updates()
+        db_inst = db.instance_create(context, updates)
+        Instance._from_db_object(context, self, db_inst, expected_attrs)
+
+    def _get_create_updates(self):
+        """Return the values to create the instance with in the database,
+        along with the attributes they will populate.
+        """
         updates = self.obj_get_changes()
         updates.pop('id', None)
         expected_attrs = [attr for attr in INSTANCE_DEFAULT_FIELDS
@@ -340,8 +350,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
             updates['info_cache'] = {
                 'network_info': updates['info_cache'].network_info.json()
                 }
-        db_inst = db.instance_create(context, updates)
-        Instance._from_db_object(context, self, db_inst, expected_attrs)
+        return updates, expected_attrs
 
     @base.remotable
     def destroy(self, context):
@@ -531,6 +540,16 @@ class Instance(base.NovaPersistentObject, base.NovaObject):
                 action='obj_load_attr',
                 reason='loading %s requires recursion' % attrname)
 
+    def decode_flavor_info(self, value):
+        """Decode a compact flavor from system_metadata, once per value.
+
+        Called by flavors.extract_flavor(); the decoded flavors are kept on
+        this object and dropped along with it.
+        """
+        if value not in self._decoded_flavors:
+            self._decoded_flavors[value] = flavors.decode_flavor_info(value)
+        return dict(self._decoded_flavors[value])
+
     def get_flavor(self, namespace=None):
         prefix = ('%s_' % namespace) if namespace is not None else ''
 
@@ -604,7 +623,8 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     # Version 1.4: Instance <= version 1.12
     # Version 1.5: Added method get_active_by_window_joined.
     # Version 1.6: Instance <= version 1.13
-    VERSION = '1.6'
+    # Version 1.7: Added create()
+    VERSION = '1.7'
 
     fields = {
         'objects': fields.ListOfObjectsField('Instance'),
@@ -617,6 +637,7 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         '1.4': '1.12',
         '1.5': '1.12',
         '1.6': '1.13',
+        '1.7': '1.13',
         }
 
     @base.remotable_classmethod
@@ -713,6 +734,42 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
     def get_by_security_group(cls, context, security_group):
         return cls.get_by_security_group_id(context, security_group.id)
 
+    @base.remotable_classmethod
+    def create(cls, context, instances, block_device_mappings=None,
+               action=None):
+        """Create the given instances in the database at once.
+
+        This is the bulk counterpart of Instance.create(). The
+        block_device_mappings, a list of dicts of values, are created for
+        every instance and the named instance action, if any, is started
+        for each of them. The created instances are returned in a new
+        InstanceList.
+        """
+        values_list = []
+        expected_attrs = []
+        for instance in instances:
+            if instance.obj_attr_is_set('id'):
+                raise exception.ObjectActionError(action='create',
+                                                  reason='already created')
+            updates, attrs = instance._get_create_updates()
+            values_list.append(updates)
+            expected_attrs.append(attrs)
+        action_values = None
+        if action is not None:
+            action_values = instance_action.InstanceAction.pack_action_start(
+                context, None, action)
+        db_insts = db.instance_create_many(
+            context, values_list, block_device_mappings=block_device_mappings,
+            action=action_values)
+        inst_list = cls()
+        inst_list.objects = []
+        for instance, db_inst, attrs in zip(instances, db_insts,
+                                            expected_attrs):
+            inst_list.objects.append(
+                Instance._from_db_object(context, instance, db_inst, attrs))
+        inst_list.obj_reset_changes()
+        return inst_list
+
     def fill_faults(self):
         """Batch query the database for our instances' faults.
 
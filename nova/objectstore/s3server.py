@@ -34,6 +34,8 @@ S3 client with this module::
 
 import bisect
 import datetime
+import hashlib
+import itertools
 import os
 import os.path
 import urllib
@@ -42,6 +44,7 @@ from oslo.config import cfg
 import routes
 import six
 import webob
+from webob import static
 
 from nova.openstack.common import fileutils
 from nova import paths
@@ -64,6 +67,9 @@ s3_opts = [
 CONF = cfg.CONF
 CONF.register_opts(s3_opts)
 
+# Size of the chunks objects are read and written in
+CHUNK_SIZE = 65536
+
 
 def get_wsgi_server():
     return wsgi.Server("S3 Objectstore",
@@ -94,8 +100,51 @@ class S3Application(wsgi.Router):
         self.directory = os.path.abspath(root_directory)
         fileutils.ensure_tree(self.directory)
         self.bucket_depth = bucket_depth
+        # bucket name -> sorted list of its object names
+        self._indexes = {}
         super(S3Application, self).__init__(mapper)
 
+    def get_object_names(self, bucket_name):
+        """Return the sorted list of the object names of a bucket.
+
+        The list is built by walking the bucket the first time it is needed,
+        and then kept current by add_object_name() and remove_object_name(),
+        so it must not be modified by the caller.
+        """
+        object_names = self._indexes.get(bucket_name)
+        if object_names is None:
+            path = os.path.join(self.directory, bucket_name)
+            object_names = []
+            for root, dirs, files in os.walk(path):
+                for file_name in files:
+                    object_names.append(os.path.join(root, file_name))
+            skip = len(path) + 1
+            for i in range(self.bucket_depth):
+                skip += 2 * (i + 1) + 1
+            object_names = [n[skip:] for n in object_names]
+            object_names.sort()
+            self._indexes[bucket_name] = object_names
+        return object_names
+
+    def add_object_name(self, bucket_name, object_name):
+        object_names = self._indexes.get(bucket_name)
+        if object_names is None:
+            return
+        index = bisect.bisect_left(object_names, object_name)
+        if index == len(object_names) or object_names[index] != object_name:
+            object_names.insert(index, object_name)
+
+    def remove_object_name(self, bucket_name, object_name):
+        object_names = self._indexes.get(bucket_name)
+        if object_names is None:
+            return
+        index = bisect.bisect_left(object_names, object_name)
+        if index < len(object_names) and object_names[index] == object_name:
+            del object_names[index]
+
+    def remove_index(self, bucket_name):
+        self._indexes.pop(bucket_name, None)
+
 
 class BaseRequestHandler(object):
     """Base class emulating Tornado's web framework pattern in WSGI.
@@ -240,15 +289,7 @@ class BucketHandler(BaseRequestHandler):
                 not os.path.isdir(path)):
             self.set_404()
             return
-        object_names = []
-        for root, dirs, files in os.walk(path):
-            for file_name in files:
-                object_names.append(os.path.join(root, file_name))
-        skip = len(path) + 1
-        for i in range(self.application.bucket_depth):
-            skip += 2 * (i + 1) + 1
-        object_names = [n[skip:] for n in object_names]
-        object_names.sort()
+        object_names = self.application.get_object_names(bucket_name)
         contents = []
 
         start_pos = 0
@@ -258,7 +299,7 @@ class BucketHandler(BaseRequestHandler):
             start_pos = bisect.bisect_left(object_names, prefix, start_pos)
 
         truncated = False
-        for object_name in object_names[start_pos:]:
+        for object_name in itertools.islice(object_names, start_pos, None):
             if not object_name.startswith(prefix):
                 break
             if len(contents) >= max_keys:
@@ -305,6 +346,7 @@ class BucketHandler(BaseRequestHandler):
             self.set_status(403)
             return
         os.rmdir(path)
+        self.application.remove_index(bucket_name)
         self.set_status(204)
         self.finish()
 
@@ -331,11 +373,11 @@ class ObjectHandler(BaseRequestHandler):
         self.set_header("Content-Type", "application/unknown")
         self.set_header("Last-Modified", datetime.datetime.utcfromtimestamp(
             info.st_mtime))
-        object_file = open(path, "r")
-        try:
-            self.finish(object_file.read())
-        finally:
-            object_file.close()
+        self.set_header("Accept-Ranges", "bytes")
+        # Stream the object, serving Range requests from the file as well.
+        self.response.app_iter = static.FileIter(open(path, "rb"))
+        self.response.content_length = info.st_size
+        self.response.conditional_response = True
 
     def put(self, bucket, object_name):
         object_name = urllib.unquote(object_name)
@@ -351,11 +393,17 @@ class ObjectHandler(BaseRequestHandler):
             return
         directory = os.path.dirname(path)
         fileutils.ensure_tree(directory)
-        object_file = open(path, "w")
-        object_file.write(self.request.body)
-        object_file.close()
-        self.set_header('ETag',
-                        '"%s"' % utils.get_hash_str(self.request.body))
+        etag = hashlib.md5()
+        body_file = self.request.body_file
+        with open(path, "wb") as object_file:
+            while True:
+                chunk = body_file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                etag.update(chunk)
+                object_file.write(chunk)
+        self.application.add_object_name(bucket, object_name)
+        self.set_header('ETag', '"%s"' % etag.hexdigest())
         self.finish()
 
     def delete(self, bucket, object_name):
@@ -366,5 +414,6 @@ class ObjectHandler(BaseRequestHandler):
             self.set_404()
             return
         os.unlink(path)
+        self.application.remove_object_name(bucket, object_name)
         self.set_status(204)
         self.finish()
@@ -15,6 +15,7 @@
 #    under the License.
 
 import collections
+import itertools
 
 from nova.compute import task_states
 from nova.compute import vm_states
@@ -75,17 +76,19 @@ class PciDevTracker(object):
                 self.stats.add_device(dev)
 
     def _filter_devices_for_spec(self, request_spec, pci_devs):
-        return [p for p in pci_devs
-                if pci_utils.pci_device_prop_match(p, request_spec)]
+        return (p for p in pci_devs
+                if pci_utils.pci_device_prop_match(p, request_spec))
 
     def _get_free_devices_for_request(self, pci_request, pci_devs):
         count = pci_request.get('count', 1)
         spec = pci_request.get('spec', [])
-        devs = self._filter_devices_for_spec(spec, pci_devs)
+        # Stop at the first count matching devices
+        devs = list(itertools.islice(
+            self._filter_devices_for_spec(spec, pci_devs), count))
         if len(devs) < count:
             return None
         else:
-            return devs[:count]
+            return devs
 
     @property
     def free_devs(self):
@@ -104,14 +107,15 @@ class PciDevTracker(object):
         entire request list will fail.
         """
         alloc = []
+        free_devs = self.free_devs
 
         for request in pci_requests:
-            available = self._get_free_devices_for_request(
-                request,
-                [p for p in self.free_devs if p not in alloc])
+            available = self._get_free_devices_for_request(request, free_devs)
             if not available:
                 return []
             alloc.extend(available)
+            if len(pci_requests) > 1:
+                free_devs = [p for p in free_devs if p not in available]
         return alloc
 
     @property
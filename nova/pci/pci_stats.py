@@ -14,8 +14,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import copy
-
 from nova import exception
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
@@ -54,6 +52,15 @@ class PciDeviceStats(object):
     def __init__(self, stats=None):
         super(PciDeviceStats, self).__init__()
         self.pools = jsonutils.loads(stats) if stats else []
+        # The pools of each (vendor_id, product_id), which differ in their
+        # extra_info only. There is usually a single one.
+        self._index = {}
+        for pool in self.pools:
+            self._index.setdefault(self._model(pool), []).append(pool)
+
+    @staticmethod
+    def _model(dev):
+        return dev.get('vendor_id'), dev.get('product_id')
 
     def _equal_properties(self, dev, entry):
         return all(dev.get(prop) == entry.get(prop)
@@ -61,7 +68,7 @@ class PciDeviceStats(object):
 
     def _get_first_pool(self, dev):
         """Return the first pool that matches dev."""
-        return next((pool for pool in self.pools
+        return next((pool for pool in self._index.get(self._model(dev), [])
                     if self._equal_properties(dev, pool)), None)
 
     def add_device(self, dev):
@@ -71,20 +78,24 @@ class PciDeviceStats(object):
             pool = dict((k, dev.get(k)) for k in self.pool_keys)
             pool['count'] = 0
             self.pools.append(pool)
+            self._index.setdefault(self._model(pool), []).append(pool)
         pool['count'] += 1
 
-    @staticmethod
-    def _decrease_pool_count(pool_list, pool, count=1):
+    def _decrease_pool_count(self, pool, count=1):
         """Decrement pool's size by count.
 
-        If pool becomes empty, remove pool from pool_list.
+        If pool becomes empty, remove pool from the pools.
         """
         if pool['count'] > count:
             pool['count'] -= count
             count = 0
         else:
             count -= pool['count']
-            pool_list.remove(pool)
+            self.pools.remove(pool)
+            model_pools = self._index[self._model(pool)]
+            model_pools.remove(pool)
+            if not model_pools:
+                del self._index[self._model(pool)]
         return count
 
     def consume_device(self, dev):
@@ -93,23 +104,36 @@ class PciDeviceStats(object):
         if not pool:
             raise exception.PciDevicePoolEmpty(
                 compute_node_id=dev.compute_node_id, address=dev.address)
-        self._decrease_pool_count(self.pools, pool)
-
-    @staticmethod
-    def _filter_pools_for_spec(pools, request_specs):
+        self._decrease_pool_count(pool)
+
+    def _filter_pools_for_spec(self, request_specs):
+        pools = self.pools
+        if len(request_specs) == 1:
+            # The common request for a device model only needs a look up
+            spec = request_specs[0]
+            if 'vendor_id' in spec and 'product_id' in spec:
+                pools = self._index.get(self._model(spec), [])
         return [pool for pool in pools
                 if pci_utils.pci_device_prop_match(pool, request_specs)]
 
-    def _apply_request(self, pools, request):
+    def _apply_request(self, request, used):
+        """Take the devices of request from the pools.
+
+        Rather than changing the pools, the number of devices taken from
+        each is added to used, which maps the id() of pools to counts.
+        """
         count = request['count']
-        matching_pools = self._filter_pools_for_spec(pools, request['spec'])
-        if sum([pool['count'] for pool in matching_pools]) < count:
+        free = [(pool, pool['count'] - used.get(id(pool), 0))
+                for pool in self._filter_pools_for_spec(request['spec'])]
+        if sum(pool_free for _pool, pool_free in free) < count:
             return False
-        else:
-            for pool in matching_pools:
-                count = self._decrease_pool_count(pools, pool, count)
-                if not count:
-                    break
+        for pool, pool_free in free:
+            taken = min(pool_free, count)
+            if taken:
+                used[id(pool)] = used.get(id(pool), 0) + taken
+                count -= taken
+            if not count:
+                break
         return True
 
     def support_requests(self, requests):
@@ -121,8 +145,13 @@ class PciDeviceStats(object):
         """
         # note (yjiang5): this function has high possibility to fail,
         # so no exception should be triggered for performance reason.
-        pools = copy.deepcopy(self.pools)
-        return all([self._apply_request(pools, r) for r in requests])
+        if len(requests) == 1:
+            # Nothing taken for one request can matter to another
+            request = requests[0]
+            pools = self._filter_pools_for_spec(request['spec'])
+            return sum(pool['count'] for pool in pools) >= request['count']
+        used = {}
+        return all(self._apply_request(r, used) for r in requests)
 
     def apply_requests(self, requests):
         """Apply PCI requests to the PCI stats.
@@ -130,8 +159,11 @@ class PciDeviceStats(object):
         This is used in multiple instance creation, when the scheduler has to
         maintain how the resources are consumed by the instances.
         """
-        if not all([self._apply_request(self.pools, r) for r in requests]):
+        used = {}
+        if not all(self._apply_request(r, used) for r in requests):
             raise exception.PciDeviceRequestFailed(requests=requests)
+        for pool in [pool for pool in self.pools if id(pool) in used]:
+            self._decrease_pool_count(pool, used[id(pool)])
 
     def __iter__(self):
         return iter(self.pools)
@@ -139,3 +171,4 @@ class PciDeviceStats(object):
     def clear(self):
         """Clear all the stats maintained."""
         self.pools = []
+        self._index = {}
@@ -954,6 +954,81 @@ class CloudTestCase(test.TestCase):
         db.service_destroy(self.context, comp1['id'])
         db.service_destroy(self.context, comp2['id'])
 
+    def test_describe_instances_bulk_lookups(self):
+        # Makes sure the instances are formatted with set-based lookups
+        # rather than per instance ones.
+        self._stub_instance_get_with_fixed_ips('get_all')
+
+        image_uuid = 'cedef40a-ed67-4d10-800e-17455edce175'
+        kernel_uuid = '76fa36fc-c930-4bf3-8c8a-ea2a2420deb6'
+        instances = []
+        for i in range(3):
+            sys_meta = flavors.save_flavor_info(
+                {}, flavors.get_flavor(1))
+            sys_meta['EC2_client_token'] = 'client-token-%d' % i
+            instances.append(db.instance_create(self.context,
+                {'reservation_id': 'a',
+                 'image_ref': image_uuid,
+                 'kernel_id': kernel_uuid,
+                 'instance_type_id': 1,
+                 'host': 'host%d' % (i % 2),
+                 'vm_state': 'active',
+                 'system_metadata': sys_meta}))
+        agg = db.aggregate_create(self.context,
+                {'name': 'agg1'}, {'availability_zone': 'zone1'})
+        db.aggregate_host_add(self.context, agg['id'], 'host1')
+        ec2_ids = [ec2utils.id_to_ec2_inst_id(inst['uuid'])
+                   for inst in instances]
+
+        def fail(*args, **kwargs):
+            self.fail('Unexpected per-instance lookup')
+
+        self.stubs.Set(db, 's3_image_get_by_uuid', fail)
+        self.stubs.Set(ec2utils, 'get_int_id_from_instance_uuid', fail)
+        self.stubs.Set(self.cloud, '_get_client_token', fail)
+        self.stubs.Set(db, 'aggregate_metadata_get_by_host', fail)
+        self.stubs.Set(db, 'block_device_mapping_get_all_by_instance', fail)
+
+        result = self.cloud.describe_instances(self.context)
+        result = result['reservationSet'][0]['instancesSet']
+        self.assertEqual(ec2_ids, [i['instanceId'] for i in result])
+        self.assertEqual(['zone1' if i % 2 else 'nova' for i in range(3)],
+                         [i['placement']['availabilityZone'] for i in result])
+        self.assertEqual(['client-token-%d' % i for i in range(3)],
+                         [i['clientToken'] for i in result])
+        for instance in result:
+            self.assertEqual('ami-00000001', instance['imageId'])
+            self.assertEqual('aki-00000002', instance['kernelId'])
+            self.assertEqual('instance-store', instance['rootDeviceType'])
+
+        for inst in instances:
+            db.instance_destroy(self.context, inst['uuid'])
+
+    def test_get_volumes(self):
+        volume_ids = ['vol-1', 'vol-2', None, 'vol-1']
+
+        def fail(*args, **kwargs):
+            self.fail('Unexpected volume listing')
+
+        self.stubs.Set(self.cloud.volume_api, 'get_all', fail)
+        with mock.patch.object(self.cloud.volume_api, 'get',
+                               side_effect=lambda ctxt, vol_id:
+                               {'id': vol_id}) as get:
+            volumes = self.cloud._get_volumes(self.context, volume_ids)
+        self.assertEqual({'vol-1': {'id': 'vol-1'},
+                          'vol-2': {'id': 'vol-2'}}, volumes)
+        self.assertEqual(2, get.call_count)
+
+    def test_get_volumes_listed(self):
+        self.stubs.Set(cloud, '_VOLUME_LISTING_THRESHOLD', 2)
+        self.stubs.Set(self.cloud.volume_api, 'get_all',
+                       lambda ctxt: [{'id': 'vol-1'}, {'id': 'vol-2'},
+                                     {'id': 'vol-3'}])
+        self.assertEqual({'vol-1': {'id': 'vol-1'},
+                          'vol-2': {'id': 'vol-2'}},
+                         self.cloud._get_volumes(self.context,
+                                                 ['vol-1', 'vol-2']))
+
     def test_describe_instances_all_invalid(self):
         # Makes sure describe_instances works and filters results.
         self.flags(use_ipv6=True)
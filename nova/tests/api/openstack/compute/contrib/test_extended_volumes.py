@@ -14,6 +14,7 @@
 #    under the License.
 
 from lxml import etree
+import mock
 import webob
 
 from nova.api.openstack.compute.contrib import extended_volumes
@@ -53,6 +54,16 @@ def fake_bdms_get_all_by_instance(*args, **kwargs):
              'destination_type': 'volume', 'id': 2})]
 
 
+def fake_bdms_get_all_by_instance_uuids(context, instance_uuids,
+                                        use_slave=False):
+    bdms = []
+    for instance_uuid in instance_uuids:
+        for bdm in fake_bdms_get_all_by_instance():
+            bdm['instance_uuid'] = instance_uuid
+            bdms.append(bdm)
+    return bdms
+
+
 class ExtendedVolumesTest(test.TestCase):
     content_type = 'application/json'
     prefix = 'os-extended-volumes:'
@@ -64,6 +75,8 @@ class ExtendedVolumesTest(test.TestCase):
         self.stubs.Set(compute.api.API, 'get_all', fake_compute_get_all)
         self.stubs.Set(db, 'block_device_mapping_get_all_by_instance',
                        fake_bdms_get_all_by_instance)
+        self.stubs.Set(db, 'block_device_mapping_get_all_by_instance_uuids',
+                       fake_bdms_get_all_by_instance_uuids)
         self.flags(
             osapi_compute_extension=[
                 'nova.api.openstack.compute.contrib.select_extensions'],
@@ -111,6 +124,16 @@ class ExtendedVolumesTest(test.TestCase):
                           server.findall('%svolume_attached' % self.prefix)]
             self.assertEqual(exp_volumes, actual)
 
+    def test_detail_prefetches_bdms(self):
+        self.stubs.Set(db, 'block_device_mapping_get_all_by_instance',
+                       self.fail)
+        with mock.patch.object(
+                db, 'block_device_mapping_get_all_by_instance_uuids',
+                side_effect=fake_bdms_get_all_by_instance_uuids) as mock_get:
+            res = self._make_request('/v2/fake/servers/detail')
+        self.assertEqual(res.status_int, 200)
+        self.assertEqual(1, mock_get.call_count)
+
 
 class ExtendedVolumesXmlTest(ExtendedVolumesTest):
     content_type = 'application/xml'
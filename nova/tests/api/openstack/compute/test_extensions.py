@@ -14,6 +14,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
+import fixtures
 import iso8601
 from lxml import etree
 from oslo.config import cfg
@@ -26,12 +29,15 @@ from nova.api.openstack import wsgi
 from nova.api.openstack import xmlutil
 from nova import exception
 from nova.openstack.common import jsonutils
+from nova.openstack.common import log as logging
 import nova.policy
 from nova import test
+from nova.tests.api.openstack.compute import extensions as test_extensions
 from nova.tests.api.openstack import fakes
 from nova.tests import matchers
 
 CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
 
 NS = "{http://docs.openstack.org/common/api/v1.0}"
 ATOMNS = "{http://www.w3.org/2005/Atom}"
@@ -444,6 +450,85 @@ class ExtensionManagerTest(ExtensionTestCase):
         self.assertFalse(ext_mgr.is_loaded('THIRD'))
 
 
+class ManifestExtensionManager(base_extensions.ExtensionManager):
+    def __init__(self, manifest_path):
+        self.cls_list = []
+        self.extensions = {}
+        self.sorted_ext_list = None
+        base_extensions.load_standard_extensions(
+            self, LOG, test_extensions.__path__, test_extensions.__name__,
+            manifest_path=manifest_path)
+
+
+class LazyExtensionTest(ExtensionTestCase):
+
+    def setUp(self):
+        super(LazyExtensionTest, self).setUp()
+        self.manifest_path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'manifest.json')
+        self.classpath = test_extensions.__name__ + '.foxinsocks.Foxinsocks'
+
+    def _read_manifest(self):
+        with open(self.manifest_path) as f:
+            return jsonutils.load(f)
+
+    def _get_response(self, app, url, body=None):
+        request = webob.Request.blank(url)
+        if body is not None:
+            request.method = 'POST'
+            request.content_type = 'application/json'
+            request.body = jsonutils.dumps(body)
+        return request.get_response(app)
+
+    def test_manifest_written(self):
+        ext_mgr = ManifestExtensionManager(self.manifest_path)
+        ext = ext_mgr.extensions['FOXNSOX']
+        self.assertNotIsInstance(ext, base_extensions.LazyExtension)
+
+        entry = self._read_manifest()[self.classpath]
+        self.assertEqual(1, len(entry['extensions']))
+        ext_entry = entry['extensions'][0]
+        self.assertEqual('FOXNSOX', ext_entry['alias'])
+        self.assertEqual('foxnsocks',
+                         ext_entry['resources'][0]['collection'])
+        self.assertEqual(['servers', 'flavors', 'flavors'],
+                         ext_entry['controller_extensions'])
+
+    def test_extension_loaded_on_first_request(self):
+        ManifestExtensionManager(self.manifest_path)
+        ext_mgr = ManifestExtensionManager(self.manifest_path)
+        ext = ext_mgr.extensions['FOXNSOX']
+        self.assertIsInstance(ext, base_extensions.LazyExtension)
+        self.assertEqual('The Fox In Socks Extension.', ext.__doc__)
+
+        app = compute.APIRouter(ext_mgr=ext_mgr,
+                                init_only=('servers', 'foxnsocks'))
+        self.assertIsNone(ext._extension)
+
+        response = self._get_response(app, '/fake/foxnsocks')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(response_body, response.body)
+        self.assertIsNotNone(ext._extension)
+
+        response = self._get_response(app, '/fake/servers/abcd/action',
+                                      dict(add_tweedle=dict(name='test')))
+        self.assertEqual(200, response.status_int)
+        self.assertEqual('Tweedle Beetle Added.', response.body)
+
+    def test_out_of_date_manifest(self):
+        ManifestExtensionManager(self.manifest_path)
+        manifest = self._read_manifest()
+        manifest[self.classpath]['fingerprint'] = [0, 0]
+        with open(self.manifest_path, 'w') as f:
+            f.write(jsonutils.dumps(manifest))
+
+        ext_mgr = ManifestExtensionManager(self.manifest_path)
+        self.assertNotIsInstance(ext_mgr.extensions['FOXNSOX'],
+                                 base_extensions.LazyExtension)
+        self.assertNotEqual(
+            [0, 0], self._read_manifest()[self.classpath]['fingerprint'])
+
+
 class ActionExtensionTest(ExtensionTestCase):
 
     def _send_server_action_request(self, url, body):
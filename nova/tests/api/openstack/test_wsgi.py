@@ -1039,6 +1039,53 @@ class ResourceTest(test.NoDBTestCase):
         self.assertEqual(called, [2])
         self.assertEqual(response, 'foo')
 
+    def test_prefetch(self):
+        class Controller(wsgi.Controller):
+            @wsgi.prefetcher('pants')
+            def _prefetch_pants(self, req):
+                called.append('pants')
+                req.cache_prefetched_items('pants', {'id1': ['fancy']})
+
+            @wsgi.prefetcher('shirts')
+            def _prefetch_shirts(self, req):
+                called.append('shirts')
+
+            def index(self, req):
+                return {}
+
+        class ControllerExtended(wsgi.Controller):
+            @wsgi.extends(prefetch=['pants', 'socks'])
+            def index(self, req, resp_obj):
+                seen.append(req.get_prefetched_items('pants', 'id1'))
+                seen.append(req.get_prefetched_items('pants', 'id2'))
+                seen.append(req.get_prefetched_items('socks', 'id1'))
+
+        called = []
+        seen = []
+        resource = wsgi.Resource(Controller())
+        resource.register_extensions(ControllerExtended())
+        req = wsgi.Request.blank('/tests')
+        response = resource._process_stack(req, 'index', {}, None, '',
+                                           'application/json')
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(['pants'], called)
+        self.assertEqual([['fancy'], None, None], seen)
+
+    def test_prefetch_fault(self):
+        class Controller(wsgi.Controller):
+            @wsgi.prefetcher('pants')
+            def _prefetch_pants(self, req):
+                raise webob.exc.HTTPBadRequest()
+
+        def extension(req, resp_obj):
+            pass
+        extension.wsgi_prefetch = ('pants',)
+
+        resource = wsgi.Resource(Controller())
+        response = resource.prefetch([extension], None)
+        self.assertIsInstance(response, wsgi.Fault)
+        self.assertEqual(400, response.status_int)
+
     def test_resource_exception_handler_type_error(self):
         # A TypeError should be translated to a Fault/HTTP 400.
         def foo(a,):
@@ -748,6 +748,43 @@ class TemplateTest(test.NoDBTestCase):
         self.assertEqual(result[0].tag, 'image')
         self.assertEqual(result[0].get('id'), str(obj['test']['image']))
 
+    def test_serialize_reuses_render_plan(self):
+        root = xmlutil.TemplateElement('test', selector='test')
+        xmlutil.SubTemplateElement(root, 'name', selector='name').text = \
+            xmlutil.Selector()
+        root_slave = xmlutil.TemplateElement('test', selector='test')
+        xmlutil.SubTemplateElement(root_slave, 'image', selector='image',
+                                   id='id')
+        slave = xmlutil.SlaveTemplate(root_slave, 1)
+        obj = {'test': {'name': 'foobar', 'image': {'id': 42}}}
+
+        master = xmlutil.MasterTemplate(root, 1)
+        master.attach(slave)
+        expected = master.serialize(obj)
+        self.assertEqual(1, len(root._plans))
+        plan = root._plans[(root_slave,)]
+
+        # A copy with the same slaves attached renders from the same plan
+        master = xmlutil.MasterTemplate(root, 1)
+        master.attach(slave)
+        self.assertEqual(expected, master.serialize(obj))
+        self.assertIs(plan, root._plans[(root_slave,)])
+
+        # Without the slave, a separate plan is used
+        master = xmlutil.MasterTemplate(root, 1)
+        self.assertNotIn('image', master.serialize(obj))
+        self.assertEqual(2, len(root._plans))
+
+    def test_serialize_after_template_change(self):
+        root = xmlutil.TemplateElement('test', selector='test')
+        master = xmlutil.MasterTemplate(root, 1)
+        obj = {'test': {'name': 'foobar'}}
+        self.assertNotIn('name', master.serialize(obj))
+
+        xmlutil.SubTemplateElement(root, 'name', selector='name').text = \
+            xmlutil.Selector()
+        self.assertIn('<name>foobar</name>', master.serialize(obj))
+
 
 class MasterTemplateBuilder(xmlutil.TemplateBuilder):
     def construct(self):
@@ -1654,6 +1654,25 @@ class CellsBroadcastMethodsTestCase(test.TestCase):
         self.src_msg_runner.bw_usage_update_at_top(self.ctxt,
                                                    fake_bw_update_info)
 
+    def test_bw_usage_update_bulk_at_top(self):
+        # Shouldn't be called for these 2 cells
+        self.mox.StubOutWithMock(self.src_db_inst, 'bw_usage_update_bulk')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'bw_usage_update_bulk')
+
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'bw_usage_update_bulk')
+        self.tgt_db_inst.bw_usage_update_bulk(self.ctxt,
+                                              'fake_start_period',
+                                              ['fake_usage'],
+                                              last_refreshed='fake_refreshed',
+                                              update_cells=False)
+
+        self.mox.ReplayAll()
+
+        self.src_msg_runner.bw_usage_update_bulk_at_top(self.ctxt,
+                                                        'fake_start_period',
+                                                        ['fake_usage'],
+                                                        'fake_refreshed')
+
     def test_sync_instances(self):
         # Reset this, as this is a broadcast down.
         self._setup_attrs(up=False)
@@ -252,6 +252,19 @@ class CellsAPITestCase(test.NoDBTestCase):
         self._check_result(call_info, 'bw_usage_update_at_top',
                 expected_args)
 
+    def test_bw_usage_update_bulk_at_top(self):
+        call_info = self._stub_rpc_method('cast', None)
+
+        self.cells_rpcapi.bw_usage_update_bulk_at_top(
+                self.fake_context, 'fake_start_period', ['fake_usage'],
+                last_refreshed='fake_refreshed')
+
+        expected_args = {'start_period': 'fake_start_period',
+                         'usages': ['fake_usage'],
+                         'last_refreshed': 'fake_refreshed'}
+        self._check_result(call_info, 'bw_usage_update_bulk_at_top',
+                expected_args, version='1.28')
+
     def test_get_cell_info_for_neighbors(self):
         call_info = self._stub_rpc_method('call', 'fake_response')
         result = self.cells_rpcapi.get_cell_info_for_neighbors(
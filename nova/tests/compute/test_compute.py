@@ -40,6 +40,7 @@ from nova import block_device
 from nova import compute
 from nova.compute import api as compute_api
 from nova.compute import flavors
+from nova.compute import instance_actions
 from nova.compute import manager as compute_manager
 from nova.compute import power_state
 from nova.compute import rpcapi as compute_rpcapi
@@ -57,6 +58,7 @@ from nova.network.security_group import openstack_driver
 from nova.objects import base as obj_base
 from nova.objects import block_device as block_device_obj
 from nova.objects import compute_node as compute_node_obj
+from nova.objects import external_event as external_event_obj
 from nova.objects import instance as instance_obj
 from nova.objects import instance_action as instance_action_obj
 from nova.objects import instance_group as instance_group_obj
@@ -614,6 +616,52 @@ class ComputeVolumeTestCase(BaseTestCase):
         self.compute._poll_bandwidth_usage(ctxt)
         self.mox.UnsetStubs()
 
+    def test_poll_bandwidth_usage(self):
+        ctxt = context.get_admin_context()
+        self.flags(bandwidth_poll_interval=1)
+        counters = [{'uuid': 'uuid1', 'mac_address': 'mac1',
+                     'bw_in': 100, 'bw_out': 50},
+                    {'uuid': 'uuid1', 'mac_address': 'mac2',
+                     'bw_in': 10, 'bw_out': 20},
+                    {'uuid': 'uuid2', 'mac_address': 'mac1',
+                     'bw_in': 5, 'bw_out': 5}]
+        usages = [{'uuid': 'uuid1', 'mac': 'mac1', 'bw_in': 1000,
+                   'bw_out': 2000, 'last_ctr_in': 40, 'last_ctr_out': 80}]
+        prev_usages = [{'uuid': 'uuid1', 'mac': 'mac2', 'bw_in': 7,
+                        'bw_out': 7, 'last_ctr_in': 4, 'last_ctr_out': 8}]
+
+        with contextlib.nested(
+            mock.patch.object(utils, 'last_completed_audit_period',
+                              return_value=('prev', 'start')),
+            mock.patch.object(instance_obj.InstanceList, 'get_by_host',
+                              return_value=[]),
+            mock.patch.object(self.compute.driver, 'get_all_bw_counters',
+                              return_value=counters),
+            mock.patch.object(self.compute.conductor_api,
+                              'bw_usage_get_bulk',
+                              side_effect=[usages, prev_usages]),
+            mock.patch.object(self.compute.conductor_api,
+                              'bw_usage_update_bulk')
+        ) as (mock_audit, mock_get_by_host, mock_counters, mock_get_bulk,
+              mock_update_bulk):
+            self.compute._poll_bandwidth_usage(ctxt)
+
+        # The previous period is only read for the counters not found
+        self.assertEqual(
+            [mock.call(ctxt, 'start', [('uuid1', 'mac1'), ('uuid1', 'mac2'),
+                                       ('uuid2', 'mac1')]),
+             mock.call(ctxt, 'prev', [('uuid1', 'mac2'), ('uuid2', 'mac1')])],
+            mock_get_bulk.call_args_list)
+        mock_update_bulk.assert_called_once_with(
+            ctxt, 'start',
+            [{'uuid': 'uuid1', 'mac': 'mac1', 'bw_in': 1060, 'bw_out': 2050,
+              'last_ctr_in': 100, 'last_ctr_out': 50},
+             {'uuid': 'uuid1', 'mac': 'mac2', 'bw_in': 6, 'bw_out': 12,
+              'last_ctr_in': 10, 'last_ctr_out': 20},
+             {'uuid': 'uuid2', 'mac': 'mac1', 'bw_in': 0, 'bw_out': 0,
+              'last_ctr_in': 5, 'last_ctr_out': 5}],
+            last_refreshed=mock.ANY, update_cells=True)
+
     @mock.patch.object(instance_obj.InstanceList, 'get_by_host')
     @mock.patch.object(block_device_obj.BlockDeviceMappingList,
                        'get_by_instance_uuid')
@@ -5894,7 +5942,8 @@ class ComputeTestCase(BaseTestCase):
 
     def test_heal_instance_info_cache(self):
         # Update on every call for the test
-        self.flags(heal_instance_info_cache_interval=-1)
+        self.flags(heal_instance_info_cache_interval=-1,
+                   heal_instance_info_cache_batch_size=2)
         ctxt = context.get_admin_context()
 
         instance_map = {}
@@ -5906,8 +5955,8 @@ class ComputeTestCase(BaseTestCase):
             # These won't be in our instance since they're not requested
             instances.append(instance_map[inst_uuid])
 
-        call_info = {'get_all_by_host': 0, 'get_by_uuid': 0,
-                'get_nw_info': 0, 'expected_instance': None}
+        call_info = {'get_all_by_host': 0, 'get_all_by_filters': 0,
+                'get_nw_info': 0, 'expected_instances': None}
 
         def fake_instance_get_all_by_host(context, host,
                                           columns_to_join, use_slave=False):
@@ -5915,60 +5964,75 @@ class ComputeTestCase(BaseTestCase):
             self.assertEqual([], columns_to_join)
             return instances[:]
 
-        def fake_instance_get_by_uuid(context, instance_uuid,
-                                      columns_to_join, use_slave=False):
-            if instance_uuid not in instance_map:
-                raise exception.InstanceNotFound(instance_id=instance_uuid)
-            call_info['get_by_uuid'] += 1
+        def fake_instance_get_all_by_filters(context, filters, sort_key,
+                                             sort_dir, limit=None,
+                                             marker=None,
+                                             columns_to_join=None,
+                                             use_slave=False):
+            call_info['get_all_by_filters'] += 1
             self.assertEqual(['system_metadata', 'info_cache'],
                              columns_to_join)
-            return instance_map[instance_uuid]
+            return [instance_map[inst_uuid] for inst_uuid in filters['uuid']
+                    if inst_uuid in instance_map]
 
-        # NOTE(comstud): Override the stub in setUp()
-        def fake_get_instance_nw_info(context, instance, use_slave=False):
+        def fake_get_instances_nw_info(context, instances):
             # Note that this exception gets caught in compute/manager
             # and is ignored.  However, the below increment of
             # 'get_nw_info' won't happen, and you'll get an assert
             # failure checking it below.
-            self.assertEqual(call_info['expected_instance']['uuid'],
-                             instance['uuid'])
+            self.assertEqual(
+                [inst['uuid'] for inst in call_info['expected_instances']],
+                [inst['uuid'] for inst in instances])
             call_info['get_nw_info'] += 1
 
         self.stubs.Set(db, 'instance_get_all_by_host',
                 fake_instance_get_all_by_host)
-        self.stubs.Set(db, 'instance_get_by_uuid',
-                fake_instance_get_by_uuid)
-        self.stubs.Set(self.compute, '_get_instance_nw_info',
-                fake_get_instance_nw_info)
+        self.stubs.Set(db, 'instance_get_all_by_filters',
+                fake_instance_get_all_by_filters)
+        self.stubs.Set(self.compute.network_api, 'get_instances_nw_info',
+                fake_get_instances_nw_info)
 
         # Make an instance appear to be still Building
         instances[0]['vm_state'] = vm_states.BUILDING
         # Make an instance appear to be Deleting
         instances[1]['task_state'] = task_states.DELETING
         # '0', '1' should be skipped..
-        call_info['expected_instance'] = instances[2]
+        call_info['expected_instances'] = instances[2:4]
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(1, call_info['get_all_by_host'])
-        self.assertEqual(0, call_info['get_by_uuid'])
+        self.assertEqual(1, call_info['get_all_by_filters'])
         self.assertEqual(1, call_info['get_nw_info'])
 
-        call_info['expected_instance'] = instances[3]
-        self.compute._heal_instance_info_cache(ctxt)
-        self.assertEqual(1, call_info['get_all_by_host'])
-        self.assertEqual(1, call_info['get_by_uuid'])
-        self.assertEqual(2, call_info['get_nw_info'])
-
         # Make an instance switch hosts
         instances[4]['host'] = 'not-me'
         # Make an instance disappear
         instance_map.pop(instances[5]['uuid'])
+        # '4' and '5' should be skipped..
+        call_info['expected_instances'] = []
+        self.compute._heal_instance_info_cache(ctxt)
+        self.assertEqual(1, call_info['get_all_by_host'])
+        self.assertEqual(2, call_info['get_all_by_filters'])
+        self.assertEqual(1, call_info['get_nw_info'])
+
+        # Ports of '2' were reported as changed, it goes first
+        self.compute.external_instance_event(ctxt,
+            [instance_obj.Instance(uuid=instances[2]['uuid'])],
+            [external_event_obj.InstanceExternalEvent(
+                name='network-vif-plugged',
+                instance_uuid=instances[2]['uuid'], tag='port')])
         # Make an instance switch to be Deleting
         instances[6]['task_state'] = task_states.DELETING
-        # '4', '5', and '6' should be skipped..
-        call_info['expected_instance'] = instances[7]
+        # '6' should be skipped..
+        call_info['expected_instances'] = [instances[2]]
+        self.compute._heal_instance_info_cache(ctxt)
+        self.assertEqual(1, call_info['get_all_by_host'])
+        self.assertEqual(3, call_info['get_all_by_filters'])
+        self.assertEqual(2, call_info['get_nw_info'])
+
+        call_info['expected_instances'] = [instances[7]]
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(1, call_info['get_all_by_host'])
-        self.assertEqual(4, call_info['get_by_uuid'])
+        self.assertEqual(4, call_info['get_all_by_filters'])
         self.assertEqual(3, call_info['get_nw_info'])
         # Should be no more left.
         self.assertEqual(0, len(self.compute._instance_uuids_to_heal))
@@ -5982,7 +6046,7 @@ class ComputeTestCase(BaseTestCase):
         # Should have called the list once more
         self.assertEqual(2, call_info['get_all_by_host'])
         # Stays the same because we remove invalid entries from the list
-        self.assertEqual(4, call_info['get_by_uuid'])
+        self.assertEqual(4, call_info['get_all_by_filters'])
         # Stays the same because we didn't find anything to process
         self.assertEqual(3, call_info['get_nw_info'])
 
@@ -6552,9 +6616,12 @@ class ComputeTestCase(BaseTestCase):
         self._create_fake_instance({'host': self.compute.host})
         self._create_fake_instance({'host': self.compute.host})
         self._create_fake_instance({'host': self.compute.host})
+        self.mox.StubOutWithMock(self.compute.driver, 'get_power_states')
         self.mox.StubOutWithMock(self.compute.driver, 'get_info')
         self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
 
+        self.compute.driver.get_power_states(
+            mox.IgnoreArg()).AndRaise(NotImplementedError())
         # Check to make sure task continues on error.
         self.compute.driver.get_info(mox.IgnoreArg()).AndRaise(
             exception.InstanceNotFound(instance_id='fake-uuid'))
@@ -6575,6 +6642,33 @@ class ComputeTestCase(BaseTestCase):
         self.mox.ReplayAll()
         self.compute._sync_power_states(ctxt)
 
+    def test_sync_power_states_bulk(self):
+        ctxt = self.context.elevated()
+        in_sync = self._create_fake_instance(
+            {'host': self.compute.host, 'vm_state': vm_states.ACTIVE,
+             'power_state': power_state.RUNNING})
+        stopped = self._create_fake_instance(
+            {'host': self.compute.host, 'vm_state': vm_states.ACTIVE,
+             'power_state': power_state.RUNNING})
+        missing = self._create_fake_instance(
+            {'host': self.compute.host, 'vm_state': vm_states.ACTIVE,
+             'power_state': power_state.RUNNING})
+        self.mox.StubOutWithMock(self.compute.driver, 'get_power_states')
+        self.mox.StubOutWithMock(self.compute.driver, 'get_info')
+        self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
+
+        self.compute.driver.get_power_states(mox.IgnoreArg()).AndReturn(
+            {in_sync['uuid']: power_state.RUNNING,
+             stopped['uuid']: power_state.SHUTDOWN})
+        self.compute._sync_instance_power_state(
+            ctxt, mox.ContainsKeyValue('uuid', stopped['uuid']),
+            power_state.SHUTDOWN, use_slave=True).InAnyOrder()
+        self.compute._sync_instance_power_state(
+            ctxt, mox.ContainsKeyValue('uuid', missing['uuid']),
+            power_state.NOSTATE, use_slave=True).InAnyOrder()
+        self.mox.ReplayAll()
+        self.compute._sync_power_states(ctxt)
+
     def _test_lifecycle_event(self, lifecycle_event, power_state):
         instance = self._create_fake_instance()
         uuid = instance['uuid']
@@ -8406,6 +8500,28 @@ class ComputeAPITestCase(BaseTestCase):
         self.assertEqual(refs[1]['display_name'], 'x-%s' % refs[1]['uuid'])
         self.assertEqual(refs[1]['hostname'], 'x-%s' % refs[1]['uuid'])
 
+    def test_create_bulk(self):
+        self.flags(bulk_create_min_instances=3)
+        self.mox.StubOutWithMock(db, 'instance_create')
+        self.mox.StubOutWithMock(instance_action_obj.InstanceAction,
+                                 'action_start')
+        self.mox.ReplayAll()
+
+        (refs, resv_id) = self.compute_api.create(self.context,
+                flavors.get_default_flavor(), image_href='some-fake-image',
+                min_count=3, max_count=3, display_name='x')
+        self.assertEqual(3, len(refs))
+        for i, instance in enumerate(refs):
+            self.assertEqual(resv_id, instance['reservation_id'])
+            self.assertEqual(i, instance['launch_index'])
+            self.assertEqual('x-%s' % instance['uuid'],
+                             instance['display_name'])
+            db_inst = db.instance_get_by_uuid(self.context, instance['uuid'])
+            self.assertEqual(instance['hostname'], db_inst['hostname'])
+            actions = db.actions_get(self.context, instance['uuid'])
+            self.assertEqual([instance_actions.CREATE],
+                             [action['action'] for action in actions])
+
     def test_instance_architecture(self):
         # Test the instance architecture.
         i_ref = self._create_fake_instance()
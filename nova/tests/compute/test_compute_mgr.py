@@ -20,6 +20,7 @@ import mock
 import mox
 from oslo.config import cfg
 
+from nova.compute import manager
 from nova.compute import power_state
 from nova.compute import task_states
 from nova.compute import utils as compute_utils
@@ -732,6 +733,24 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         self.mox.ReplayAll()
         self.compute._instance_usage_audit(self.context)
 
+    def test_power_state_in_sync(self):
+        self.assertTrue(manager._power_state_in_sync(
+            vm_states.ACTIVE, power_state.RUNNING, power_state.RUNNING))
+        self.assertTrue(manager._power_state_in_sync(
+            vm_states.STOPPED, power_state.SHUTDOWN, power_state.SHUTDOWN))
+        self.assertTrue(manager._power_state_in_sync(
+            vm_states.ERROR, power_state.SHUTDOWN, power_state.SHUTDOWN))
+        # The power state changed
+        self.assertFalse(manager._power_state_in_sync(
+            vm_states.ACTIVE, power_state.RUNNING, power_state.SHUTDOWN))
+        # The vm_state has to be fixed up
+        self.assertFalse(manager._power_state_in_sync(
+            vm_states.ACTIVE, power_state.SHUTDOWN, power_state.SHUTDOWN))
+        self.assertFalse(manager._power_state_in_sync(
+            vm_states.STOPPED, power_state.RUNNING, power_state.RUNNING))
+        self.assertFalse(manager._power_state_in_sync(
+            vm_states.DELETED, power_state.RUNNING, power_state.RUNNING))
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None):
         instance = instance_obj.Instance()
         instance.uuid = 'fake-uuid'
@@ -1118,17 +1137,51 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
             external_event_obj.InstanceExternalEvent(name='foo',
                                                      instance_uuid='uuid2')]
 
-        @mock.patch.object(self.compute.network_api, 'get_instance_nw_info')
+        @mock.patch.object(self.compute.network_api, 'get_instances_nw_info')
         @mock.patch.object(self.compute, '_process_instance_event')
-        def do_test(_process_instance_event, get_instance_nw_info):
+        def do_test(_process_instance_event, get_instances_nw_info):
             self.compute.external_instance_event(self.context,
                                                  instances, events)
-            get_instance_nw_info.assert_called_once_with(self.context,
-                                                         instances[0])
+            get_instances_nw_info.assert_called_once_with(self.context,
+                                                          [instances[0]])
             _process_instance_event.assert_called_once_with(instances[1],
                                                             events[1])
         do_test()
 
+    def test_external_instance_event_batches_network_changed(self):
+        instances = [
+            instance_obj.Instance(uuid='uuid1'),
+            instance_obj.Instance(uuid='uuid2')]
+        events = [
+            external_event_obj.InstanceExternalEvent(name='network-changed',
+                                                     instance_uuid='uuid1'),
+            external_event_obj.InstanceExternalEvent(name='network-changed',
+                                                     instance_uuid='uuid2'),
+            external_event_obj.InstanceExternalEvent(name='network-changed',
+                                                     instance_uuid='uuid1')]
+
+        with mock.patch.object(self.compute.network_api,
+                               'get_instances_nw_info') as get_nw_info:
+            self.compute.external_instance_event(self.context,
+                                                 instances, events)
+            get_nw_info.assert_called_once_with(self.context, instances)
+
+    def test_external_instance_event_vif_plugged_heals_first(self):
+        instances = [instance_obj.Instance(uuid='uuid1')]
+        events = [
+            external_event_obj.InstanceExternalEvent(
+                name='network-vif-plugged', instance_uuid='uuid1',
+                tag='port1'),
+            external_event_obj.InstanceExternalEvent(
+                name='network-vif-unplugged', instance_uuid='uuid1',
+                tag='port2')]
+
+        with mock.patch.object(self.compute, '_process_instance_event'):
+            self.compute.external_instance_event(self.context,
+                                                 instances, events)
+        self.assertEqual(['uuid1'],
+                         self.compute._instance_uuids_to_heal_first)
+
     def test_retry_reboot_pending_soft(self):
         instance = instance_obj.Instance(self.context)
         instance.uuid = 'foo'
@@ -697,6 +697,67 @@ class InstanceClaimTestCase(BaseTrackerTestCase):
         self.assertEqual(2 * flavor['vcpus'],
                 self.tracker.compute_node['vcpus_used'])
 
+    def test_claim_updates_changes_only(self):
+        flavor = self._fake_flavor_create()
+        instance = self._fake_instance(flavor=flavor)
+        with mock.patch.object(db, 'compute_node_update',
+                side_effect=self._fake_compute_node_update) as mock_update:
+            self.tracker.instance_claim(self.context, instance, self.limits)
+
+        self.assertEqual(1, mock_update.call_count)
+        values = mock_update.call_args[0][2]
+        self.assertIn('memory_mb_used', values)
+        self.assertIn('local_gb_used', values)
+        self.assertNotIn('cpu_info', values)
+        self.assertNotIn('hypervisor_type', values)
+
+    @mock.patch.object(resource_tracker.greenthread, 'spawn_after')
+    def test_claim_updates_coalesced(self, mock_spawn):
+        self.flags(compute_node_update_interval=0.5)
+        flavor = self._fake_flavor_create(
+                memory_mb=1, root_gb=1, ephemeral_gb=0)
+        claim_mem = flavor['memory_mb'] + FAKE_VIRT_MEMORY_OVERHEAD
+        limits = self._limits(vcpus=2 * flavor['vcpus'])
+        with mock.patch.object(db, 'compute_node_update',
+                side_effect=self._fake_compute_node_update) as mock_update:
+            for i in range(2):
+                self.tracker.instance_claim(self.context,
+                        self._fake_instance(flavor=flavor), limits)
+            self.assertFalse(mock_update.called)
+            self.assertEqual(1, mock_spawn.call_count)
+            self.assertEqual(2 * claim_mem,
+                             self.tracker.compute_node['memory_mb_used'])
+
+            delay, flush, ctxt = mock_spawn.call_args[0]
+            self.assertEqual(0.5, delay)
+            flush(ctxt)
+            self.assertEqual(1, mock_update.call_count)
+            self.assertEqual(2 * claim_mem,
+                             mock_update.call_args[0][2]['memory_mb_used'])
+
+            # nothing left to write
+            flush(ctxt)
+            self.assertEqual(1, mock_update.call_count)
+
+    @mock.patch.object(resource_tracker.greenthread, 'spawn_after')
+    def test_claim_update_failure_resent(self, mock_spawn):
+        self.flags(compute_node_update_interval=0.5)
+        flavor = self._fake_flavor_create(
+                memory_mb=1, root_gb=1, ephemeral_gb=0)
+        self.tracker.instance_claim(self.context,
+                self._fake_instance(flavor=flavor), self.limits)
+        delay, flush, ctxt = mock_spawn.call_args[0]
+        with mock.patch.object(db, 'compute_node_update',
+                side_effect=test.TestingException) as mock_update:
+            flush(ctxt)
+        self.assertEqual(1, mock_update.call_count)
+        failed = mock_update.call_args[0][2]
+
+        with mock.patch.object(db, 'compute_node_update',
+                side_effect=self._fake_compute_node_update) as mock_update:
+            flush(ctxt)
+        self.assertEqual(set(failed), set(mock_update.call_args[0][2]))
+
     def test_context_claim_with_exception(self):
         instance = self._fake_instance(memory_mb=1, root_gb=1, ephemeral_gb=1)
         try:
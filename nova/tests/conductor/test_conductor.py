@@ -180,6 +180,29 @@ class _BaseTestCase(object):
         result = self.conductor.bw_usage_update(*update_args)
         self.assertEqual(result, 'foo')
 
+    def test_bw_usage_get_bulk(self):
+        self.mox.StubOutWithMock(db, 'bw_usage_get_by_uuids')
+        usages = [{'uuid': 'uuid1', 'mac': 'mac1'},
+                  {'uuid': 'uuid1', 'mac': 'mac2'},
+                  {'uuid': 'uuid2', 'mac': 'mac1'}]
+        db.bw_usage_get_by_uuids(self.context, ['uuid1', 'uuid2'],
+                                 0).AndReturn(usages)
+
+        self.mox.ReplayAll()
+        result = self.conductor.bw_usage_get_bulk(
+            self.context, 0, [('uuid1', 'mac1'), ('uuid2', 'mac1')])
+        self.assertEqual([usages[0], usages[2]], result)
+
+    def test_bw_usage_update_bulk(self):
+        self.mox.StubOutWithMock(db, 'bw_usage_update_bulk')
+        usages = [{'uuid': 'uuid', 'mac': 'mac', 'bw_in': 10, 'bw_out': 20,
+                   'last_ctr_in': 5, 'last_ctr_out': 10}]
+        db.bw_usage_update_bulk(self.context, 0, usages, 20,
+                                update_cells=True)
+
+        self.mox.ReplayAll()
+        self.conductor.bw_usage_update_bulk(self.context, 0, usages, 20)
+
     def test_provider_fw_rule_get_all(self):
         fake_rules = ['a', 'b', 'c']
         self.mox.StubOutWithMock(db, 'provider_fw_rule_get_all')
@@ -928,6 +951,25 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor_manager = self.conductor_service.manager
         self.conductor = conductor_rpcapi.ConductorAPI()
 
+    def test_bw_usage_update_bulk_icehouse(self):
+        self.flags(conductor='icehouse', group='upgrade_levels')
+        self.conductor = conductor_rpcapi.ConductorAPI()
+        self.mox.StubOutWithMock(db, 'bw_usage_update')
+        self.mox.StubOutWithMock(db, 'bw_usage_get')
+        usages = [{'uuid': 'uuid', 'mac': 'mac1', 'bw_in': 10, 'bw_out': 20,
+                   'last_ctr_in': 5, 'last_ctr_out': 10},
+                  {'uuid': 'uuid', 'mac': 'mac2', 'bw_in': 30, 'bw_out': 40,
+                   'last_ctr_in': 15, 'last_ctr_out': 20}]
+        for usage in usages:
+            db.bw_usage_update(self.context, 'uuid', usage['mac'], 0,
+                               usage['bw_in'], usage['bw_out'],
+                               usage['last_ctr_in'], usage['last_ctr_out'],
+                               None, update_cells=True)
+            db.bw_usage_get(self.context, 'uuid', 0, usage['mac'])
+
+        self.mox.ReplayAll()
+        self.conductor.bw_usage_update_bulk(self.context, 0, usages)
+
     def test_block_device_mapping_update_or_create(self):
         fake_bdm = {'id': 'fake-id'}
         self.mox.StubOutWithMock(db, 'block_device_mapping_create')
@@ -1866,6 +1908,8 @@ class ConductorV2ManagerProxyTestCase(test.NoDBTestCase):
             ('aggregate_host_delete', 2),
             ('aggregate_metadata_get_by_host', 2),
             ('bw_usage_update', 9),
+            ('bw_usage_get_bulk', 2),
+            ('bw_usage_update_bulk', 4),
             ('provider_fw_rule_get_all', 0),
             ('agent_build_get_by_triple', 3),
             ('block_device_mapping_update_or_create', 2),
@@ -87,6 +87,56 @@ class ConsoleauthTestCase(test.TestCase):
         for token in tokens:
             self.assertFalse(self.manager_api.check_token(self.context, token))
 
+    def test_authorize_console_prunes_with_get_multi(self):
+        self.useFixture(test.TimeOverride())
+        self.flags(console_token_ttl=1)
+        calls = []
+
+        def fake_get_multi(keys):
+            calls.append(keys)
+            return dict((key, self.manager.mc.get(key)) for key in keys
+                        if self.manager.mc.get(key) is not None)
+
+        self.manager.mc.get_multi = fake_get_multi
+        self.manager_api.authorize_console(self.context, u'tok1', 'novnc',
+                                           '127.0.0.1', '8080', 'host',
+                                           self.instance['uuid'])
+        timeutils.advance_time_seconds(1)
+        self.manager_api.authorize_console(self.context, u'tok2', 'novnc',
+                                           '127.0.0.1', '8080', 'host',
+                                           self.instance['uuid'])
+        self.assertEqual([['tok1']], calls)
+        self.assertEqual([u'tok2'], self.manager._get_tokens_for_instance(
+                self.instance['uuid']))
+
+    def test_check_token_caches_validation(self):
+        self.useFixture(test.TimeOverride())
+        self.flags(console_token_validation_ttl=5)
+        token = u'mytok'
+        self._stub_validate_console_port(True)
+        calls = []
+        validate = self.manager._validate_token
+
+        def fake_validate_token(context, token):
+            calls.append(token['token'])
+            return validate(context, token)
+
+        self.stubs.Set(self.manager, '_validate_token', fake_validate_token)
+        self.manager_api.authorize_console(self.context, token, 'novnc',
+                                           '127.0.0.1', '8080', 'host',
+                                           self.instance['uuid'])
+        self.assertTrue(self.manager_api.check_token(self.context, token))
+        self.assertTrue(self.manager_api.check_token(self.context, token))
+        self.assertEqual([token], calls)
+
+        timeutils.advance_time_seconds(5)
+        self.assertTrue(self.manager_api.check_token(self.context, token))
+        self.assertEqual([token, token], calls)
+
+        self.manager_api.delete_tokens_for_instance(self.context,
+                                                    self.instance['uuid'])
+        self.assertFalse(self.manager_api.check_token(self.context, token))
+
     def test_wrong_token_has_port(self):
         token = u'mytok'
 
@@ -1429,6 +1429,85 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         for key in dt_keys:
             self.assertEqual(inst[key], dt)
 
+    def test_instance_create_many(self):
+        ctxt = context.RequestContext('user1', 'project1')
+        db.security_group_create(ctxt, {'name': 'group1',
+                                        'user_id': 'user1',
+                                        'project_id': 'project1'})
+        values_list = [dict(self.sample_data, hostname='host%d' % i,
+                            info_cache={'network_info': '[]'},
+                            security_groups=['default', 'group1'])
+                       for i in range(3)]
+        bdms = [{'source_type': 'blank', 'destination_type': 'local',
+                 'guest_format': 'swap', 'device_name': '/dev/vdb',
+                 'volume_size': 1}]
+        action = {'action': 'create', 'request_id': ctxt.request_id,
+                  'user_id': 'user1', 'project_id': 'project1',
+                  'start_time': timeutils.utcnow()}
+
+        instances = db.instance_create_many(ctxt, values_list,
+                                            block_device_mappings=bdms,
+                                            action=action)
+
+        self.assertEqual(['host0', 'host1', 'host2'],
+                         [inst['hostname'] for inst in instances])
+        for inst in instances:
+            self.assertTrue(uuidutils.is_uuid_like(inst['uuid']))
+            self.assertEqual(self.sample_data['metadata'],
+                             utils.metadata_to_dict(inst['metadata']))
+            self.assertEqual(self.sample_data['system_metadata'],
+                             utils.metadata_to_dict(inst['system_metadata']))
+            self.assertEqual(['default', 'group1'],
+                             sorted(group['name']
+                                    for group in inst['security_groups']))
+            self.assertIsNotNone(inst['info_cache'])
+            self.assertFalse(inst['shutdown_terminate'])
+            self.assertIsNotNone(db.get_ec2_instance_id_by_uuid(
+                    ctxt, inst['uuid']))
+            inst_bdms = db.block_device_mapping_get_all_by_instance(
+                    ctxt, inst['uuid'])
+            self.assertEqual(['/dev/vdb'],
+                             [bdm['device_name'] for bdm in inst_bdms])
+            inst_actions = db.actions_get(ctxt, inst['uuid'])
+            self.assertEqual(['create'],
+                             [a['action'] for a in inst_actions])
+
+    def test_instance_create_many_merges_bdms(self):
+        bdms = [{'source_type': 'blank', 'destination_type': 'local',
+                 'guest_format': 'swap', 'device_name': '/dev/vdb',
+                 'volume_size': 1},
+                {'source_type': 'blank', 'destination_type': 'local',
+                 'guest_format': 'swap', 'device_name': '/dev/vdc',
+                 'volume_size': 2},
+                {'source_type': 'blank', 'destination_type': 'local',
+                 'device_name': '/dev/vdd', 'volume_size': 1},
+                {'source_type': 'blank', 'destination_type': 'local',
+                 'device_name': '/dev/vdd', 'volume_size': 3}]
+        values = dict(self.sample_data, info_cache={'network_info': '[]'})
+        instances = db.instance_create_many(self.ctxt, [values],
+                                            block_device_mappings=bdms)
+        inst_bdms = db.block_device_mapping_get_all_by_instance(
+                self.ctxt, instances[0]['uuid'])
+        self.assertEqual([('/dev/vdc', 2), ('/dev/vdd', 3)],
+                         sorted((bdm['device_name'], bdm['volume_size'])
+                                for bdm in inst_bdms))
+
+    def test_instance_create_many_unknown_column(self):
+        values_list = [dict(self.sample_data,
+                            info_cache={'network_info': '[]'},
+                            not_a_column='foo')]
+        self.assertRaises(ValueError, db.instance_create_many, self.ctxt,
+                          values_list)
+        self.assertEqual([], db.instance_get_all(self.ctxt))
+
+    def test_instance_create_many_unique_server_name(self):
+        self.flags(osapi_compute_unique_server_name_scope='project')
+        values_list = [dict(self.sample_data, hostname='same')
+                       for i in range(2)]
+        self.assertRaises(exception.InstanceExists,
+                          db.instance_create_many, self.ctxt, values_list)
+        self.assertEqual([], db.instance_get_all(self.ctxt))
+
     def test_instance_update_with_object_values(self):
         values = {
             'access_ip_v4': netaddr.IPAddress('1.2.3.4'),
@@ -4625,6 +4704,22 @@ class BlockDeviceMappingTestCase(test.TestCase):
         bmd = db.block_device_mapping_get_all_by_instance(self.ctxt, uuid2)
         self.assertEqual(len(bmd), 2)
 
+    def test_block_device_mapping_get_all_by_instance_uuids(self):
+        uuid1 = self.instance['uuid']
+        uuid2 = db.instance_create(self.ctxt, {})['uuid']
+        uuid3 = db.instance_create(self.ctxt, {})['uuid']
+
+        self._create_bdm({'instance_uuid': uuid1, 'device_name': 'first'})
+        self._create_bdm({'instance_uuid': uuid2, 'device_name': 'second'})
+        self._create_bdm({'instance_uuid': uuid3, 'device_name': 'third'})
+
+        bdms = db.block_device_mapping_get_all_by_instance_uuids(
+                self.ctxt, [uuid1, uuid2])
+        self.assertEqual(['first', 'second'],
+                         sorted(bdm['device_name'] for bdm in bdms))
+        self.assertEqual([], db.block_device_mapping_get_all_by_instance_uuids(
+                self.ctxt, []))
+
     def test_block_device_mapping_destroy(self):
         bdm = self._create_bdm({})
         db.block_device_mapping_destroy(self.ctxt, bdm['id'])
@@ -5485,6 +5580,13 @@ class S3ImageTestCase(test.TestCase):
             self.assertTrue(uuidutils.is_uuid_like(ref.uuid))
             self.assertEqual(uuid, ref.uuid)
 
+    def test_s3_image_get_all_by_uuids(self):
+        uuids = self.values[:2] + [uuidutils.generate_uuid()]
+        refs = db.s3_image_get_all_by_uuids(self.ctxt, uuids)
+        self.assertEqual(sorted(self.values[:2]),
+                         sorted([ref.uuid for ref in refs]))
+        self.assertEqual([], db.s3_image_get_all_by_uuids(self.ctxt, []))
+
     def test_s3_image_get(self):
         self.assertEqual(sorted(self.values),
                          sorted([db.s3_image_get(self.ctxt, ref.id).uuid
@@ -6219,6 +6321,40 @@ class BwUsageTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assertEqualObjects(bw_usage, expected_bw_usage,
                                  ignored_keys=self._ignored_keys)
 
+    def test_bw_usage_update_bulk(self):
+        now = timeutils.utcnow()
+        start_period = now - datetime.timedelta(seconds=10)
+        refreshed = now - datetime.timedelta(seconds=5)
+
+        db.bw_usage_update(self.ctxt, 'fake_uuid1', 'fake_mac1', start_period,
+                           100, 200, 12345, 67890, update_cells=False)
+        usages = [{'uuid': 'fake_uuid1', 'mac': 'fake_mac1',
+                   'bw_in': 200, 'bw_out': 300,
+                   'last_ctr_in': 22345, 'last_ctr_out': 77890},
+                  {'uuid': 'fake_uuid1', 'mac': 'fake_mac2',
+                   'bw_in': 10, 'bw_out': 20,
+                   'last_ctr_in': 30, 'last_ctr_out': 40},
+                  {'uuid': 'fake_uuid2', 'mac': 'fake_mac1',
+                   'bw_in': 50, 'bw_out': 60,
+                   'last_ctr_in': 70, 'last_ctr_out': 80}]
+        db.bw_usage_update_bulk(self.ctxt, start_period, usages,
+                                last_refreshed=refreshed, update_cells=False)
+
+        bw_usages = db.bw_usage_get_by_uuids(self.ctxt,
+                ['fake_uuid1', 'fake_uuid2'], start_period)
+        self.assertEqual(3, len(bw_usages))
+        for usage in usages:
+            bw_usage = db.bw_usage_get(self.ctxt, usage['uuid'],
+                                       start_period, usage['mac'])
+            expected = dict(usage, start_period=start_period,
+                            last_refreshed=refreshed)
+            self._assertEqualObjects(bw_usage, expected,
+                                     ignored_keys=self._ignored_keys)
+
+    def test_bw_usage_update_bulk_empty(self):
+        db.bw_usage_update_bulk(self.ctxt, timeutils.utcnow(), [],
+                                update_cells=False)
+
 
 class Ec2TestCase(test.TestCase):
 
@@ -6310,6 +6446,15 @@ class Ec2TestCase(test.TestCase):
         inst_id = db.get_ec2_instance_id_by_uuid(self.ctxt, 'fake-uuid')
         self.assertEqual(inst['id'], inst_id)
 
+    def test_get_ec2_instance_ids_by_uuids(self):
+        inst1 = db.ec2_instance_create(self.ctxt, 'fake-uuid1')
+        inst2 = db.ec2_instance_create(self.ctxt, 'fake-uuid2')
+        inst_ids = db.get_ec2_instance_ids_by_uuids(
+                self.ctxt, ['fake-uuid1', 'fake-uuid2', 'uuid-not-present'])
+        self.assertEqual({'fake-uuid1': inst1['id'],
+                          'fake-uuid2': inst2['id']}, inst_ids)
+        self.assertEqual({}, db.get_ec2_instance_ids_by_uuids(self.ctxt, []))
+
     def test_get_instance_uuid_by_ec2_id(self):
         inst = db.ec2_instance_create(self.ctxt, 'fake-uuid')
         inst_uuid = db.get_instance_uuid_by_ec2_id(self.ctxt, inst['id'])
@@ -6631,6 +6776,49 @@ class ArchiveTestCase(test.TestCase):
         si_rows = self.conn.execute(qsi).fetchall()
         self.assertEqual(len(siim_rows) + len(si_rows), 8)
 
+    def test_archive_deleted_rows_markers(self):
+        for uuidstr in self.uuidstrs:
+            ins_stmt = self.instance_id_mappings.insert().values(uuid=uuidstr)
+            self.conn.execute(ins_stmt)
+        update_statement = self.instance_id_mappings.update().\
+                where(self.instance_id_mappings.c.uuid.in_(self.uuidstrs[:4]))\
+                .values(deleted=1)
+        self.conn.execute(update_statement)
+        qiim = select([self.instance_id_mappings.c.id]).where(
+                self.instance_id_mappings.c.uuid.in_(self.uuidstrs[:4])).\
+                order_by(self.instance_id_mappings.c.id)
+        ids = [row[0] for row in self.conn.execute(qiim).fetchall()]
+        markers = {}
+        self.assertEqual(3, db.archive_deleted_rows(self.context, max_rows=3,
+                                                    markers=markers))
+        self.assertEqual({'instance_id_mappings': ids[2]}, markers)
+        self.assertEqual(1, db.archive_deleted_rows(self.context, max_rows=3,
+                                                    markers=markers))
+        # The table has no deleted rows left, the next call starts over
+        self.assertEqual({}, markers)
+        self.assertEqual(0, db.archive_deleted_rows(self.context, max_rows=3,
+                                                    markers=markers))
+
+    def test_archive_deleted_rows_fk_order(self):
+        dialect = self.engine.url.get_dialect()
+        if dialect == sqlite.dialect:
+            import sqlite3
+            tup = sqlite3.sqlite_version_info
+            if tup[0] < 3 or (tup[0] == 3 and tup[1] < 7):
+                self.skipTest(
+                    'sqlite version too old for reliable SQLA foreign_keys')
+            self.conn.execute("PRAGMA foreign_keys = ON")
+        ins_stmt = self.console_pools.insert().values(deleted=1)
+        result = self.conn.execute(ins_stmt)
+        id1 = result.inserted_primary_key[0]
+        self.ids.append(id1)
+        ins_stmt = self.consoles.insert().values(deleted=1, pool_id=id1)
+        result = self.conn.execute(ins_stmt)
+        id2 = result.inserted_primary_key[0]
+        self.ids.append(id2)
+        # consoles is archived before the console_pools row it references
+        self.assertEqual(2, db.archive_deleted_rows(self.context))
+
 
 class InstanceGroupDBApiTestCase(test.TestCase, ModelsObjectComparatorMixin):
     def setUp(self):
@@ -13,9 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+import BaseHTTPServer
 import copy
+import datetime
+import threading
 import uuid
 
+import eventlet
+
 import mox
 from neutronclient.common import exceptions
 from neutronclient.v2_0 import client
@@ -26,12 +31,14 @@ from nova.compute import flavors
 from nova.conductor import api as conductor_api
 from nova import context
 from nova import exception
+from nova.network import base_api
 from nova.network import model
 from nova.network import neutronv2
 from nova.network.neutronv2 import api as neutronapi
 from nova.network.neutronv2 import constants
 from nova.openstack.common import jsonutils
 from nova.openstack.common import local
+from nova.openstack.common import timeutils
 from nova import test
 from nova import utils
 
@@ -203,6 +210,7 @@ class TestNeutronv2Base(test.TestCase):
                              'floating_ip_address': '172.0.1.2'}]
         self.dhcp_port_data1 = [{'fixed_ips': [{'ip_address': '10.0.1.9',
                                                'subnet_id': 'my_subid1'}],
+                                 'network_id': 'my_netid1',
                                  'status': 'ACTIVE',
                                  'admin_state_up': True}]
         self.port_address2 = '10.0.2.2'
@@ -455,23 +463,22 @@ class TestNeutronv2Base(test.TestCase):
         nets = number == 1 and self.nets1 or self.nets2
         self.moxed_client.list_networks(
             id=net_ids).AndReturn({'networks': nets})
-        for i in xrange(1, number + 1):
-            float_data = number == 1 and self.float_data1 or self.float_data2
-            for ip in port_data[i - 1]['fixed_ips']:
-                float_data = [x for x in float_data
-                              if x['fixed_ip_address'] == ip['ip_address']]
-                self.moxed_client.list_floatingips(
-                    fixed_ip_address=ip['ip_address'],
-                    port_id=port_data[i - 1]['id']).AndReturn(
-                        {'floatingips': float_data})
-            subnet_data = i == 1 and self.subnet_data1 or self.subnet_data2
-            self.moxed_client.list_subnets(
-                id=mox.SameElementsAs(['my_subid%s' % i])).AndReturn(
+        float_data = number == 1 and self.float_data1 or self.float_data2
+        self.moxed_client.list_floatingips(
+            port_id=mox.SameElementsAs(
+                [port['id'] for port in port_data])).AndReturn(
+                    {'floatingips': float_data})
+        subnet_data = (number == 1 and self.subnet_data1 or
+                       self.subnet_data1 + self.subnet_data2)
+        self.moxed_client.list_subnets(
+            id=mox.SameElementsAs(
+                ['my_subid%s' % i for i in xrange(1, number + 1)])).AndReturn(
                     {'subnets': subnet_data})
-            self.moxed_client.list_ports(
-                network_id=subnet_data[0]['network_id'],
-                device_owner='network:dhcp').AndReturn(
-                    {'ports': []})
+        self.moxed_client.list_ports(
+            network_id=mox.SameElementsAs(
+                [subnet['network_id'] for subnet in subnet_data]),
+            device_owner='network:dhcp').AndReturn(
+                {'ports': []})
         self.mox.ReplayAll()
         nw_inf = api.get_instance_nw_info(self.context, instance)
         for i in xrange(0, number):
@@ -626,23 +633,28 @@ class TestNeutronv2(TestNeutronv2Base):
         for current_neutron_port in current_neutron_ports:
             current_neutron_port_map[current_neutron_port['id']] = (
                 current_neutron_port)
+        requested_ports = []
         for port_id in port_ids:
             current_neutron_port = current_neutron_port_map.get(port_id)
             if current_neutron_port:
-                for ip in current_neutron_port['fixed_ips']:
-                    self.moxed_client.list_floatingips(
-                        fixed_ip_address=ip['ip_address'],
-                        port_id=current_neutron_port['id']).AndReturn(
-                            {'floatingips': [self.float_data2[index]]})
-                    self.moxed_client.list_subnets(
-                        id=mox.SameElementsAs([ip['subnet_id']])
-                        ).AndReturn(
-                            {'subnets': [self.subnet_data_n[index]]})
-                    self.moxed_client.list_ports(
-                        network_id=current_neutron_port['network_id'],
-                        device_owner='network:dhcp').AndReturn(
-                        {'ports': self.dhcp_port_data1})
-                    index += 1
+                requested_ports.append(current_neutron_port)
+        if requested_ports:
+            self.moxed_client.list_floatingips(
+                port_id=mox.SameElementsAs(
+                    [port['id'] for port in requested_ports])).AndReturn(
+                        {'floatingips': self.float_data2})
+            subnet_ids = set(ip['subnet_id'] for port in requested_ports
+                             for ip in port['fixed_ips'])
+            self.moxed_client.list_subnets(
+                id=mox.SameElementsAs(subnet_ids)).AndReturn(
+                    {'subnets': [subnet for subnet in self.subnet_data_n
+                                 if subnet['id'] in subnet_ids]})
+            self.moxed_client.list_ports(
+                network_id=mox.SameElementsAs(
+                    set(port['network_id'] for port in requested_ports)),
+                device_owner='network:dhcp').AndReturn(
+                    {'ports': self.dhcp_port_data1})
+            index = len(requested_ports)
         self.mox.ReplayAll()
 
         self.instance['info_cache'] = network_cache
@@ -673,6 +685,9 @@ class TestNeutronv2(TestNeutronv2Base):
         self.moxed_client.list_networks(
             id=[self.port_data1[0]['network_id']]).AndReturn(
                 {'networks': self.nets1})
+        self.moxed_client.list_floatingips(
+            port_id=[self.port_data3[0]['id']]).AndReturn(
+                {'floatingips': []})
         neutronv2.get_client(mox.IgnoreArg(),
                              admin=True).MultipleTimes().AndReturn(
             self.moxed_client)
@@ -1045,13 +1060,10 @@ class TestNeutronv2(TestNeutronv2Base):
         self.moxed_client.list_networks(id=net_ids).AndReturn(
             {'networks': nets})
         float_data = number == 1 and self.float_data1 or self.float_data2
-        for data in port_data[1:]:
-            for ip in data['fixed_ips']:
-                self.moxed_client.list_floatingips(
-                    fixed_ip_address=ip['ip_address'],
-                    port_id=data['id']).AndReturn(
-                        {'floatingips': float_data[1:]})
-        for port in port_data[1:]:
+        if port_data[1:]:
+            self.moxed_client.list_floatingips(
+                port_id=[data['id'] for data in port_data[1:]]).AndReturn(
+                    {'floatingips': float_data[1:]})
             self.moxed_client.list_subnets(id=['my_subid2']).AndReturn({})
 
         self.mox.ReplayAll()
@@ -1921,8 +1933,8 @@ class TestNeutronv2(TestNeutronv2Base):
         fake_ips = [model.IP(x['ip_address']) for x in fake_port['fixed_ips']]
         api = neutronapi.API()
         self.mox.StubOutWithMock(api, '_get_subnets_from_port')
-        api._get_subnets_from_port(self.context, fake_port).AndReturn(
-            [fake_subnet])
+        api._get_subnets_from_port(self.context, fake_port,
+                                   None).AndReturn([fake_subnet])
         self.mox.ReplayAll()
         neutronv2.get_client('fake')
         subnets = api._nw_info_get_subnets(self.context, fake_port, fake_ips)
@@ -1999,7 +2011,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'ACTIVE',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:01',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              },
@@ -2008,7 +2021,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': False,
              'status': 'DOWN',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:02',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              },
@@ -2017,7 +2031,8 @@ class TestNeutronv2(TestNeutronv2Base):
              'network_id': 'net-id',
              'admin_state_up': True,
              'status': 'DOWN',
-             'fixed_ips': [{'ip_address': '1.1.1.1'}],
+             'fixed_ips': [{'ip_address': '1.1.1.1',
+                            'subnet_id': 'subnet-id'}],
              'mac_address': 'de:ad:be:ef:00:03',
              'binding:vif_type': model.VIF_TYPE_BRIDGE,
              },
@@ -2029,7 +2044,6 @@ class TestNeutronv2(TestNeutronv2Base):
              'status': 'DOWN',
              },
             ]
-        fake_subnets = [model.Subnet(cidr='1.0.0.0/8')]
         fake_nets = [
             {'id': 'net-id',
              'name': 'foo',
@@ -2042,16 +2056,25 @@ class TestNeutronv2(TestNeutronv2Base):
             tenant_id='fake', device_id='uuid').AndReturn(
                 {'ports': fake_ports})
 
-        self.mox.StubOutWithMock(api, '_get_floating_ips_by_fixed_and_port')
-        self.mox.StubOutWithMock(api, '_get_subnets_from_port')
         requested_ports = [fake_ports[2], fake_ports[0], fake_ports[1]]
-        for requested_port in requested_ports:
-            api._get_floating_ips_by_fixed_and_port(
-                self.moxed_client, '1.1.1.1', requested_port['id']).AndReturn(
-                    [{'floating_ip_address': '10.0.0.1'}])
-        for requested_port in requested_ports:
-            api._get_subnets_from_port(self.context, requested_port
-                ).AndReturn(fake_subnets)
+        # The floating IPs, subnets and DHCP ports of all the ports are
+        # fetched with one call each.
+        self.moxed_client.list_floatingips(
+            port_id=['port0', 'port1', 'port2']).AndReturn(
+                {'floatingips': [{'port_id': port['id'],
+                                  'fixed_ip_address': '1.1.1.1',
+                                  'floating_ip_address': '10.0.0.1'}
+                                 for port in requested_ports]})
+        self.moxed_client.list_subnets(id=['subnet-id']).AndReturn(
+            {'subnets': [{'id': 'subnet-id',
+                          'cidr': '1.0.0.0/8',
+                          'network_id': 'net-id',
+                          'gateway_ip': '1.0.0.1'}]})
+        self.moxed_client.list_ports(
+            network_id=['net-id'], device_owner='network:dhcp').AndReturn(
+                {'ports': [{'network_id': 'net-id',
+                            'fixed_ips': [{'ip_address': '1.0.0.2',
+                                           'subnet_id': 'subnet-id'}]}]})
 
         self.mox.ReplayAll()
         neutronv2.get_client('fake')
@@ -2079,6 +2102,130 @@ class TestNeutronv2(TestNeutronv2Base):
         self.assertEqual(nw_infos[1]['id'], 'port1')
         self.assertEqual(nw_infos[2]['id'], 'port2')
 
+        for nw_info in nw_infos:
+            self.assertEqual(['10.0.0.1'],
+                             nw_info.fixed_ips()[0].floating_ip_addresses())
+            subnet = nw_info['network']['subnets'][0]
+            self.assertEqual('1.0.0.0/8', subnet['cidr'])
+            self.assertEqual('1.0.0.2', subnet.get_meta('dhcp_server'))
+
+    def test_gather_port_resources_without_l3(self):
+        api = neutronapi.API()
+        ports = [{'id': 'port1', 'network_id': 'net-id',
+                  'fixed_ips': [{'ip_address': '1.1.1.1',
+                                 'subnet_id': 'subnet-id'}]}]
+        self.moxed_client.list_floatingips(port_id=['port1']).AndRaise(
+            exceptions.NeutronClientException(status_code=404))
+        self.moxed_client.list_subnets(id=['subnet-id']).AndReturn(
+            {'subnets': [{'id': 'subnet-id', 'network_id': 'net-id'}]})
+        self.moxed_client.list_ports(
+            network_id=['net-id'], device_owner='network:dhcp').AndReturn(
+                {'ports': []})
+        self.mox.ReplayAll()
+        neutronv2.get_client('fake')
+
+        resources = api._gather_port_resources(self.context,
+                                               self.moxed_client, ports)
+        self.assertEqual({}, resources['floatingips'])
+        self.assertEqual(['subnet-id'], resources['subnets'].keys())
+        self.assertEqual({}, resources['dhcp_ports'])
+
+    def test_get_instances_nw_info(self):
+        api = neutronapi.API()
+
+        def _info_cache(*net_ids):
+            return {'network_info': [{'id': 'port-%s' % net_id,
+                                      'network': {'id': net_id}}
+                                     for net_id in net_ids]}
+
+        fake_insts = [{'project_id': 'fake', 'uuid': 'uuid1',
+                       'display_name': 'inst1',
+                       'info_cache': _info_cache('net2', 'net1')},
+                      {'project_id': 'fake', 'uuid': 'uuid2',
+                       'display_name': 'inst2',
+                       'info_cache': _info_cache('net2')}]
+        fake_nets = [{'id': 'net1'}, {'id': 'net2'}]
+        fake_ports = [{'id': 'port1', 'device_id': 'uuid1',
+                       'tenant_id': 'fake'},
+                      {'id': 'port2', 'device_id': 'uuid1',
+                       'tenant_id': 'fake'},
+                      # A port of another tenant is ignored
+                      {'id': 'port3', 'device_id': 'uuid2',
+                       'tenant_id': 'other'}]
+        self.mox.StubOutWithMock(api, '_get_available_networks')
+        api._get_available_networks(
+            self.context, None,
+            mox.SameElementsAs(['net1', 'net2'])).AndReturn(fake_nets)
+        neutronv2.get_client(mox.IgnoreArg(), admin=True).AndReturn(
+            self.moxed_client)
+        self.moxed_client.list_ports(device_id=['uuid1', 'uuid2']).AndReturn(
+            {'ports': fake_ports})
+        port_resources = {'floatingips': {}, 'subnets': {},
+                          'dhcp_ports': {}}
+        self.mox.StubOutWithMock(api, '_gather_port_resources')
+        self.mox.StubOutWithMock(api, '_build_network_info_model')
+        self.mox.StubOutWithMock(base_api,
+                                 'update_instance_cache_with_nw_info')
+        api._gather_port_resources(
+            self.context, self.moxed_client,
+            mox.SameElementsAs(fake_ports[:2])).AndReturn(port_resources)
+        api._build_network_info_model(
+            self.context, fake_insts[0], neutron_ports=fake_ports[:2],
+            port_resources=port_resources,
+            neutron_networks=[fake_nets[1], fake_nets[0]]).AndReturn(
+                model.NetworkInfo())
+        base_api.update_instance_cache_with_nw_info(
+            api, self.context, fake_insts[0], model.NetworkInfo(),
+            update_cells=False)
+        api._build_network_info_model(
+            self.context, fake_insts[1], neutron_ports=[],
+            port_resources=port_resources,
+            neutron_networks=[fake_nets[1]]).AndReturn(
+                model.NetworkInfo())
+        base_api.update_instance_cache_with_nw_info(
+            api, self.context, fake_insts[1], model.NetworkInfo(),
+            update_cells=False)
+
+        self.mox.ReplayAll()
+        neutronv2.get_client('fake')
+        nw_infos = api.get_instances_nw_info(self.context, fake_insts)
+        self.assertEqual(set(['uuid1', 'uuid2']), set(nw_infos))
+
+    def test_get_instances_nw_info_skips_failed_instance(self):
+        api = neutronapi.API()
+        fake_insts = [{'project_id': 'fake', 'uuid': 'uuid1',
+                       'display_name': 'inst1', 'info_cache': None},
+                      {'project_id': 'fake', 'uuid': 'uuid2',
+                       'display_name': 'inst2', 'info_cache': None}]
+        neutronv2.get_client(mox.IgnoreArg(), admin=True).AndReturn(
+            self.moxed_client)
+        self.moxed_client.list_ports(device_id=['uuid1', 'uuid2']).AndReturn(
+            {'ports': []})
+        port_resources = {'floatingips': {}, 'subnets': {},
+                          'dhcp_ports': {}}
+        self.mox.StubOutWithMock(api, '_gather_port_resources')
+        self.mox.StubOutWithMock(api, '_build_network_info_model')
+        self.mox.StubOutWithMock(base_api,
+                                 'update_instance_cache_with_nw_info')
+        api._gather_port_resources(
+            self.context, self.moxed_client, []).AndReturn(port_resources)
+        api._build_network_info_model(
+            self.context, fake_insts[0], neutron_ports=[],
+            port_resources=port_resources, neutron_networks=[]).AndRaise(
+                exceptions.NeutronClientException())
+        api._build_network_info_model(
+            self.context, fake_insts[1], neutron_ports=[],
+            port_resources=port_resources, neutron_networks=[]).AndReturn(
+                model.NetworkInfo())
+        base_api.update_instance_cache_with_nw_info(
+            api, self.context, fake_insts[1], model.NetworkInfo(),
+            update_cells=False)
+
+        self.mox.ReplayAll()
+        neutronv2.get_client('fake')
+        nw_infos = api.get_instances_nw_info(self.context, fake_insts)
+        self.assertEqual(['uuid2'], nw_infos.keys())
+
     def test_get_all_empty_list_networks(self):
         api = neutronapi.API()
         self.moxed_client.list_networks().AndReturn({'networks': []})
@@ -2114,6 +2261,19 @@ class TestNeutronv2ModuleMethods(test.TestCase):
                           'fake_context', 'fake_instance',
                           None, ['list', 'of', 'port_ids'])
 
+    def test_gather_port_ids_and_networks_given_networks(self):
+        api = neutronapi.API()
+        instance = {'project_id': 'fake', 'uuid': 'uuid1',
+                    'info_cache': {'network_info': [
+                        {'id': 'port1', 'network': {'id': 'net1'}}]}}
+        # No networks are listed
+        self.mox.StubOutWithMock(api, '_get_available_networks')
+        self.mox.ReplayAll()
+        networks, port_ids = api._gather_port_ids_and_networks(
+            'fake_context', instance, neutron_networks=[{'id': 'net1'}])
+        self.assertEqual([{'id': 'net1'}], networks)
+        self.assertEqual(['port1'], port_ids)
+
     def test_ensure_requested_network_ordering_no_preference_ids(self):
         l = [1, 2, 3]
 
@@ -2341,3 +2501,132 @@ class TestNeutronClientForAdminScenarios(test.TestCase):
 
     def test_get_client_for_admin_context_with_id(self):
         self._test_get_client_for_admin(use_id=True, admin_context=True)
+
+
+class _FakeNeutronHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers keystone token requests and neutron port listings."""
+
+    def _reply(self, body):
+        body = jsonutils.dumps(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.token_requests += 1
+        expires = timeutils.utcnow() + datetime.timedelta(hours=1)
+        self._reply({'access': {'token': {
+            'id': 'admin-token-%d' % self.server.token_requests,
+            'expires': timeutils.isotime(expires)}}})
+
+    def do_GET(self):
+        self.server.request_tokens.append(self.headers['X-Auth-Token'])
+        self._reply({'ports': []})
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNeutronClientPool(test.TestCase):
+    def setUp(self):
+        super(TestNeutronClientPool, self).setUp()
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                           _FakeNeutronHandler)
+        server.token_requests = 0
+        server.request_tokens = []
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+
+        url = 'http://127.0.0.1:%d' % server.server_address[1]
+        self.flags(neutron_url=url,
+                   neutron_admin_auth_url=url + '/v2.0',
+                   neutron_auth_strategy='keystone',
+                   neutron_client_pool_size=2)
+        neutronv2.reset_pools()
+        self.addCleanup(neutronv2.reset_pools)
+        self.addCleanup(timeutils.clear_time_override)
+        self.context = context.RequestContext('userid', 'my_tenantid',
+                                              auth_token='user-token')
+
+    def _get_stats(self, admin, project_id=None):
+        for stats in neutronv2.get_pool_stats():
+            if stats['admin'] == admin and stats['project_id'] == project_id:
+                return stats
+
+    def test_admin_token_shared(self):
+        for i in range(3):
+            neutronv2.get_client(self.context, admin=True).list_ports()
+        self.assertEqual(1, self.server.token_requests)
+        self.assertEqual(['admin-token-1'] * 3, self.server.request_tokens)
+        stats = self._get_stats(admin=True)
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(2, stats['hits'])
+        self.assertEqual(0, stats['waits'])
+        self.assertEqual(1, stats['free'])
+
+    def test_admin_token_refreshed_before_expiry(self):
+        timeutils.set_time_override()
+        neutronv2.get_client(self.context, admin=True).list_ports()
+        timeutils.advance_time_seconds(3000)
+        neutronv2.get_client(self.context, admin=True).list_ports()
+        self.assertEqual(1, self.server.token_requests)
+        timeutils.advance_time_seconds(400)
+        neutronv2.get_client(self.context, admin=True).list_ports()
+        self.assertEqual(2, self.server.token_requests)
+        self.assertEqual(['admin-token-1', 'admin-token-1', 'admin-token-2'],
+                         self.server.request_tokens)
+
+    def test_user_token_not_kept(self):
+        neutronv2.get_client(self.context).list_ports()
+        neutronv2.get_client(self.context, admin=True).list_ports()
+        other_context = context.RequestContext('userid', 'my_tenantid',
+                                               auth_token='other-token')
+        neutronv2.get_client(other_context).list_ports()
+        self.assertEqual(['user-token', 'admin-token-1', 'other-token'],
+                         self.server.request_tokens)
+        self.assertEqual(1, self.server.token_requests)
+        self.assertEqual(1, self._get_stats(admin=False,
+                                            project_id='my_tenantid')['hits'])
+
+    def test_user_pool_per_tenant(self):
+        neutronv2.get_client(self.context).list_ports()
+        other_context = context.RequestContext('userid', 'other_tenantid',
+                                               auth_token='other-token')
+        neutronv2.get_client(other_context).list_ports()
+        self.assertEqual(['user-token', 'other-token'],
+                         self.server.request_tokens)
+        for project_id in ('my_tenantid', 'other_tenantid'):
+            stats = self._get_stats(admin=False, project_id=project_id)
+            self.assertEqual(0, stats['hits'])
+            self.assertEqual(1, stats['misses'])
+
+    def test_pool_size_zero_not_pooled(self):
+        self.flags(neutron_client_pool_size=0)
+        self.assertIsInstance(neutronv2.get_client(self.context),
+                              client.Client)
+        self.assertEqual([], neutronv2.get_pool_stats())
+
+    def test_concurrency_bounded(self):
+        self.flags(neutron_client_pool_size=1)
+        pool = neutronv2._get_pool(admin=False, project_id='my_tenantid')
+        client = pool._get('user-token')
+        thread = eventlet.spawn(neutronv2.get_client(self.context).list_ports)
+        eventlet.sleep(0)
+        self.assertEqual(1, pool.waits)
+        self.assertEqual([], self.server.request_tokens)
+        pool._put(client)
+        thread.wait()
+        self.assertEqual(['user-token'], self.server.request_tokens)
+        self.assertEqual({'hits': 1, 'misses': 1, 'waits': 1,
+                          'max_size': 1, 'free': 1}, pool.get_stats())
+
+    def test_attribute_error(self):
+        client = neutronv2.get_client(self.context)
+        self.assertRaises(AttributeError, getattr, client, 'not_a_method')
@@ -66,6 +66,23 @@ class TestField(test.NoDBTestCase):
             self.assertEqual(out_val, self.field.from_primitive(
                     ObjectLikeThing, 'attr', prim_val))
 
+    def test_to_primitive_converter(self):
+        convert = self.field.primitive_converter('to_primitive')
+        for in_val, prim_val in self.to_primitive_values:
+            if convert is not None:
+                in_val = convert('obj', 'attr', in_val)
+            self.assertEqual(prim_val, in_val)
+
+    def test_from_primitive_converter(self):
+        class ObjectLikeThing:
+            _context = 'context'
+
+        convert = self.field.primitive_converter('from_primitive')
+        for prim_val, out_val in self.from_primitive_values:
+            if convert is not None:
+                prim_val = convert(ObjectLikeThing, 'attr', prim_val)
+            self.assertEqual(out_val, prim_val)
+
 
 class TestString(TestField):
     def setUp(self):
@@ -780,6 +780,36 @@ class _TestInstanceObject(object):
         self._test_get_flavor(None)
         self._test_get_flavor('foo')
 
+    def test_get_flavor_compact_decoded_once(self):
+        self.flags(compact_flavor_info=True)
+        inst = instance.Instance()
+        inst.system_metadata = flavors.save_flavor_info(
+            {}, flavors.get_default_flavor())
+        decoded = flavors.extract_flavor(
+            {'system_metadata': inst.system_metadata})
+        self.mox.StubOutWithMock(flavors, 'decode_flavor_info')
+        flavors.decode_flavor_info(inst.system_metadata['flavor']).AndReturn(
+            decoded)
+        self.mox.ReplayAll()
+        inst.get_flavor()
+        flavor = inst.get_flavor()
+        flavors.extract_flavor(inst)['name'] = 'changed'
+        self.assertEqual(flavors.get_default_flavor()['flavorid'],
+                         flavor.flavorid)
+        self.assertNotEqual('changed', inst.get_flavor().name)
+
+    def test_get_flavor_compact_changed(self):
+        self.flags(compact_flavor_info=True)
+        inst = instance.Instance()
+        inst.system_metadata = flavors.save_flavor_info(
+            {}, flavors.get_default_flavor())
+        self.assertEqual(flavors.get_default_flavor()['name'],
+                         inst.get_flavor().name)
+        new_flavor = flavors.get_flavor_by_name('m1.tiny')
+        inst.system_metadata = flavors.save_flavor_info(
+            inst.system_metadata, new_flavor)
+        self.assertEqual('m1.tiny', inst.get_flavor().name)
+
     def _test_set_flavor(self, namespace):
         prefix = '%s_' % namespace if namespace is not None else ''
         db_inst = db.instance_create(self.context, {
@@ -1015,6 +1045,29 @@ class _TestInstanceListObject(object):
                          dict(instances[0].fault.iteritems()))
         self.assertIsNone(instances[1].fault)
 
+    def test_create(self):
+        insts = [instance.Instance(user_id=self.context.user_id,
+                                   project_id=self.context.project_id,
+                                   host='host%d' % i)
+                 for i in range(2)]
+        inst_list = instance.InstanceList.create(self.context, insts,
+                                                 action='create')
+        self.assertEqual(['host0', 'host1'], [inst.host for inst in inst_list])
+        for inst in inst_list:
+            self.assertIsNotNone(inst.id)
+            self.assertEqual(set(), inst.obj_what_changed())
+            db_inst = instance.Instance.get_by_uuid(self.context, inst.uuid)
+            self.assertEqual(inst.host, db_inst.host)
+            actions = db.actions_get(self.context, inst.uuid)
+            self.assertEqual(['create'], [a['action'] for a in actions])
+
+    def test_create_already_created(self):
+        inst = instance.Instance(user_id=self.context.user_id,
+                                 project_id=self.context.project_id)
+        inst.create(self.context)
+        self.assertRaises(exception.ObjectActionError,
+                          instance.InstanceList.create, self.context, [inst])
+
     def test_fill_faults(self):
         self.mox.StubOutWithMock(db, 'instance_fault_get_by_instance_uuids')
 
@@ -642,6 +642,31 @@ class _TestObject(object):
         self.assertEqual('abc', obj.bar)
         self.assertEqual(set(['foo', 'bar']), obj.obj_what_changed())
 
+    def test_primitive_matches_fields(self):
+        # The isotime primitive of a datetime drops microseconds.
+        obj = MyObj(foo=1, bar='bar',
+                    created_at=timeutils.utcnow().replace(microsecond=0),
+                    deleted=False)
+        expected = dict((name, field.to_primitive(obj, name, obj[name]))
+                        for name, field in obj.fields.items()
+                        if obj.obj_attr_is_set(name))
+        primitive = obj.obj_to_primitive()
+        self.assertEqual(expected, primitive['nova_object.data'])
+
+        obj2 = MyObj.obj_from_primitive(primitive)
+        for name in expected:
+            self.assertEqual(obj[name], obj2[name])
+        self.assertFalse(obj2.obj_attr_is_set('updated_at'))
+
+    def test_codec_per_class(self):
+        MyObj(foo=1).obj_to_primitive()
+        obj = TestSubclassedObject(foo=1, new_field='new')
+        primitive = obj.obj_to_primitive()
+        self.assertEqual({'foo': 1, 'new_field': 'new'},
+                         primitive['nova_object.data'])
+        self.assertEqual(
+            'new', MyObj.obj_from_primitive(primitive).new_field)
+
 
 class TestObject(_LocalTest, _TestObject):
     pass
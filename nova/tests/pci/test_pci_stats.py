@@ -116,3 +116,36 @@ class PciDeviceStatsTestCase(test.NoDBTestCase):
         self.assertRaises(exception.PciDeviceRequestFailed,
             self.pci_stats.apply_requests,
             pci_requests_multiple)
+
+    def test_apply_requests_failed_unchanged(self):
+        self.assertRaises(exception.PciDeviceRequestFailed,
+            self.pci_stats.apply_requests,
+            pci_requests_multiple)
+        self.assertEqual(set([d['count'] for d in self.pci_stats]),
+                         set([1, 2]))
+
+    def test_support_requests_model(self):
+        request = {'count': 2,
+                   'spec': [{'vendor_id': 'v1', 'product_id': 'p1'}]}
+        self.assertTrue(self.pci_stats.support_requests([request]))
+        request['count'] = 3
+        self.assertFalse(self.pci_stats.support_requests([request]))
+        request['spec'] = [{'vendor_id': 'v1', 'product_id': 'p2'}]
+        request['count'] = 1
+        self.assertFalse(self.pci_stats.support_requests([request]))
+
+    def test_support_requests_shared_pool(self):
+        requests = [{'count': 1,
+                     'spec': [{'vendor_id': 'v1', 'product_id': 'p1'}]},
+                    {'count': 1, 'spec': [{'vendor_id': 'v1'}]}]
+        self.assertTrue(self.pci_stats.support_requests(requests))
+        requests.append({'count': 1, 'spec': [{'product_id': 'p1'}]})
+        self.assertFalse(self.pci_stats.support_requests(requests))
+
+    def test_consume_and_add_device(self):
+        self.pci_stats.consume_device(self.fake_dev_2)
+        self.pci_stats.add_device(self.fake_dev_2)
+        self.assertEqual(len(self.pci_stats.pools), 2)
+        request = {'count': 1,
+                   'spec': [{'vendor_id': 'v2', 'product_id': 'p2'}]}
+        self.assertTrue(self.pci_stats.support_requests([request]))
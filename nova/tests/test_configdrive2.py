@@ -18,6 +18,7 @@ import mox
 import os
 import tempfile
 
+from nova import exception
 from nova import test
 
 from nova.openstack.common import fileutils
@@ -87,3 +88,48 @@ class ConfigDriveTestCase(test.NoDBTestCase):
         finally:
             if imagefile:
                 fileutils.delete_if_exists(imagefile)
+
+    def _make_inprocess(self, make):
+        self.flags(config_drive_inprocess=True)
+        self.mox.StubOutWithMock(utils, 'execute')
+        self.mox.StubOutWithMock(utils, 'mkfs')
+        self.mox.ReplayAll()
+
+        with configdrive.ConfigDriveBuilder() as c:
+            self.assertIsNone(c.tempdir)
+            c._add_file('this/is/a/path/hello', 'This is some content')
+            c._add_file('this/is/another', '')
+            (fd, imagefile) = tempfile.mkstemp(prefix='cd_inproc_')
+            os.close(fd)
+            self.addCleanup(fileutils.delete_if_exists, imagefile)
+            getattr(c, make)(imagefile)
+
+        with open(imagefile, 'rb') as f:
+            return f.read()
+
+    def test_create_configdrive_iso_inprocess(self):
+        image = self._make_inprocess('_make_iso9660')
+        # Primary and Joliet volume descriptors, then the terminator
+        self.assertEqual('\x01CD001', image[16 * 2048:16 * 2048 + 6])
+        self.assertEqual('\x02CD001', image[17 * 2048:17 * 2048 + 6])
+        self.assertEqual('\xffCD001', image[18 * 2048:18 * 2048 + 6])
+        self.assertEqual('config-2', image[16 * 2048 + 40:16 * 2048 + 48])
+        self.assertIn('This is some content', image)
+        self.assertIn(u'hello;1'.encode('utf-16-be'), image)
+
+    def test_create_configdrive_vfat_inprocess(self):
+        image = self._make_inprocess('_make_vfat')
+        self.assertEqual(configdrive.CONFIGDRIVESIZE_BYTES, len(image))
+        self.assertEqual('\x55\xaa', image[510:512])
+        self.assertEqual('config-2   FAT16   ', image[43:62])
+        self.assertIn('This is some content', image)
+        self.assertIn(u'hello'.encode('utf-16-le'), image)
+
+    def test_create_configdrive_vfat_inprocess_too_large(self):
+        self.flags(config_drive_inprocess=True)
+        with configdrive.ConfigDriveBuilder() as c:
+            # More files than the root directory has entries for
+            for i in range(600):
+                c._add_file('file%d' % i, 'content')
+            self.assertRaises(exception.ConfigDriveTooLarge,
+                              c._make_vfat, '/nonexistent/image')
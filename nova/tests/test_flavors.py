@@ -344,6 +344,72 @@ class InstanceTypeToolsTest(test.TestCase):
         flavors.delete_flavor_info(metadata, '', '_')
         self.assertEqual(metadata, {})
 
+    def test_save_flavor_info_compact(self):
+        self.flags(compact_flavor_info=True)
+        instance_type = flavors.get_default_flavor()
+        metadata = {}
+        flavors.save_flavor_info(metadata, instance_type, 'old_')
+        self.assertEqual(['old_flavor'], metadata.keys())
+        self._test_extract_flavor('')
+
+    def test_save_flavor_info_compact_replaces_flattened(self):
+        instance_type = flavors.get_default_flavor()
+        metadata = {}
+        flavors.save_flavor_info(metadata, instance_type)
+        self.flags(compact_flavor_info=True)
+        flavors.save_flavor_info(metadata, instance_type)
+        self.assertEqual(['flavor'], metadata.keys())
+        self.flags(compact_flavor_info=False)
+        flavors.save_flavor_info(metadata, instance_type)
+        self.assertNotIn('flavor', metadata)
+        self.assertIn('instance_type_id', metadata)
+
+    def test_save_flavor_info_compact_too_long(self):
+        self.flags(compact_flavor_info=True)
+        instance_type = flavors.get_default_flavor()
+        instance_type['name'] = 'x' * 255
+        metadata = {}
+        flavors.save_flavor_info(metadata, instance_type)
+        self.assertNotIn('flavor', metadata)
+        self.assertEqual('x' * 255, metadata['instance_type_name'])
+
+    def test_delete_flavor_info_compact(self):
+        instance_type = flavors.get_default_flavor()
+        metadata = {}
+        flavors.save_flavor_info(metadata, instance_type)
+        self.flags(compact_flavor_info=True)
+        flavors.save_flavor_info(metadata, instance_type, 'old_')
+        flavors.delete_flavor_info(metadata, '', 'old_')
+        self.assertEqual(metadata, {})
+
+    def test_compact_flavor_info(self):
+        instance_type = flavors.get_default_flavor()
+        metadata = {'foo': 'bar'}
+        flavors.save_flavor_info(metadata, instance_type)
+        flavors.save_flavor_info(metadata, instance_type, 'new_')
+        expected = flavors.extract_flavor({'system_metadata': metadata})
+
+        self.assertTrue(flavors.compact_flavor_info(metadata))
+        self.assertEqual(set(['foo', 'flavor', 'new_flavor']),
+                         set(metadata.keys()))
+        self.assertEqual(expected,
+                         flavors.extract_flavor({'system_metadata': metadata}))
+        self.assertFalse(flavors.compact_flavor_info(metadata))
+
+    def test_extract_flavor_compact_returns_copy(self):
+        self.flags(compact_flavor_info=True)
+        metadata = flavors.save_flavor_info({},
+                                            flavors.get_default_flavor())
+        instance = {'system_metadata': metadata}
+        flavors.extract_flavor(instance)['name'] = 'changed'
+        self.assertNotEqual('changed',
+                            flavors.extract_flavor(instance)['name'])
+
+    def test_extract_flavor_compact_bad_version(self):
+        instance = {'system_metadata': {'flavor': '[99,1]'}}
+        self.assertRaises(exception.NovaException,
+                          flavors.extract_flavor, instance)
+
 
 class InstanceTypeFilteringTest(test.TestCase):
     """Test cases for the filter option available for instance_type_get_all."""
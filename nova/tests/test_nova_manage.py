@@ -14,10 +14,13 @@
 #    under the License.
 
 import fixtures
+import mock
+import os
 import StringIO
 import sys
 
 from nova.cmd import manage
+from nova.compute import flavors
 from nova import context
 from nova import db
 from nova import exception
@@ -412,6 +415,55 @@ class DBCommandsTestCase(test.TestCase):
     def test_archive_deleted_rows_negative(self):
         self.assertEqual(1, self.commands.archive_deleted_rows(-1))
 
+    @mock.patch('time.sleep')
+    @mock.patch.object(db, 'archive_deleted_rows')
+    def test_archive_deleted_rows_background(self, mock_archive, mock_sleep):
+        state_file = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                  'state.json')
+        with open(state_file, 'w') as f:
+            f.write('{"instances": 5}')
+        progress = [(10, {'instances': 15}), (4, {}), (0, {})]
+        seen = []
+
+        def fake_archive(context, max_rows, markers):
+            seen.append(dict(markers))
+            rows, new_markers = progress.pop(0)
+            markers.clear()
+            markers.update(new_markers)
+            return rows
+
+        mock_archive.side_effect = fake_archive
+        self.commands.archive_deleted_rows(10, background=True, sleep='0.5',
+                                           state_file=state_file)
+        self.assertEqual([{'instances': 5}, {'instances': 15}, {}], seen)
+        self.assertEqual([mock.call(0.5)] * 2, mock_sleep.call_args_list)
+        with open(state_file) as f:
+            self.assertEqual('{}', f.read())
+
+    def test_migrate_flavor_info_disabled(self):
+        self.assertEqual(1, self.commands.migrate_flavor_info())
+
+    def test_migrate_flavor_info(self):
+        self.flags(compact_flavor_info=False)
+        ctxt = context.get_admin_context()
+        sys_meta = flavors.save_flavor_info({}, flavors.get_default_flavor())
+        uuids = []
+        for i in range(3):
+            instance = db.instance_create(ctxt, {'system_metadata': sys_meta})
+            uuids.append(instance['uuid'])
+
+        self.flags(compact_flavor_info=True)
+        self.commands.migrate_flavor_info(max_count='2')
+        converted = [
+            'flavor' in db.instance_system_metadata_get(ctxt, uuid)
+            for uuid in uuids]
+        self.assertEqual([True, True, False], converted)
+
+        self.commands.migrate_flavor_info()
+        sys_meta = db.instance_system_metadata_get(ctxt, uuids[2])
+        self.assertIn('flavor', sys_meta)
+        self.assertNotIn('instance_type_id', sys_meta)
+
 
 class ServiceCommandsTestCase(test.TestCase):
     def setUp(self):
@@ -126,6 +126,32 @@ class S3APITestCase(test.NoDBTestCase):
 
         self._ensure_no_buckets(bucket.get_all_keys())
 
+    def test_list_keys_after_put_and_delete(self):
+        bucket = self.conn.create_bucket('testbucket')
+        for key_name in ('a1', 'b1', 'a2'):
+            bucket.new_key(key_name).set_contents_from_string(key_name)
+
+        def list_keys(**kwargs):
+            return [k.name for k in bucket.get_all_keys(**kwargs)]
+
+        self.assertEqual(['a1', 'a2'], list_keys(prefix='a'))
+
+        bucket.new_key('a0').set_contents_from_string('a0')
+        bucket.delete_key('a1')
+        self.assertEqual(['a0', 'a2', 'b1'], list_keys())
+        self.assertEqual(['b1'], list_keys(marker='a2'))
+        self.assertEqual(['a0'], list_keys(maxkeys=1))
+
+    def test_get_key_range(self):
+        bucket = self.conn.create_bucket('testbucket')
+        key = bucket.new_key('somekey')
+        key.set_contents_from_string('0123456789')
+
+        key = bucket.get_key('somekey')
+        self.assertEqual('0123456789', key.get_contents_as_string())
+        self.assertEqual('234', key.get_contents_as_string(
+            headers={'Range': 'bytes=2-4'}))
+
     def test_unknown_bucket(self):
         # NOTE(unicell): Since Boto v2.25.0, the underlying implementation
         # of get_bucket method changed from GET to HEAD.
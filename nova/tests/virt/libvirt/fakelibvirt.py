@@ -87,6 +87,14 @@ VIR_DOMAIN_EVENT_PMSUSPENDED = 7
 
 VIR_DOMAIN_UNDEFINE_MANAGED_SAVE = 1
 
+# virDomainJobType
+VIR_DOMAIN_JOB_NONE = 0
+VIR_DOMAIN_JOB_BOUNDED = 1
+VIR_DOMAIN_JOB_UNBOUNDED = 2
+VIR_DOMAIN_JOB_COMPLETED = 3
+VIR_DOMAIN_JOB_FAILED = 4
+VIR_DOMAIN_JOB_CANCELLED = 5
+
 VIR_DOMAIN_AFFECT_CURRENT = 0
 VIR_DOMAIN_AFFECT_LIVE = 1
 VIR_DOMAIN_AFFECT_CONFIG = 2
@@ -263,6 +271,7 @@ class NWFilter(object):
 class Domain(object):
     def __init__(self, connection, xml, running=False, transient=False):
         self._connection = connection
+        self._id = -1
         if running:
             connection._mark_running(self)
 
@@ -271,7 +280,8 @@ class Domain(object):
         self._def = self._parse_definition(xml)
         self._has_saved_state = False
         self._snapshots = {}
-        self._id = self._connection._id_counter
+        self._job_info = [VIR_DOMAIN_JOB_NONE] + [0] * 11
+        self._max_downtime = None
 
     def _parse_definition(self, xml):
         try:
@@ -361,6 +371,10 @@ class Domain(object):
                     elif nic_info['type'] == 'bridge':
                         nic_info['source'] = source.get('bridge')
 
+                target = nic.find('./target')
+                if target is not None:
+                    nic_info['target_dev'] = target.get('dev')
+
                 nics_info += [nic_info]
 
             devices['nics'] = nics_info
@@ -435,6 +449,21 @@ class Domain(object):
                 error_code=VIR_ERR_INTERNAL_ERROR,
                 error_domain=VIR_FROM_QEMU)
 
+    def jobInfo(self):
+        return list(self._job_info)
+
+    def abortJob(self):
+        if self._job_info[0] == VIR_DOMAIN_JOB_NONE:
+            raise make_libvirtError(
+                    libvirtError,
+                    "Requested operation is not valid: no job is active",
+                    error_code=VIR_ERR_OPERATION_INVALID,
+                    error_domain=VIR_FROM_QEMU)
+        self._job_info = [VIR_DOMAIN_JOB_CANCELLED] + self._job_info[1:]
+
+    def migrateSetMaxDowntime(self, downtime, flags):
+        self._max_downtime = downtime
+
     def attachDevice(self, xml):
         disk_info = _parse_disk_info(etree.fromstring(xml))
         disk_info['_attached'] = True
@@ -474,9 +503,10 @@ class Domain(object):
             nics += '''<interface type='%(type)s'>
       <mac address='%(mac)s'/>
       <source %(type)s='%(source)s'/>
+      <target dev='%(target_dev)s'/>
       <address type='pci' domain='0x0000' bus='0x00' slot='0x03'
                function='0x0'/>
-    </interface>''' % nic
+    </interface>''' % dict(nic, target_dev=nic.get('target_dev', 'vnet0'))
 
         return '''<domain type='kvm'>
   <name>%(name)s</name>
@@ -624,6 +654,7 @@ class Connection(object):
         del self._nwfilters[nwfilter._name]
 
     def _mark_running(self, dom):
+        dom._id = self._id_counter
         self._running_vms[self._id_counter] = dom
         self._emit_lifecycle(dom, VIR_DOMAIN_EVENT_STARTED, 0)
         self._id_counter += 1
@@ -661,6 +692,9 @@ class Connection(object):
     def listDomainsID(self):
         return self._running_vms.keys()
 
+    def listAllDomains(self, flags):
+        return self._vms.values()
+
     def lookupByID(self, id):
         if id in self._running_vms:
             return self._running_vms[id]
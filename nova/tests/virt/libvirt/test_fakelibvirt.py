@@ -228,6 +228,16 @@ class FakeLibvirtTests(test.NoDBTestCase):
         raise self.failureException("Looking up an invalid domain ID didn't "
                                     "raise libvirtError")
 
+    def test_listAllDomains(self):
+        conn = self.get_openAuth_curry_func()('qemu:///system')
+        self.assertEqual(conn.listAllDomains(0), [])
+        conn.defineXML(get_vm_xml())
+        dom = conn.lookupByName('testname')
+        self.assertEqual(conn.listAllDomains(0), [dom])
+        self.assertEqual(dom.ID(), -1)
+        dom.createWithFlags(0)
+        self.assertEqual(conn.lookupByID(dom.ID()), dom)
+
     def test_define_and_retrieve(self):
         conn = self.get_openAuth_curry_func()('qemu:///system')
         self.assertEqual(conn.listDomainsID(), [])
@@ -21,6 +21,7 @@ import json
 import os
 import time
 
+import fixtures
 from oslo.config import cfg
 
 from nova import conductor
@@ -33,6 +34,7 @@ from nova.tests import fake_instance
 from nova import utils
 from nova.virt.libvirt import imagecache
 from nova.virt.libvirt import utils as virtutils
+from nova.virt import storage_users
 
 CONF = cfg.CONF
 CONF.import_opt('compute_manager', 'nova.service')
@@ -865,6 +867,49 @@ class VerifyChecksumTestCase(test.NoDBTestCase):
                 log = stream.getvalue()
                 self.assertNotEqual(log.find('image verification failed'), -1)
 
+    def test_verify_checksum_skips_unchanged(self):
+        self.flags(checksum_interval_seconds=0, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+            self.assertTrue(image_cache_manager._verify_checksum(self.img,
+                                                                 fname))
+
+            self.mox.StubOutWithMock(image_cache_manager, '_hash_file')
+            self.mox.ReplayAll()
+            self.assertTrue(image_cache_manager._verify_checksum(self.img,
+                                                                 fname))
+
+    def test_verify_checksum_resumes_within_budget(self):
+        self.flags(checksum_interval_seconds=0, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+            size = os.path.getsize(fname)
+
+            passes = 0
+            res = None
+            while res is None:
+                passes += 1
+                image_cache_manager._reset_state()
+                image_cache_manager.checksum_budget = 10
+                res = image_cache_manager._verify_checksum(self.img, fname)
+            self.assertTrue(res)
+            self.assertEqual((size + 9) // 10, passes)
+            self.assertEqual({}, image_cache_manager._checksums_in_progress)
+
+    def test_verify_checksum_restarts_changed_file(self):
+        self.flags(checksum_interval_seconds=0, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+            image_cache_manager.checksum_budget = 10
+            self.assertIsNone(image_cache_manager._verify_checksum(self.img,
+                                                                   fname))
+
+            with open(fname, 'a') as f:
+                f.write('more')
+            image_cache_manager._reset_state()
+            self.assertFalse(image_cache_manager._verify_checksum(self.img,
+                                                                  fname))
+
     def test_verify_checksum_file_missing(self):
         with utils.tempdir() as tmpdir:
             self.flags(instances_path=tmpdir)
@@ -880,3 +925,88 @@ class VerifyChecksumTestCase(test.NoDBTestCase):
             # Checksum requests for a file with no checksum now have the
             # side effect of creating the checksum
             self.assertTrue(os.path.exists(info_fname))
+
+
+class CoordinatedImageCacheTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(CoordinatedImageCacheTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.flags(instances_path=self.tmpdir)
+        self.flags(image_cache_coordinated=True, group='libvirt')
+        self.stubs.Set(virtutils, 'chown', lambda x, y: None)
+
+        self.base_dir = os.path.join(self.tmpdir, '_base')
+        os.mkdir(self.base_dir)
+        self.base_file = os.path.join(self.base_dir,
+                                      hashlib.sha1('1').hexdigest())
+        with open(self.base_file, 'w') as f:
+            f.write('image')
+
+        # Both nodes share the instances path
+        self.all_instances = [{'image_ref': '1',
+                               'host': 'node1',
+                               'name': 'instance-1',
+                               'uuid': '123',
+                               'vm_state': '',
+                               'task_state': ''},
+                              {'image_ref': '1',
+                               'host': 'node2',
+                               'name': 'instance-2',
+                               'uuid': '456',
+                               'vm_state': '',
+                               'task_state': ''}]
+
+    def _update(self, host):
+        self.flags(host=host)
+        image_cache_manager = imagecache.ImageCacheManager()
+        verified = []
+
+        def fake_age_and_verify(context, all_instances, base_dir):
+            verified.append(host)
+            image_cache_manager.active_base_files.append(self.base_file)
+
+        self.stubs.Set(image_cache_manager, '_age_and_verify_cached_images',
+                       fake_age_and_verify)
+        image_cache_manager.update(None, self.all_instances)
+        return image_cache_manager, verified
+
+    def test_claim_image_cache(self):
+        claim = storage_users.claim_image_cache
+        self.assertTrue(claim(self.base_dir, 'node1', 600))
+        self.assertFalse(claim(self.base_dir, 'node2', 600))
+        self.assertTrue(claim(self.base_dir, 'node1', 600))
+
+        # Another node takes over once the lease expired
+        self.assertTrue(claim(self.base_dir, 'node1', -1))
+        self.assertTrue(claim(self.base_dir, 'node2', 600))
+        self.assertFalse(claim(self.base_dir, 'node1', 600))
+
+    def test_update_coordinated(self):
+        manager1, verified = self._update('node1')
+        self.assertEqual(['node1'], verified)
+        index = imagecache.read_cache_index(self.base_dir)
+        self.assertEqual('node1', index['host'])
+        self.assertEqual([self.base_file], index['active'])
+
+        # The other node takes the results instead of verifying again
+        manager2, verified = self._update('node2')
+        self.assertEqual([], verified)
+        self.assertEqual([self.base_file], manager2.active_base_files)
+        self.assertEqual([], manager2.corrupt_base_files)
+
+        manager1, verified = self._update('node1')
+        self.assertEqual(['node1'], verified)
+
+    def test_update_coordinated_no_index(self):
+        storage_users.claim_image_cache(self.base_dir, 'node2', 600)
+        image_cache_manager, verified = self._update('node1')
+        self.assertEqual([], verified)
+        self.assertEqual([], image_cache_manager.active_base_files)
+
+    def test_update_uncoordinated(self):
+        self.flags(image_cache_coordinated=False, group='libvirt')
+        self.assertEqual(['node1'], self._update('node1')[1])
+        self.assertEqual(['node2'], self._update('node2')[1])
+        self.assertFalse(os.path.exists(
+            os.path.join(self.base_dir, 'image_cache_index')))
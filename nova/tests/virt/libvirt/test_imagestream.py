@@ -0,0 +1,59 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import os
+
+import fixtures
+
+from nova import test
+from nova.virt.libvirt import imagestream
+
+
+class ImageStreamTestCase(test.NoDBTestCase):
+
+    def _stream(self, data, **kwargs):
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        path = os.path.join(tmpdir, 'disk')
+        with open(path, 'wb') as f:
+            f.write(data)
+        stream = imagestream.ImageStream(path, **kwargs)
+        self.addCleanup(stream.close)
+        return stream
+
+    def test_read_in_pieces(self):
+        data = os.urandom(10000)
+        stream = self._stream(data, buffer_size=2048, chunk_size=1024)
+        pieces = []
+        while True:
+            piece = stream.read(777)
+            if not piece:
+                break
+            self.assertTrue(len(piece) <= 777)
+            pieces.append(piece)
+        self.assertEqual(data, b''.join(pieces))
+        self.assertEqual(10000, stream.bytes_read)
+        self.assertEqual(hashlib.md5(data).hexdigest(), stream.checksum())
+
+    def test_read_all(self):
+        data = os.urandom(5000)
+        stream = self._stream(data, buffer_size=1024, chunk_size=512)
+        self.assertEqual(data, stream.read())
+        self.assertEqual(b'', stream.read())
+
+    def test_read_error(self):
+        stream = imagestream.ImageStream('/nonexistent/disk', 1024)
+        self.addCleanup(stream.close)
+        self.assertRaises(IOError, stream.read)
@@ -3201,6 +3201,54 @@ class LibvirtConnTestCase(test.TestCase):
         self.assertEqual(snapshot['status'], 'active')
         self.assertEqual(snapshot['name'], snapshot_name)
 
+    def _stream_snapshot(self, checksum=None):
+        disk_path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'disk')
+        with open(disk_path, 'wb') as f:
+            f.write('disk contents')
+        uploaded = []
+
+        def fake_update(context, image_href, metadata, data):
+            uploaded.append(data.read())
+            return {'checksum': checksum or data.checksum()}
+
+        image_service = mock.Mock()
+        image_service.update.side_effect = fake_update
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        conn._stream_snapshot(self.context, {'uuid': 'fake-uuid'},
+                              image_service, 'fake-image', {}, disk_path)
+        return uploaded
+
+    def test_stream_snapshot(self):
+        self.assertEqual(['disk contents'], self._stream_snapshot())
+
+    def test_stream_snapshot_checksum_mismatch(self):
+        self.assertRaises(exception.ImageUnacceptable,
+                          self._stream_snapshot, checksum='bogus')
+
+    def test_snapshot_streams_stopped_raw_instance(self):
+        self.flags(snapshot_stream_upload=True, group='libvirt')
+        self.mox.StubOutWithMock(libvirt_driver.LibvirtDriver, '_conn')
+        libvirt_driver.LibvirtDriver._conn.lookupByName = self.fake_lookup
+        self.stubs.Set(libvirt_driver.libvirt_utils, 'disk_type', 'raw')
+        self.mox.ReplayAll()
+
+        image_service = nova.tests.image.fake.FakeImageService()
+        instance_ref = db.instance_create(self.context, self.test_instance)
+        recv_meta = image_service.create(context, {'name': 'test-snap'})
+
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        with contextlib.nested(
+            mock.patch.object(conn, '_stream_snapshot'),
+            mock.patch.object(FakeVirtDomain, 'info', return_value=[
+                libvirt_driver.VIR_DOMAIN_SHUTOFF]),
+            mock.patch.object(images, 'convert_image')
+        ) as (mock_stream, mock_info, mock_convert):
+            conn.snapshot(self.context, instance_ref, recv_meta['id'],
+                          mock.Mock())
+        self.assertTrue(mock_stream.called)
+        self.assertFalse(mock_convert.called)
+
     def test__create_snapshot_metadata(self):
         base = {}
         instance = {'kernel_id': 'kernel',
@@ -4017,6 +4065,65 @@ class LibvirtConnTestCase(test.TestCase):
 
         db.instance_destroy(self.context, instance_ref['uuid'])
 
+    def test_live_migration_monitor(self):
+        self.flags(live_migration_downtime=500,
+                   live_migration_downtime_steps=5,
+                   live_migration_monitor_interval=3,
+                   group='libvirt')
+        instance = fake_instance.fake_instance_obj(self.context,
+                                                   memory_mb=2048, progress=0)
+        dom = fakelibvirt.Connection('qemu:///system').createXML(
+            "<domain type='kvm'><name>fake</name><vcpu>1</vcpu>"
+            "<memory>2048</memory><devices/></domain>", 0)
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        with contextlib.nested(
+            mock.patch.object(loopingcall, 'FixedIntervalLoopingCall'),
+            mock.patch.object(instance, 'save')
+        ) as (mock_loop, mock_save):
+            timer = conn._start_live_migration_monitor(dom, instance, False)
+            self.assertEqual(mock_loop.return_value, timer)
+            timer.start.assert_called_once_with(interval=3, initial_delay=3)
+            check = mock_loop.call_args[0][0]
+
+            dom._job_info = ([fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED, 1, 0,
+                              100, 50, 50] + [0] * 6)
+            check()
+            self.assertEqual(100, dom._max_downtime)
+            self.assertEqual(50, instance.progress)
+            mock_save.assert_called_once_with()
+
+            # Errors from a job that is already over are ignored
+            with mock.patch.object(dom, 'jobInfo',
+                                   side_effect=libvirt.libvirtError('gone')):
+                check()
+
+    def test_live_migration_monitor_without_flavor(self):
+        instance = fake_instance.fake_instance_obj(self.context, progress=0)
+        instance.memory_mb = None
+        dom = fakelibvirt.Connection('qemu:///system').createXML(
+            "<domain type='kvm'><name>fake</name><vcpu>1</vcpu>"
+            "<memory>2048</memory><devices/></domain>", 0)
+        conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        with contextlib.nested(
+            mock.patch.object(loopingcall, 'FixedIntervalLoopingCall'),
+            mock.patch.object(instance, 'save')
+        ) as (mock_loop, mock_save):
+            conn._start_live_migration_monitor(dom, instance, True)
+            check = mock_loop.call_args[0][0]
+            dom._job_info = ([fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED, 1, 0,
+                              100, 50, 50] + [0] * 6)
+            check()
+            self.assertEqual(50, instance.progress)
+
+    def test_get_live_migration_data_gb(self):
+        get_data_gb = libvirt_driver.LibvirtDriver._get_live_migration_data_gb
+        instance = {'memory_mb': 4096, 'root_gb': 10, 'ephemeral_gb': None}
+        self.assertEqual(4, get_data_gb(instance, False))
+        self.assertEqual(14, get_data_gb(instance, True))
+        self.assertEqual(2, get_data_gb({'memory_mb': None}, False))
+
     def test_rollback_live_migration_at_destination(self):
         conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
         with mock.patch.object(conn, "destroy") as mock_destroy:
@@ -6244,56 +6351,38 @@ class LibvirtConnTestCase(test.TestCase):
         self.assertEqual(actual, expect)
 
     def test_failing_vcpu_count(self):
-        """Domain can fail to return the vcpu description in case it's
-        just starting up or shutting down. Make sure None is handled
-        gracefully.
+        """Domain can fail to return its info in case it's just starting
+        up or shutting down. Make sure such a domain is skipped gracefully.
         """
 
         class DiagFakeDomain(object):
-            def __init__(self, vcpus):
+            def __init__(self, id, vcpus):
+                self._id = id
                 self._vcpus = vcpus
 
-            def vcpus(self):
-                if self._vcpus is None:
-                    raise libvirt.libvirtError("fake-error")
-                else:
-                    return ([1] * self._vcpus, [True] * self._vcpus)
-
-        driver = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
-        conn = driver._conn
-        self.mox.StubOutWithMock(driver, 'list_instance_ids')
-        conn.lookupByID = self.mox.CreateMockAnything()
+            def ID(self):
+                return self._id
 
-        driver.list_instance_ids().AndReturn([1, 2])
-        conn.lookupByID(1).AndReturn(DiagFakeDomain(None))
-        conn.lookupByID(2).AndReturn(DiagFakeDomain(5))
+            def name(self):
+                return 'instance-%08x' % self._id
 
-        self.mox.ReplayAll()
-        self.assertEqual(5, driver.get_vcpu_used())
-
-    def test_failing_vcpu_count_none(self):
-        """Domain will return zero if the current number of vcpus used
-        is None. This is in case of VM state starting up or shutting
-        down. None type returned is counted as zero.
-        """
-
-        class DiagFakeDomain(object):
-            def __init__(self):
-                pass
+            def UUIDString(self):
+                return 'fake-uuid-%d' % self._id
 
-            def vcpus(self):
-                return None
+            def info(self):
+                if self._vcpus is None:
+                    raise libvirt.libvirtError("fake-error")
+                return [libvirt_driver.VIR_DOMAIN_RUNNING, 2048L, 2048L,
+                        self._vcpus, 0L]
 
         driver = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
-        conn = driver._conn
-        self.mox.StubOutWithMock(driver, 'list_instance_ids')
-        conn.lookupByID = self.mox.CreateMockAnything()
+        self.mox.StubOutWithMock(driver, '_list_all_domains')
 
-        driver.list_instance_ids().AndReturn([1])
-        conn.lookupByID(1).AndReturn(DiagFakeDomain())
+        driver._list_all_domains().AndReturn([DiagFakeDomain(1, None),
+                                              DiagFakeDomain(2, 5)])
 
         self.mox.ReplayAll()
-        self.assertEqual(0, driver.get_vcpu_used())
+        self.assertEqual(5, driver.get_vcpu_used())
 
     def test_get_instance_capabilities(self):
         conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
@@ -8763,7 +8852,7 @@ class LibvirtVolumeUsageTestCase(test.TestCase):
                       'device_name': 'vda'}]
 
     def test_get_all_volume_usage(self):
-        def fake_block_stats(instance_name, disk):
+        def fake_block_stats(instance_name, disk, snapshot=None):
             return (169L, 688640L, 0L, 0L, -1L)
 
         self.stubs.Set(self.conn, 'block_stats', fake_block_stats)
@@ -8792,6 +8881,154 @@ class LibvirtVolumeUsageTestCase(test.TestCase):
         self.assertEqual(vol_usage, [])
 
 
+class LibvirtDomainStatsTestCase(test.NoDBTestCase):
+    """Test for LibvirtDriver.get_domain_stats_snapshot and its users."""
+
+    def setUp(self):
+        super(LibvirtDomainStatsTestCase, self).setUp()
+        self.conn = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.libvirt_conn = fakelibvirt.Connection('qemu:///system')
+        self.stubs.Set(libvirt_driver.LibvirtDriver, '_conn',
+                       self.libvirt_conn)
+
+    def _define_domain(self, name, vcpus=1, memory=2048, running=True):
+        xml = """<domain type='kvm'>
+                   <name>%(name)s</name>
+                   <vcpu>%(vcpus)d</vcpu>
+                   <memory>%(memory)d</memory>
+                   <os>
+                     <type>hvm</type>
+                   </os>
+                   <devices>
+                     <interface type='bridge'>
+                       <mac address='fa:16:3e:00:00:01'/>
+                       <source bridge='br100'/>
+                       <target dev='tap0'/>
+                     </interface>
+                   </devices>
+                 </domain>""" % {'name': name, 'vcpus': vcpus,
+                                 'memory': memory}
+        dom = self.libvirt_conn.defineXML(xml)
+        if running:
+            dom.create()
+        return dom
+
+    def test_snapshot(self):
+        dom = self._define_domain('instance-1', vcpus=2)
+        self._define_domain('instance-2', running=False)
+
+        snapshot = self.conn.get_domain_stats_snapshot()
+        self.assertEqual(2, len(snapshot))
+        self.assertIsNone(snapshot.get('instance-3'))
+        dom_stats = snapshot.get('instance-1')
+        self.assertTrue(dom_stats.is_active())
+        self.assertEqual({'state': power_state.RUNNING,
+                          'max_mem': 2048L,
+                          'mem': 2048L,
+                          'num_cpu': 2,
+                          'cpu_time': 123456789L,
+                          'id': dom.ID()}, dom_stats.get_info())
+        self.assertFalse(snapshot.get('instance-2').is_active())
+        self.assertEqual(power_state.SHUTDOWN,
+                         snapshot.get('instance-2').state)
+
+    def test_snapshot_is_shared(self):
+        self._define_domain('instance-1')
+        with mock.patch.object(self.libvirt_conn, 'listAllDomains',
+                               wraps=self.libvirt_conn.listAllDomains) as la:
+            snapshot = self.conn.get_domain_stats_snapshot()
+            self.assertIs(snapshot, self.conn.get_domain_stats_snapshot())
+            self.conn.get_vcpu_used()
+            self.assertEqual(1, la.call_count)
+
+            self.assertIsNot(snapshot,
+                             self.conn.get_domain_stats_snapshot(max_age=0))
+            self.assertEqual(2, la.call_count)
+
+    def test_snapshot_without_list_all_domains(self):
+        self._define_domain('instance-1')
+        self._define_domain('instance-2', running=False)
+        self.libvirt_conn.listDefinedDomains = lambda: ['instance-2']
+        error = fakelibvirt.make_libvirtError(
+            libvirt.libvirtError, 'not supported',
+            error_code=libvirt.VIR_ERR_NO_SUPPORT)
+
+        with mock.patch.object(self.libvirt_conn, 'listAllDomains',
+                               side_effect=error):
+            snapshot = self.conn.get_domain_stats_snapshot()
+        self.assertEqual(set(['instance-1', 'instance-2']),
+                         set(dom_stats.name for dom_stats in snapshot))
+
+    def test_get_vcpu_used(self):
+        self._define_domain('instance-1', vcpus=2)
+        self._define_domain('instance-2', vcpus=3)
+        self._define_domain('instance-3', vcpus=4, running=False)
+        self.assertEqual(5, self.conn.get_vcpu_used())
+
+    def test_get_power_states(self):
+        self._define_domain('instance-1')
+        self._define_domain('instance-2', running=False)
+        instances = [{'name': 'instance-1', 'uuid': 'fake-uuid-1'},
+                     {'name': 'instance-2', 'uuid': 'fake-uuid-2'},
+                     {'name': 'instance-3', 'uuid': 'fake-uuid-3'}]
+
+        self.assertEqual({'fake-uuid-1': power_state.RUNNING,
+                          'fake-uuid-2': power_state.SHUTDOWN},
+                         self.conn.get_power_states(instances))
+
+    def test_get_power_states_not_from_shared_snapshot(self):
+        dom = self._define_domain('instance-1')
+        instance = {'name': 'instance-1', 'uuid': 'fake-uuid-1'}
+        snapshot = self.conn.get_domain_stats_snapshot()
+        dom.suspend()
+
+        self.assertIs(snapshot, self.conn.get_domain_stats_snapshot())
+        self.assertEqual({'fake-uuid-1': power_state.PAUSED},
+                         self.conn.get_power_states([instance]))
+
+    def test_get_all_bw_counters(self):
+        self.flags(enable_bandwidth_polling=True, group='libvirt')
+        self._define_domain('instance-1')
+        self._define_domain('instance-2', running=False)
+        instances = [{'name': 'instance-1', 'uuid': 'fake-uuid-1'},
+                     {'name': 'instance-2', 'uuid': 'fake-uuid-2'},
+                     {'name': 'instance-3', 'uuid': 'fake-uuid-3'}]
+
+        self.assertEqual([{'uuid': 'fake-uuid-1',
+                           'mac_address': 'fa:16:3e:00:00:01',
+                           'bw_in': 10000242400,
+                           'bw_out': 213412343233}],
+                         self.conn.get_all_bw_counters(instances))
+
+    def test_get_all_bw_counters_disabled(self):
+        self._define_domain('instance-1')
+        self.assertRaises(NotImplementedError,
+                          self.conn.get_all_bw_counters,
+                          [{'name': 'instance-1', 'uuid': 'fake-uuid-1'}])
+
+    def test_pause_invalidates_snapshot(self):
+        self._define_domain('instance-1')
+        instance = {'name': 'instance-1', 'uuid': 'fake-uuid-1'}
+        self.assertEqual({'fake-uuid-1': power_state.RUNNING},
+                         self.conn.get_power_states([instance]))
+
+        self.conn.pause(instance)
+        self.assertEqual({'fake-uuid-1': power_state.PAUSED},
+                         self.conn.get_power_states([instance]))
+        self.conn.unpause(instance)
+        self.assertEqual({'fake-uuid-1': power_state.RUNNING},
+                         self.conn.get_power_states([instance]))
+
+    def test_block_stats_from_snapshot(self):
+        self._define_domain('instance-1')
+        snapshot = self.conn.get_domain_stats_snapshot()
+        self.assertEqual([2, 10000242400, 234, 2343424234, 34],
+                         self.conn.block_stats('instance-1', 'vda',
+                                               snapshot=snapshot))
+        self.assertIsNone(self.conn.block_stats('instance-2', 'vda',
+                                                snapshot=snapshot))
+
+
 class LibvirtNonblockingTestCase(test.TestCase):
     """Test libvirtd calls are nonblocking."""
 
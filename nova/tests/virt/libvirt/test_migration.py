@@ -0,0 +1,125 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from nova import context
+from nova import test
+from nova.tests import fake_instance
+from nova.tests.virt.libvirt import fakelibvirt
+from nova.tests.virt.libvirt import test_fakelibvirt
+from nova.virt.libvirt import migration
+
+GiB = 1024 * 1024 * 1024
+
+
+class LiveMigrationMonitorTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(LiveMigrationMonitorTestCase, self).setUp()
+        self.flags(live_migration_downtime=500,
+                   live_migration_downtime_steps=5,
+                   live_migration_downtime_delay=10,
+                   live_migration_progress_timeout=20,
+                   live_migration_completion_timeout=100,
+                   group='libvirt')
+        conn = fakelibvirt.Connection('qemu:///system')
+        self.dom = conn.createXML(test_fakelibvirt.get_vm_xml(), 0)
+        self.instance = fake_instance.fake_instance_obj(
+            context.get_admin_context(), progress=0)
+        self.instance.save = mock.Mock()
+
+    def _monitor(self, data_gb=1):
+        return migration.LiveMigrationMonitor(self.dom, self.instance,
+                                              data_gb, 0)
+
+    def _sample(self, monitor, now, processed, remaining,
+                total=2 * GiB):
+        self.dom._job_info = [fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED, now, 0,
+                              total, processed, remaining] + [0] * 6
+        monitor.update(self.dom.jobInfo(), now)
+
+    def _job_type(self):
+        return self.dom.jobInfo()[0]
+
+    def test_downtime_steps(self):
+        self.assertEqual([(0, 100), (10, 200), (20, 300), (30, 400),
+                          (40, 500)],
+                         migration.downtime_steps(500, 5, 10))
+
+    def test_no_job(self):
+        monitor = self._monitor()
+        monitor.update(self.dom.jobInfo(), 5)
+        self.assertIsNone(self.dom._max_downtime)
+        self.assertFalse(self.instance.save.called)
+
+    def test_progress_and_first_step(self):
+        monitor = self._monitor()
+        self._sample(monitor, 5, GiB / 2, 3 * GiB / 2)
+        self.assertEqual(100, self.dom._max_downtime)
+        self.assertEqual(25, self.instance.progress)
+        self.assertEqual(1, self.instance.save.call_count)
+
+    def test_progress_save_failure_ignored(self):
+        self.instance.save.side_effect = test.TestingException()
+        monitor = self._monitor()
+        self._sample(monitor, 5, GiB / 2, 3 * GiB / 2)
+        self.assertEqual(25, self.instance.progress)
+        self.assertEqual(100, self.dom._max_downtime)
+
+    def test_downtime_raised_when_not_converging(self):
+        monitor = self._monitor()
+        self._sample(monitor, 5, GiB / 2, 3 * GiB / 2)
+        # 100MiB/s sent, but the guest dirtied most of it again
+        self._sample(monitor, 25, GiB / 2 + 2 * GiB, GiB)
+        self.assertEqual(300, self.dom._max_downtime)
+        self.assertTrue(monitor.dirty_rate > 0)
+
+    def test_downtime_kept_when_converging(self):
+        monitor = self._monitor()
+        self._sample(monitor, 5, GiB / 2, 3 * GiB / 2)
+        # The last few MiB go out well within the current downtime
+        self._sample(monitor, 25, 2 * GiB - 1024, 1024)
+        self.assertEqual(100, self.dom._max_downtime)
+        self.assertEqual(100, self.instance.progress)
+
+    def test_stall_raises_downtime_then_aborts(self):
+        monitor = self._monitor()
+        self._sample(monitor, 1, GiB, GiB)
+        self._sample(monitor, 22, 2 * GiB, GiB)
+        self.assertEqual(500, self.dom._max_downtime)
+        self.assertEqual(fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+                         self._job_type())
+
+        self._sample(monitor, 43, 3 * GiB, GiB)
+        self.assertEqual(fakelibvirt.VIR_DOMAIN_JOB_CANCELLED,
+                         self._job_type())
+
+    def test_stall_detection_disabled(self):
+        self.flags(live_migration_progress_timeout=0, group='libvirt')
+        monitor = self._monitor()
+        self._sample(monitor, 1, GiB, GiB)
+        self._sample(monitor, 50, 2 * GiB, GiB)
+        self.assertEqual(fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+                         self._job_type())
+
+    def test_completion_timeout(self):
+        monitor = self._monitor(data_gb=2)
+        self._sample(monitor, 150, GiB, GiB)
+        self.assertEqual(fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+                         self._job_type())
+        self._sample(monitor, 201, 2 * GiB, GiB / 2)
+        self.assertEqual(fakelibvirt.VIR_DOMAIN_JOB_CANCELLED,
+                         self._job_type())
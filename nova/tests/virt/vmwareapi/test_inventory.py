@@ -0,0 +1,112 @@
+# Copyright (c) 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from nova import test
+from nova.tests.virt.vmwareapi import stubs
+from nova.virt.vmwareapi import driver
+from nova.virt.vmwareapi import fake
+from nova.virt.vmwareapi import inventory
+from nova.virt.vmwareapi import vim_util
+from nova.virt.vmwareapi import vm_util
+
+
+class InventoryCacheTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(InventoryCacheTestCase, self).setUp()
+        self.flags(api_retry_count=1, group='vmware')
+        fake.reset()
+        stubs.set_stubs(self.stubs)
+        self.session = driver.VMwareAPISession()
+        self.cache = inventory.InventoryCache(self.session)
+        inventory.set_cache(self.cache)
+        self.addCleanup(inventory.set_cache, None)
+        self.addCleanup(fake.cleanup)
+
+    def _create_vm(self, name, **kwargs):
+        vm = fake.VirtualMachine(name=name, **kwargs)
+        fake._create_object('VirtualMachine', vm)
+        return vm
+
+    def _spy_call_method(self):
+        return mock.patch.object(self.session, '_call_method',
+                                 wraps=self.session._call_method)
+
+    def _called_methods(self, mock_call):
+        return [call[0][1] for call in mock_call.call_args_list]
+
+    def test_get_vm_ref_from_name(self):
+        vm = self._create_vm('vm-a')
+        self.assertEqual(vm.obj, self.cache.get_vm_ref_from_name('vm-a'))
+        self.assertIsNone(self.cache.get_vm_ref_from_name('vm-b'))
+
+    def test_get_properties(self):
+        vm = self._create_vm('vm-a', numCpu=2, mem=512)
+        props = self.cache.get_properties(vm.obj)
+        self.assertEqual(2, props['summary.config.numCpu'])
+        self.assertEqual(512, props['summary.config.memorySizeMB'])
+        self.assertEqual('poweredOn', props['runtime.powerState'])
+        self.assertNotIn('config.files.vmPathName', props)
+
+    def test_incremental_updates(self):
+        vm = self._create_vm('vm-a')
+        self.cache.update()
+
+        with self._spy_call_method() as mock_call:
+            self.assertEqual(vm.obj, self.cache.get_vm_ref_from_name('vm-a'))
+
+            vm.set('name', 'vm-b')
+            vm.set('runtime.powerState', 'poweredOff')
+            self.assertIsNone(self.cache.get_vm_ref_from_name('vm-a'))
+            self.assertEqual(vm.obj, self.cache.get_vm_ref_from_name('vm-b'))
+            self.assertEqual('poweredOff', self.cache.get_properties(
+                vm.obj)['runtime.powerState'])
+
+            del fake._db_content['VirtualMachine'][vm.obj]
+            self.assertIsNone(self.cache.get_vm_ref_from_name('vm-b'))
+            self.assertIsNone(self.cache.get_properties(vm.obj))
+
+        # Only incremental updates, no filter re-creation or full listing
+        self.assertEqual(set(['wait_for_updates_ex']),
+                         set(self._called_methods(mock_call)))
+
+    def test_resync_after_failed_update(self):
+        vm = self._create_vm('vm-a')
+        self.cache.update()
+        # e.g. the session was re-created and the filter lost
+        self.cache._version = 'stale'
+
+        with self._spy_call_method() as mock_call:
+            self.assertEqual(vm.obj, self.cache.get_vm_ref_from_name('vm-a'))
+
+        self.assertIn('create_filter', self._called_methods(mock_call))
+
+    def test_vm_util_lookups_use_cache(self):
+        vm = self._create_vm('fake-uuid')
+        with mock.patch.object(vim_util, 'get_objects') as mock_get_objects:
+            self.assertEqual(vm.obj, vm_util._get_vm_ref_from_name(
+                self.session, 'fake-uuid'))
+            self.assertEqual(vm.obj, vm_util._get_vm_ref_from_uuid(
+                self.session, 'fake-uuid'))
+        self.assertFalse(mock_get_objects.called)
+
+    def test_get_host_summary(self):
+        host_mor = fake._get_objects('HostSystem').objects[0].obj
+        summary = vm_util.get_host_summary(self.session, host_mor)
+        self.assertEqual(16, summary.hardware.numCpuThreads)
+
+    def test_cache_not_used_for_other_sessions(self):
+        self.assertIsNone(inventory.get_cache(mock.sentinel.session))
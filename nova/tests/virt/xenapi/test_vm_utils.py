@@ -1741,20 +1741,137 @@ class GetAllVdiForVMTestCase(VMUtilsTestBase):
 
 class GetAllVdisTestCase(VMUtilsTestBase):
     def test_get_all_vdis_in_sr(self):
-
-        def fake_get_rec(record_type, ref):
-            if ref == "2":
-                return "vdi_rec_2"
-
+        vdi_rec = {'uuid': 'vdi_uuid', 'sm_config': {}}
         session = mock.Mock()
-        session.call_xenapi.return_value = ["1", "2"]
-        session.get_rec.side_effect = fake_get_rec
+        session.call_xenapi.return_value = {'2': vdi_rec}
 
         sr_ref = "sr_ref"
         actual = list(vm_utils._get_all_vdis_in_sr(session, sr_ref))
-        self.assertEqual(actual, [('2', 'vdi_rec_2')])
+        self.assertEqual(actual, [('2', vdi_rec)])
 
-        session.call_xenapi.assert_called_once_with("SR.get_VDIs", sr_ref)
+        session.call_xenapi.assert_called_once_with(
+                "VDI.get_all_records_where", 'field "SR"="sr_ref"')
+        self.assertFalse(session.get_rec.called)
+
+
+class SRInventoryTestCase(VMUtilsTestBase):
+    def setUp(self):
+        super(SRInventoryTestCase, self).setUp()
+        self.flags(disable_process_locking=True,
+                   instance_name_template='%d',
+                   firewall_driver='nova.virt.xenapi.firewall.'
+                                   'Dom0IptablesFirewallDriver')
+        self.flags(connection_url='test_url',
+                   connection_password='test_pass',
+                   group='xenserver')
+        stubs.stubout_session(self.stubs, fake.SessionBase)
+        driver = xenapi_conn.XenAPIDriver(False)
+        self.session = driver._session
+
+        # base <- cached <- leaf1
+        #                <- leaf2
+        self.sr_ref = fake.create_sr()
+        self.base_ref = self._create_vdi('base')
+        self.cached_ref = self._create_vdi('cached', self.base_ref)
+        self.leaf1_ref = self._create_vdi('leaf1', self.cached_ref)
+        self.leaf2_ref = self._create_vdi('leaf2', self.cached_ref)
+        # A VDI in another SR must never show up in the inventory
+        fake.create_vdi('other', fake.create_sr())
+
+    def _create_vdi(self, name_label, parent_ref=None):
+        sm_config = {}
+        if parent_ref:
+            sm_config['vhd-parent'] = self._uuid(parent_ref)
+        return fake.create_vdi(name_label, self.sr_ref, sm_config=sm_config)
+
+    def _uuid(self, vdi_ref):
+        return fake.get_record('VDI', vdi_ref)['uuid']
+
+    def test_single_round_trip(self):
+        with mock.patch.object(self.session, 'call_xenapi',
+                               wraps=self.session.call_xenapi) as mock_call:
+            inventory = vm_utils.SRInventory(self.session, self.sr_ref)
+            chain = list(vm_utils._walk_vdi_chain(
+                self.session, self._uuid(self.leaf1_ref), inventory))
+            children = vm_utils._child_vhds(
+                self.session, self.sr_ref, self._uuid(self.cached_ref),
+                inventory=inventory)
+
+        self.assertEqual(1, mock_call.call_count)
+        self.assertEqual(4, len(inventory))
+        self.assertEqual(['leaf1', 'cached', 'base'],
+                         [rec['name_label'] for rec in chain])
+        self.assertEqual(set([self._uuid(self.leaf1_ref),
+                              self._uuid(self.leaf2_ref)]), children)
+
+    def test_walk_chain_without_inventory(self):
+        with contextlib.nested(
+            mock.patch.object(vm_utils, 'scan_default_sr',
+                              return_value=self.sr_ref),
+            mock.patch.object(self.session, 'call_xenapi',
+                              wraps=self.session.call_xenapi)
+        ) as (mock_scan, mock_call):
+            chain = list(vm_utils._walk_vdi_chain(
+                self.session, self._uuid(self.leaf2_ref)))
+
+        mock_scan.assert_called_once_with(self.session)
+        self.assertNotIn('VDI.get_all_records_where',
+                         [call[0][0] for call in mock_call.call_args_list])
+        self.assertEqual(['leaf2', 'cached', 'base'],
+                         [rec['name_label'] for rec in chain])
+
+    def test_matches_sr_get_vdis(self):
+        inventory = vm_utils.SRInventory(self.session, self.sr_ref)
+        self.assertEqual(
+            sorted(self.session.call_xenapi('SR.get_VDIs', self.sr_ref)),
+            sorted(ref for ref, _rec in inventory))
+
+    def test_walk_chain_outside_inventory(self):
+        inventory = vm_utils.SRInventory(self.session, self.sr_ref)
+        inventory.forget(self.cached_ref)
+        with mock.patch.object(self.session, 'call_xenapi',
+                               wraps=self.session.call_xenapi) as mock_call:
+            chain = list(vm_utils._walk_vdi_chain(
+                self.session, self._uuid(self.leaf1_ref), inventory))
+
+        self.assertEqual(['leaf1', 'cached', 'base'],
+                         [rec['name_label'] for rec in chain])
+        self.assertEqual(['VDI.get_by_uuid', 'VDI.get_record'],
+                         [call[0][0] for call in mock_call.call_args_list])
+
+    def test_forget(self):
+        inventory = vm_utils.SRInventory(self.session, self.sr_ref)
+        inventory.forget(self.leaf2_ref)
+
+        self.assertIsNone(inventory.get_rec(self.leaf2_ref))
+        self.assertIsNone(
+            inventory.get_ref_by_uuid(self._uuid(self.leaf2_ref)))
+        self.assertEqual(set([self._uuid(self.leaf1_ref)]),
+                         inventory.child_uuids(self._uuid(self.cached_ref)))
+
+    def test_another_child_vhd(self):
+        self.assertTrue(vm_utils._another_child_vhd(
+            self.session, self.leaf1_ref, self.sr_ref,
+            self._uuid(self.cached_ref)))
+        fake.destroy_vdi(self.leaf2_ref)
+        self.assertFalse(vm_utils._another_child_vhd(
+            self.session, self.leaf1_ref, self.sr_ref,
+            self._uuid(self.cached_ref)))
+
+    def test_destroy_cached_images(self):
+        image_ref = self._create_vdi('image')
+        fake.get_record('VDI', image_ref)['other_config'] = {
+            'image-id': 'fake_image_id'}
+        image_uuid = self._uuid(image_ref)
+
+        with mock.patch.object(self.session, 'call_xenapi',
+                               wraps=self.session.call_xenapi) as mock_call:
+            destroyed = vm_utils.destroy_cached_images(
+                self.session, self.sr_ref, dry_run=True)
+
+        self.assertEqual(set([image_uuid]), destroyed)
+        mock_call.assert_called_once_with(
+            'VDI.get_all_records_where', 'field "SR"="%s"' % self.sr_ref)
 
 
 class VDIAttachedHere(VMUtilsTestBase):
@@ -1796,6 +1913,8 @@ class SnapshotAttachedHereTestCase(VMUtilsTestBase):
                                           "label", '0', None)
 
     @mock.patch.object(vm_utils, 'safe_destroy_vdis')
+    @mock.patch.object(vm_utils, 'SRInventory')
+    @mock.patch.object(vm_utils, '_scan_sr')
     @mock.patch.object(vm_utils, '_walk_vdi_chain')
     @mock.patch.object(vm_utils, '_wait_for_vhd_coalesce')
     @mock.patch.object(vm_utils, '_vdi_get_uuid')
@@ -1804,8 +1923,8 @@ class SnapshotAttachedHereTestCase(VMUtilsTestBase):
     @mock.patch.object(vm_utils, 'get_vdi_for_vm_safely')
     def test_snapshot_attached_here_impl(self, mock_get_vdi_for_vm_safely,
             mock_get_vhd_parent_uuid, mock_vdi_snapshot, mock_vdi_get_uuid,
-            mock_wait_for_vhd_coalesce, mock_walk_vdi_chain,
-            mock_safe_destroy_vdis):
+            mock_wait_for_vhd_coalesce, mock_walk_vdi_chain, mock_scan_sr,
+            mock_sr_inventory, mock_safe_destroy_vdis):
         session = "session"
         instance = {"uuid": "uuid"}
         mock_callback = mock.Mock()
@@ -1833,7 +1952,11 @@ class SnapshotAttachedHereTestCase(VMUtilsTestBase):
         mock_wait_for_vhd_coalesce.assert_called_once_with(session, instance,
                 "sr_ref", "vdi_ref", "original_uuid")
         mock_vdi_get_uuid.assert_called_once_with(session, "snap_ref")
-        mock_walk_vdi_chain.assert_called_once_with(session, "snap_uuid")
+        mock_scan_sr.assert_called_once_with(session, "sr_ref")
+        mock_sr_inventory.assert_called_once_with(session, "sr_ref")
+        mock_walk_vdi_chain.assert_called_once_with(
+                session, "snap_uuid",
+                inventory=mock_sr_inventory.return_value)
         mock_callback.assert_called_once_with(
                 task_state="image_pending_upload")
         mock_safe_destroy_vdis.assert_called_once_with(session, ["snap_ref"])
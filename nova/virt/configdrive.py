@@ -28,6 +28,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import units
 from nova import utils
 from nova import version
+from nova.virt import fsimage
 
 LOG = logging.getLogger(__name__)
 
@@ -47,7 +48,12 @@ configdrive_opts = [
     cfg.StrOpt('mkisofs_cmd',
                default='genisoimage',
                help='Name and optionally path of the tool used for '
-                    'ISO image creation')
+                    'ISO image creation'),
+    cfg.BoolOpt('config_drive_inprocess',
+                default=False,
+                help='Write config drive images directly, without staging '
+                     'the files in a temporary directory and running '
+                     'mkisofs_cmd, or mkfs and a loop mount'),
     ]
 
 CONF = cfg.CONF
@@ -62,12 +68,15 @@ class ConfigDriveBuilder(object):
 
     def __init__(self, instance_md=None):
         self.imagefile = None
+        self.tempdir = None
+        self._files = []
 
-        # TODO(mikal): I don't think I can use utils.tempdir here, because
-        # I need to have the directory last longer than the scope of this
-        # method call
-        self.tempdir = tempfile.mkdtemp(dir=CONF.config_drive_tempdir,
-                                        prefix='cd_gen_')
+        if not CONF.config_drive_inprocess:
+            # TODO(mikal): I don't think I can use utils.tempdir here,
+            # because I need to have the directory last longer than the
+            # scope of this method call
+            self.tempdir = tempfile.mkdtemp(dir=CONF.config_drive_tempdir,
+                                            prefix='cd_gen_')
 
         if instance_md is not None:
             self.add_instance_metadata(instance_md)
@@ -84,6 +93,9 @@ class ConfigDriveBuilder(object):
         self.cleanup()
 
     def _add_file(self, path, data):
+        if self.tempdir is None:
+            self._files.append((path, data))
+            return
         filepath = os.path.join(self.tempdir, path)
         dirname = os.path.dirname(filepath)
         fileutils.ensure_tree(dirname)
@@ -96,12 +108,19 @@ class ConfigDriveBuilder(object):
             LOG.debug(_('Added %(filepath)s to config drive'),
                       {'filepath': path})
 
-    def _make_iso9660(self, path):
-        publisher = "%(product)s %(version)s" % {
+    def _publisher(self):
+        return "%(product)s %(version)s" % {
             'product': version.product_string(),
             'version': version.version_string_with_package()
             }
 
+    def _make_iso9660(self, path):
+        if self.tempdir is None:
+            fsimage.write_iso9660(path, self._files, 'config-2',
+                                  self._publisher())
+            return
+
+        publisher = self._publisher()
         utils.execute(CONF.mkisofs_cmd,
                       '-o', path,
                       '-ldots',
@@ -119,6 +138,11 @@ class ConfigDriveBuilder(object):
                       run_as_root=False)
 
     def _make_vfat(self, path):
+        if self.tempdir is None:
+            fsimage.write_vfat(path, self._files, 'config-2',
+                               CONFIGDRIVESIZE_BYTES)
+            return
+
         # NOTE(mikal): This is a little horrible, but I couldn't find an
         # equivalent to genisoimage for vfat filesystems.
         with open(path, 'wb') as f:
@@ -157,6 +181,8 @@ class ConfigDriveBuilder(object):
         :param path: the path to place the config drive image at
 
         :raises ProcessExecuteError if a helper process has failed.
+        :raises ConfigDriveTooLarge if the content does not fit in the
+                image written in process.
         """
         if CONF.config_drive_format == 'iso9660':
             self._make_iso9660(path)
@@ -170,6 +196,9 @@ class ConfigDriveBuilder(object):
         if self.imagefile:
             fileutils.delete_if_exists(self.imagefile)
 
+        if self.tempdir is None:
+            return
+
         try:
             shutil.rmtree(self.tempdir)
         except OSError as e:
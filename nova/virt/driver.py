@@ -399,6 +399,19 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_power_states(self, instances):
+        """Return the power state of every instance at once.
+
+        Drivers able to query all of their VMs in a few calls implement
+        this so that the power state sync doesn't need a get_info() call
+        per instance.
+
+        :param instances: nova.objects.instance.InstanceList
+        :returns: a dict of instance uuid to power_state code; instances
+                  not found on the hypervisor are left out
+        """
+        raise NotImplementedError()
+
     def get_all_bw_counters(self, instances):
         """Return bandwidth usage counters for each interface on each
            running VM.
@@ -0,0 +1,504 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Writers of small read-only filesystem images.
+
+These build ISO9660 (with Joliet names) and VFAT (FAT16 with long names)
+images of a set of files held in memory, writing the image file directly
+instead of populating a directory tree and running mkisofs, or mkfs and a
+loop mount. They support what config drives need: regular files and
+directories, written once.
+"""
+
+import re
+import struct
+import time
+
+import six
+
+from nova import exception
+
+
+def _text(value):
+    if isinstance(value, six.text_type):
+        return value
+    return value.decode('utf-8')
+
+
+class _File(object):
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+
+
+class _Directory(object):
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.dirs = {}
+        self.files = {}
+
+    def children(self):
+        """Return the (name, child) pairs sorted by name, child being a
+        _Directory or a _File.
+        """
+        return sorted(list(self.dirs.items()) + list(self.files.items()),
+                      key=lambda item: item[0])
+
+
+def _make_tree(files):
+    """Build a directory tree of (path, data) pairs."""
+    root = _Directory(u'')
+    for path, data in files:
+        parts = [part for part in _text(path).split(u'/') if part]
+        directory = root
+        for part in parts[:-1]:
+            if part not in directory.dirs:
+                directory.dirs[part] = _Directory(part, directory)
+            directory = directory.dirs[part]
+        directory.files[parts[-1]] = _File(data)
+    return root
+
+
+def _walk(root):
+    """Return the directories of the tree in breadth-first order."""
+    directories = [root]
+    for directory in directories:
+        directories.extend(child for _name, child in directory.children()
+                           if isinstance(child, _Directory))
+    return directories
+
+
+def _sectors(size, sector_size):
+    return (size + sector_size - 1) // sector_size
+
+
+# ISO9660
+
+ISO_SECTOR = 2048
+_ISO_INVALID_CHARS = re.compile(r'[^A-Za-z0-9_.]')
+
+
+def _both16(value):
+    return struct.pack('<H', value) + struct.pack('>H', value)
+
+
+def _both32(value):
+    return struct.pack('<I', value) + struct.pack('>I', value)
+
+
+def _iso_identifier(name, is_dir, joliet):
+    if joliet:
+        if not is_dir:
+            name = name[:62] + u';1'
+        return name[:64].encode('utf-16-be')
+    name = _ISO_INVALID_CHARS.sub(u'_', name).encode('ascii')
+    if is_dir:
+        return name[:31]
+    return name[:29] + b';1'
+
+
+def _iso_text(text, length, joliet):
+    text = _text(text)
+    if joliet:
+        text = text.encode('utf-16-be')
+        return (text + b'\x00 ' * length)[:length]
+    return (text.encode('ascii', 'replace') + b' ' * length)[:length]
+
+
+def _iso_record_date(timestamp):
+    return struct.pack('7B', timestamp.tm_year - 1900, timestamp.tm_mon,
+                       timestamp.tm_mday, timestamp.tm_hour,
+                       timestamp.tm_min, timestamp.tm_sec, 0)
+
+
+def _iso_volume_date(timestamp):
+    return time.strftime('%Y%m%d%H%M%S00', timestamp).encode('ascii') + b'\x00'
+
+
+def _iso_record(identifier, extent, size, is_dir, timestamp):
+    length = 33 + len(identifier) + (1 - len(identifier) % 2)
+    return (struct.pack('BB', length, 0) + _both32(extent) + _both32(size) +
+            _iso_record_date(timestamp) +
+            struct.pack('BBB', 2 if is_dir else 0, 0, 0) + _both16(1) +
+            struct.pack('B', len(identifier)) + identifier +
+            b'\x00' * (1 - len(identifier) % 2))
+
+
+class _IsoHierarchy(object):
+    """The directory records and path tables of one name space."""
+
+    def __init__(self, directories, joliet):
+        self.directories = directories
+        self.joliet = joliet
+        self.numbers = dict((id(d), n + 1) for n, d in enumerate(directories))
+
+    def identifier(self, directory):
+        if directory.parent is None:
+            return b'\x00'
+        return _iso_identifier(directory.name, True, self.joliet)
+
+    def entries(self, directory):
+        """Return the (identifier, child) pairs of directory, sorted."""
+        entries = []
+        for name, child in directory.children():
+            is_dir = isinstance(child, _Directory)
+            entries.append((_iso_identifier(name, is_dir, self.joliet),
+                            child))
+        return sorted(entries, key=lambda entry: entry[0])
+
+    def directory_size(self, directory):
+        """Return the size of the extent of directory, in bytes."""
+        lengths = [34, 34] + [33 + len(i) + (1 - len(i) % 2)
+                              for i, _child in self.entries(directory)]
+        sectors, used = 1, 0
+        for length in lengths:
+            if used + length > ISO_SECTOR:
+                sectors += 1
+                used = 0
+            used += length
+        return sectors * ISO_SECTOR
+
+    def path_table(self, extents, big_endian):
+        fmt = '>IH' if big_endian else '<IH'
+        table = []
+        for directory in self.directories:
+            identifier = self.identifier(directory)
+            parent = directory.parent or directory
+            table.append(struct.pack('BB', len(identifier), 0) +
+                         struct.pack(fmt, extents[id(directory)],
+                                     self.numbers[id(parent)]) +
+                         identifier + b'\x00' * (len(identifier) % 2))
+        return b''.join(table)
+
+    def directory_extent(self, directory, extents, sizes, timestamp):
+        parent = directory.parent or directory
+        records = [
+            _iso_record(b'\x00', extents[id(directory)],
+                        sizes[id(directory)], True, timestamp),
+            _iso_record(b'\x01', extents[id(parent)], sizes[id(parent)],
+                        True, timestamp)]
+        for identifier, child in self.entries(directory):
+            is_dir = isinstance(child, _Directory)
+            records.append(_iso_record(identifier, extents[id(child)],
+                                       sizes[id(child)], is_dir, timestamp))
+        extent = b''
+        sector = b''
+        for record in records:
+            if len(sector) + len(record) > ISO_SECTOR:
+                extent += sector.ljust(ISO_SECTOR, b'\x00')
+                sector = b''
+            sector += record
+        return extent + sector.ljust(ISO_SECTOR, b'\x00')
+
+
+def _iso_volume_descriptor(hierarchy, volume_id, publisher, volume_sectors,
+                           path_table_size, path_tables, root_record,
+                           timestamp):
+    joliet = hierarchy.joliet
+    date = _iso_volume_date(timestamp)
+    no_date = b'0' * 16 + b'\x00'
+    descriptor = (
+        struct.pack('B', 2 if joliet else 1) + b'CD001\x01\x00' +
+        _iso_text(u'LINUX', 32, joliet) +
+        _iso_text(volume_id, 32, joliet) +
+        b'\x00' * 8 + _both32(volume_sectors) +
+        (b'%/E' if joliet else b'').ljust(32, b'\x00') +
+        _both16(1) + _both16(1) + _both16(ISO_SECTOR) +
+        _both32(path_table_size) +
+        struct.pack('<II', path_tables[0], 0) +
+        struct.pack('>II', path_tables[1], 0) +
+        root_record +
+        _iso_text(u'', 128, joliet) +
+        _iso_text(publisher, 128, joliet) +
+        _iso_text(u'', 128, joliet) +
+        _iso_text(u'', 128, joliet) +
+        _iso_text(u'', 37, joliet) * 3 +
+        date + date + no_date + date + b'\x01\x00')
+    return descriptor.ljust(ISO_SECTOR, b'\x00')
+
+
+def write_iso9660(path, files, volume_id, publisher=u''):
+    """Write an ISO9660 image with Joliet names of files.
+
+    :param path: the image file to write
+    :param files: an iterable of (path, data) pairs
+    :param volume_id: the volume label
+    :param publisher: the publisher identifier
+    """
+    root = _make_tree(files)
+    directories = _walk(root)
+    hierarchies = [_IsoHierarchy(directories, False),
+                   _IsoHierarchy(directories, True)]
+    timestamp = time.gmtime()
+
+    # Sectors 0-15 are the system area, followed by the primary and Joliet
+    # volume descriptors and the terminator.
+    next_sector = 19
+    path_tables = []
+    for hierarchy in hierarchies:
+        size = len(hierarchy.path_table(dict((id(d), 0)
+                                             for d in directories), False))
+        sectors = _sectors(size, ISO_SECTOR)
+        path_tables.append((size, next_sector, next_sector + sectors))
+        next_sector += 2 * sectors
+
+    extents = []
+    sizes = []
+    for hierarchy in hierarchies:
+        hierarchy_extents = {}
+        hierarchy_sizes = {}
+        for directory in directories:
+            size = hierarchy.directory_size(directory)
+            hierarchy_extents[id(directory)] = next_sector
+            hierarchy_sizes[id(directory)] = size
+            next_sector += size // ISO_SECTOR
+        extents.append(hierarchy_extents)
+        sizes.append(hierarchy_sizes)
+
+    data_files = []
+    for directory in directories:
+        for _name, child in directory.children():
+            if isinstance(child, _Directory):
+                continue
+            data_files.append(child)
+            for hierarchy_extents, hierarchy_sizes in zip(extents, sizes):
+                hierarchy_extents[id(child)] = next_sector
+                hierarchy_sizes[id(child)] = child.size
+            next_sector += _sectors(child.size, ISO_SECTOR)
+
+    with open(path, 'wb') as image:
+        image.write(b'\x00' * 16 * ISO_SECTOR)
+        for hierarchy, hierarchy_extents, hierarchy_sizes, tables in zip(
+                hierarchies, extents, sizes, path_tables):
+            root_record = _iso_record(b'\x00', hierarchy_extents[id(root)],
+                                      hierarchy_sizes[id(root)], True,
+                                      timestamp)
+            image.write(_iso_volume_descriptor(
+                hierarchy, volume_id, publisher, next_sector, tables[0],
+                tables[1:], root_record, timestamp))
+        image.write(b'\xffCD001\x01'.ljust(ISO_SECTOR, b'\x00'))
+
+        for hierarchy, hierarchy_extents, tables in zip(
+                hierarchies, extents, path_tables):
+            sectors = _sectors(tables[0], ISO_SECTOR)
+            for big_endian in (False, True):
+                table = hierarchy.path_table(hierarchy_extents, big_endian)
+                image.write(table.ljust(sectors * ISO_SECTOR, b'\x00'))
+
+        for hierarchy, hierarchy_extents, hierarchy_sizes in zip(
+                hierarchies, extents, sizes):
+            for directory in directories:
+                image.write(hierarchy.directory_extent(
+                    directory, hierarchy_extents, hierarchy_sizes,
+                    timestamp))
+
+        for data_file in data_files:
+            image.write(data_file.data)
+            image.write(b'\x00' * (-data_file.size % ISO_SECTOR))
+
+
+# VFAT
+
+FAT_SECTOR = 512
+_FAT_ROOT_ENTRIES = 512
+_FAT_CLUSTER_SECTORS = 4
+_FAT_SHORT_INVALID_CHARS = re.compile(r'[^A-Z0-9_$%\'@~`!(){}^#&-]')
+_FAT_GEOMETRIES = {}
+
+
+def _fat_geometry(size):
+    """Return (total sectors, sectors per FAT, clusters) of a FAT16 image
+    of size bytes.
+
+    The layout only depends on the size of the image, so it is computed
+    once and reused for every image of that size.
+    """
+    if size not in _FAT_GEOMETRIES:
+        total = size // FAT_SECTOR
+        root_sectors = _FAT_ROOT_ENTRIES * 32 // FAT_SECTOR
+        fat_sectors = 1
+        while True:
+            data_sectors = total - 1 - 2 * fat_sectors - root_sectors
+            clusters = data_sectors // _FAT_CLUSTER_SECTORS
+            needed = _sectors((clusters + 2) * 2, FAT_SECTOR)
+            if needed <= fat_sectors:
+                break
+            fat_sectors = needed
+        if not 4085 <= clusters < 65525:
+            raise exception.ConfigDriveTooLarge(size=size)
+        _FAT_GEOMETRIES[size] = (total, fat_sectors, clusters)
+    return _FAT_GEOMETRIES[size]
+
+
+def _fat_date_time(timestamp):
+    date = (((timestamp.tm_year - 1980) << 9) | (timestamp.tm_mon << 5) |
+            timestamp.tm_mday)
+    fat_time = ((timestamp.tm_hour << 11) | (timestamp.tm_min << 5) |
+                (timestamp.tm_sec // 2))
+    return date, fat_time
+
+
+def _fat_entry(short_name, attributes, cluster, size, timestamp):
+    date, fat_time = _fat_date_time(timestamp)
+    return struct.pack('<11sBBBHHHHHHHI', short_name, attributes, 0, 0,
+                       fat_time, date, date, 0, fat_time, date, cluster, size)
+
+
+def _fat_checksum(short_name):
+    checksum = 0
+    for char in bytearray(short_name):
+        checksum = (((checksum & 1) << 7) + (checksum >> 1) + char) & 0xff
+    return checksum
+
+
+def _fat_long_name_entries(name, short_name):
+    chars = name.encode('utf-16-le')
+    if len(chars) % 26:
+        chars += b'\x00\x00'
+        chars += b'\xff' * (-len(chars) % 26)
+    parts = [chars[i:i + 26] for i in range(0, len(chars), 26)]
+    checksum = _fat_checksum(short_name)
+    entries = []
+    for sequence, part in enumerate(parts, 1):
+        if sequence == len(parts):
+            sequence |= 0x40
+        entries.append(struct.pack('<B10sBBB12sH4s', sequence, part[:10],
+                                   0x0f, 0, checksum, part[10:22], 0,
+                                   part[22:]))
+    return list(reversed(entries))
+
+
+def _fat_short_names(names):
+    """Return a dict of unique 8.3 names for the long names given."""
+    short_names = {}
+    for number, name in enumerate(names, 1):
+        base, _sep, ext = name.upper().rpartition(u'.')
+        if not base:
+            base, ext = ext, u''
+        base = _FAT_SHORT_INVALID_CHARS.sub(u'_', base)
+        ext = _FAT_SHORT_INVALID_CHARS.sub(u'_', ext)
+        tail = u'~%d' % number
+        short_name = (base[:8 - len(tail)] + tail).ljust(8) + ext[:3].ljust(3)
+        short_names[name] = short_name.encode('ascii')
+    return short_names
+
+
+def write_vfat(path, files, label, size):
+    """Write a VFAT image of files.
+
+    :param path: the image file to write
+    :param files: an iterable of (path, data) pairs
+    :param label: the volume label
+    :param size: the size of the image, in bytes
+    """
+    total, fat_sectors, clusters = _fat_geometry(size)
+    cluster_size = _FAT_CLUSTER_SECTORS * FAT_SECTOR
+    root_sectors = _FAT_ROOT_ENTRIES * 32 // FAT_SECTOR
+    data_start = (1 + 2 * fat_sectors + root_sectors) * FAT_SECTOR
+    timestamp = time.gmtime()
+
+    root = _make_tree(files)
+    directories = _walk(root)
+    short_names = dict((id(d), _fat_short_names([name for name, _child
+                                                  in d.children()]))
+                       for d in directories)
+
+    def entries_size(directory):
+        size = 32 * 2
+        for name, _child in directory.children():
+            size += 32 * (1 + _sectors(len(name) + 1, 13))
+        return size
+
+    # Allocate the clusters of the directories and files, contiguously
+    first_clusters = {id(root): 0}
+    lengths = {}
+    next_cluster = 2
+    for directory in directories:
+        for _name, child in directory.children():
+            if isinstance(child, _Directory):
+                length = entries_size(child)
+            else:
+                length = child.size
+            lengths[id(child)] = length
+            first_clusters[id(child)] = next_cluster if length else 0
+            next_cluster += _sectors(length, cluster_size)
+    if next_cluster - 2 > clusters:
+        raise exception.ConfigDriveTooLarge(size=size)
+
+    fat = bytearray(struct.pack('<HH', 0xfff8, 0xffff))
+    for cluster in range(2, next_cluster):
+        fat.extend(struct.pack('<H', cluster + 1))
+    for first, length in ((first_clusters[key], lengths[key])
+                          for key in lengths if lengths[key]):
+        last = first + _sectors(length, cluster_size) - 1
+        fat[2 * last:2 * last + 2] = struct.pack('<H', 0xffff)
+
+    def directory_entries(directory):
+        entries = []
+        if directory.parent is not None:
+            parent_cluster = first_clusters[id(directory.parent)]
+            entries.append(_fat_entry(b'.' + b' ' * 10, 0x10,
+                                      first_clusters[id(directory)], 0,
+                                      timestamp))
+            entries.append(_fat_entry(b'..' + b' ' * 9, 0x10,
+                                      parent_cluster, 0, timestamp))
+        else:
+            entries.append(_fat_entry(
+                _text(label).encode('ascii')[:11].ljust(11), 0x08, 0, 0,
+                timestamp))
+        for name, child in directory.children():
+            short_name = short_names[id(directory)][name]
+            is_dir = isinstance(child, _Directory)
+            entries.extend(_fat_long_name_entries(name, short_name))
+            entries.append(_fat_entry(short_name, 0x10 if is_dir else 0x20,
+                                      first_clusters[id(child)],
+                                      0 if is_dir else child.size,
+                                      timestamp))
+        return b''.join(entries)
+
+    boot = struct.pack('<3s8sHBHBHHBHHHII', b'\xeb\x3c\x90', b'MSWIN4.1',
+                       FAT_SECTOR, _FAT_CLUSTER_SECTORS, 1, 2,
+                       _FAT_ROOT_ENTRIES, total if total < 0x10000 else 0,
+                       0xf8, fat_sectors, 32, 64, 0,
+                       total if total >= 0x10000 else 0)
+    boot += struct.pack('<BBBI11s8s', 0x80, 0, 0x29,
+                        int(time.time()) & 0xffffffff,
+                        _text(label).encode('ascii')[:11].ljust(11),
+                        b'FAT16   ')
+    boot = boot.ljust(510, b'\x00') + b'\x55\xaa'
+
+    root_entries = directory_entries(root)
+    if len(root_entries) > root_sectors * FAT_SECTOR:
+        raise exception.ConfigDriveTooLarge(size=size)
+
+    with open(path, 'wb') as image:
+        image.truncate(total * FAT_SECTOR)
+        image.write(boot)
+        for _copy in range(2):
+            image.write(bytes(fat))
+            image.write(b'\x00' * (fat_sectors * FAT_SECTOR - len(fat)))
+        image.write(root_entries)
+        for directory in directories:
+            for _name, child in directory.children():
+                if not lengths[id(child)]:
+                    continue
+                if isinstance(child, _Directory):
+                    data = directory_entries(child)
+                else:
+                    data = child.data
+                image.seek(data_start +
+                           (first_clusters[id(child)] - 2) * cluster_size)
+                image.write(data)
@@ -100,6 +100,8 @@ from nova.virt.libvirt import config as vconfig
 from nova.virt.libvirt import firewall as libvirt_firewall
 from nova.virt.libvirt import imagebackend
 from nova.virt.libvirt import imagecache
+from nova.virt.libvirt import imagestream
+from nova.virt.libvirt import migration
 from nova.virt.libvirt import utils as libvirt_utils
 from nova.virt import netutils
 from nova.virt import watchdog_actions
@@ -243,6 +245,15 @@ libvirt_opts = [
                     'before uploading them to image service',
                deprecated_name='libvirt_snapshots_directory',
                deprecated_group='DEFAULT'),
+    cfg.BoolOpt('snapshot_stream_upload',
+                default=False,
+                help='Upload snapshots of stopped instances with raw disks '
+                     'straight from the disk, instead of copying the disk '
+                     'to snapshots_directory first'),
+    cfg.IntOpt('snapshot_stream_buffer_mb',
+               default=64,
+               help='Amount of data, in MiB, read ahead of a streamed '
+                    'snapshot upload'),
     cfg.StrOpt('xen_hvmloader_path',
                 default='/usr/lib/xen/boot/hvmloader',
                 help='Location where the Xen hvmloader is kept',
@@ -256,6 +267,19 @@ libvirt_opts = [
                 help='A path to a device that will be used as source of '
                      'entropy on the host. Permitted options are: '
                      '/dev/random or /dev/hwrng'),
+    cfg.IntOpt('domain_stats_max_age',
+               default=5,
+               help='Number of seconds a snapshot of the state and usage '
+                    'statistics of all domains is reused by the periodic '
+                    'resource, power state, bandwidth and volume usage '
+                    'updates before a new one is collected. Set to 0 to '
+                    'collect a new snapshot for every update'),
+    cfg.BoolOpt('enable_bandwidth_polling',
+                default=False,
+                help='Whether to report the bandwidth usage counters of the '
+                     'instance interfaces to the periodic bandwidth usage '
+                     'update. The counters are read from the domain stats '
+                     'snapshot'),
     ]
 
 CONF = cfg.CONF
@@ -348,6 +372,77 @@ def libvirt_error_handler(context, err):
     pass
 
 
+class DomainStats(object):
+    """State and usage of a single domain, as of a snapshot.
+
+    The block, interface and XML queries are made on first use and
+    remembered for the lifetime of the snapshot.
+    """
+
+    def __init__(self, domain, info):
+        self.domain = domain
+        self.id = domain.ID()
+        self.name = domain.name()
+        self.uuid = domain.UUIDString()
+        self.state = LIBVIRT_POWER_STATE[info[0]]
+        self.max_mem = info[1]
+        self.mem = info[2]
+        self.num_cpu = info[3]
+        self.cpu_time = info[4]
+        self._block_stats = {}
+        self._interface_stats = {}
+        self._xml = None
+
+    def is_active(self):
+        return self.id >= 0
+
+    def get_info(self):
+        """Return the stats in the format of LibvirtDriver.get_info()."""
+        return {'state': self.state,
+                'max_mem': self.max_mem,
+                'mem': self.mem,
+                'num_cpu': self.num_cpu,
+                'cpu_time': self.cpu_time,
+                'id': self.id}
+
+    def block_stats(self, disk):
+        if disk not in self._block_stats:
+            self._block_stats[disk] = self.domain.blockStats(disk)
+        return self._block_stats[disk]
+
+    def interface_stats(self, interface):
+        if interface not in self._interface_stats:
+            self._interface_stats[interface] = self.domain.interfaceStats(
+                interface)
+        return self._interface_stats[interface]
+
+    def xml(self):
+        if self._xml is None:
+            self._xml = self.domain.XMLDesc(0)
+        return self._xml
+
+
+class DomainStatsSnapshot(object):
+    """The DomainStats of every domain on the host, collected in a single
+    sweep and indexed by domain name.
+    """
+
+    def __init__(self, stats):
+        self.taken_at = time.time()
+        self._by_name = dict((dom_stats.name, dom_stats)
+                             for dom_stats in stats)
+
+    def __iter__(self):
+        return self._by_name.itervalues()
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def get(self, name):
+        """Return the DomainStats of the domain named name, or None."""
+        return self._by_name.get(name)
+
+
 class LibvirtDriver(driver.ComputeDriver):
 
     capabilities = {
@@ -370,6 +465,7 @@ class LibvirtDriver(driver.ComputeDriver):
         self._wrapped_conn_lock = threading.Lock()
         self._caps = None
         self._vcpu_total = 0
+        self._domain_stats_snapshot = None
         self.read_only = read_only
         self.firewall_driver = firewall.load_driver(
             DEFAULT_FIREWALL_DRIVER,
@@ -853,6 +949,68 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return list(uuids)
 
+    def _list_all_domains(self):
+        """Return the domain objects of every active and defined domain.
+
+        virConnectListAllDomains returns them in one call. Older libvirt
+        and python bindings need a lookup per domain.
+        """
+        list_all_domains = getattr(self._conn, 'listAllDomains', None)
+        if list_all_domains is not None:
+            try:
+                return list_all_domains(0)
+            except libvirt.libvirtError as ex:
+                if ex.get_error_code() != libvirt.VIR_ERR_NO_SUPPORT:
+                    raise
+                LOG.debug(_("listAllDomains is not supported, looking up "
+                            "the domains one by one: %s"), ex)
+
+        domains = []
+        for domain_id in self.list_instance_ids():
+            try:
+                domains.append(self._lookup_by_id(domain_id))
+            except exception.InstanceNotFound:
+                # Ignore deleted instance while listing
+                continue
+        for domain_name in self._conn.listDefinedDomains():
+            try:
+                domains.append(self._lookup_by_name(domain_name))
+            except exception.InstanceNotFound:
+                # Ignore deleted instance while listing
+                continue
+        return domains
+
+    def get_domain_stats_snapshot(self, max_age=None):
+        """Return a DomainStatsSnapshot of every domain on the host.
+
+        The snapshot is shared by the periodic tasks: one collected less
+        than max_age seconds ago (by default
+        CONF.libvirt.domain_stats_max_age) is returned as is.
+        """
+        if max_age is None:
+            max_age = CONF.libvirt.domain_stats_max_age
+        snapshot = self._domain_stats_snapshot
+        if snapshot is not None and time.time() - snapshot.taken_at < max_age:
+            return snapshot
+
+        stats = []
+        for domain in self._list_all_domains():
+            try:
+                stats.append(DomainStats(domain, domain.info()))
+            except libvirt.libvirtError as ex:
+                # NOTE(gtt116): the domain may be starting up, shutting
+                # down or gone since it was listed.
+                LOG.info(_("Couldn't obtain the stats of a domain, "
+                           "skipping it: %s"), ex)
+            # NOTE(gtt116): give change to do other task.
+            greenthread.sleep(0)
+        snapshot = DomainStatsSnapshot(stats)
+        self._domain_stats_snapshot = snapshot
+        return snapshot
+
+    def _invalidate_domain_stats_snapshot(self):
+        self._domain_stats_snapshot = None
+
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
         for vif in network_info:
@@ -949,6 +1107,7 @@ class LibvirtDriver(driver.ComputeDriver):
         timer = loopingcall.FixedIntervalLoopingCall(_wait_for_destroy,
                                                      old_domid)
         timer.start(interval=0.5).wait()
+        self._invalidate_domain_stats_snapshot()
         if kwargs['is_running']:
             LOG.info(_("Going to destroy instance again."), instance=instance)
             self._destroy(instance)
@@ -1532,6 +1691,18 @@ class LibvirtDriver(driver.ComputeDriver):
         if state == power_state.SHUTDOWN:
             live_snapshot = False
 
+            # The raw disk of a stopped instance is already the image to
+            # upload, and nothing will write to it meanwhile.
+            if (CONF.libvirt.snapshot_stream_upload and
+                    source_format == 'raw' and image_format == 'raw'):
+                update_task_state(task_state=task_states.IMAGE_PENDING_UPLOAD)
+                update_task_state(
+                    task_state=task_states.IMAGE_UPLOADING,
+                    expected_state=task_states.IMAGE_PENDING_UPLOAD)
+                self._stream_snapshot(context, instance, image_service,
+                                      image_href, metadata, disk_path)
+                return
+
         # NOTE(dkang): managedSave does not work for LXC
         if CONF.libvirt.virt_type != 'lxc' and not live_snapshot:
             if state == power_state.RUNNING or state == power_state.PAUSED:
@@ -1590,6 +1761,31 @@ class LibvirtDriver(driver.ComputeDriver):
                 LOG.info(_("Snapshot image upload complete"),
                          instance=instance)
 
+    def _stream_snapshot(self, context, instance, image_service, image_href,
+                         metadata, disk_path):
+        """Upload disk_path as the snapshot image, reading ahead of the
+        upload instead of staging a copy in snapshots_directory.
+        """
+        LOG.info(_("Beginning streamed snapshot upload"), instance=instance)
+        stream = imagestream.ImageStream(
+            disk_path, CONF.libvirt.snapshot_stream_buffer_mb * units.Mi)
+        try:
+            image = image_service.update(context, image_href, metadata,
+                                         stream)
+        finally:
+            stream.close()
+
+        # A retried request would have sent the image service only the rest of
+        # the stream, so this catches those too.
+        checksum = image.get('checksum')
+        if checksum and checksum != stream.checksum():
+            raise exception.ImageUnacceptable(
+                image_id=image_href,
+                reason=_('checksum %(image)s of the uploaded data does not '
+                         'match checksum %(stream)s of the disk') %
+                {'image': checksum, 'stream': stream.checksum()})
+        LOG.info(_("Snapshot image upload complete"), instance=instance)
+
     @staticmethod
     def _wait_for_block_job(domain, disk_path, abort_on_error=False):
         """Wait for libvirt block job to complete.
@@ -2113,11 +2309,13 @@ class LibvirtDriver(driver.ComputeDriver):
         """Pause VM instance."""
         dom = self._lookup_by_name(instance['name'])
         dom.suspend()
+        self._invalidate_domain_stats_snapshot()
 
     def unpause(self, instance):
         """Unpause paused VM instance."""
         dom = self._lookup_by_name(instance['name'])
         dom.resume()
+        self._invalidate_domain_stats_snapshot()
 
     def power_off(self, instance):
         """Power off the specified instance."""
@@ -2137,6 +2335,7 @@ class LibvirtDriver(driver.ComputeDriver):
         self._detach_pci_devices(dom,
             pci_manager.get_instance_pci_devs(instance))
         dom.managedSave(0)
+        self._invalidate_domain_stats_snapshot()
 
     def resume(self, context, instance, network_info, block_device_info=None):
         """resume the specified instance."""
@@ -2147,6 +2346,7 @@ class LibvirtDriver(driver.ComputeDriver):
                            vifs_already_plugged=True)
         self._attach_pci_devices(dom,
             pci_manager.get_instance_pci_devs(instance))
+        self._invalidate_domain_stats_snapshot()
 
     def resume_state_on_host_boot(self, context, instance, network_info,
                                   block_device_info=None):
@@ -3513,6 +3713,17 @@ class LibvirtDriver(driver.ComputeDriver):
                 'cpu_time': dom_info[4],
                 'id': virt_dom.ID()}
 
+    def get_power_states(self, instances):
+        # The power states are used to correct the database, so they must
+        # not come from a snapshot taken before the latest state change.
+        snapshot = self.get_domain_stats_snapshot(max_age=0)
+        power_states = {}
+        for instance in instances:
+            dom_stats = snapshot.get(instance['name'])
+            if dom_stats is not None:
+                power_states[instance['uuid']] = dom_stats.state
+        return power_states
+
     def _create_domain(self, xml=None, domain=None,
                        instance=None, launch_flags=0, power_on=True):
         """Create a domain.
@@ -3558,6 +3769,7 @@ class LibvirtDriver(driver.ComputeDriver):
                     LOG.error(_("An error occurred while trying to launch a "
                                 "defined domain with xml: %s") %
                               domain.XMLDesc(0))
+        self._invalidate_domain_stats_snapshot()
 
         if not utils.is_neutron():
             try:
@@ -3816,25 +4028,9 @@ class LibvirtDriver(driver.ComputeDriver):
         if CONF.libvirt.virt_type == 'lxc':
             return total + 1
 
-        dom_ids = self.list_instance_ids()
-        for dom_id in dom_ids:
-            try:
-                dom = self._lookup_by_id(dom_id)
-                try:
-                    vcpus = dom.vcpus()
-                except libvirt.libvirtError as e:
-                    LOG.warn(_("couldn't obtain the vpu count from domain id:"
-                               " %(id)s, exception: %(ex)s") %
-                               {"id": dom_id, "ex": e})
-                else:
-                    if vcpus is not None and len(vcpus) > 1:
-                        total += len(vcpus[1])
-
-            except exception.InstanceNotFound:
-                LOG.info(_("libvirt can't find a domain with id: %s") % dom_id)
-                continue
-            # NOTE(gtt116): give change to do other task.
-            greenthread.sleep(0)
+        for dom_stats in self.get_domain_stats_snapshot():
+            if dom_stats.is_active():
+                total += dom_stats.num_cpu
         return total
 
     def get_memory_mb_used(self):
@@ -3853,15 +4049,12 @@ class LibvirtDriver(driver.ComputeDriver):
         idx3 = m.index('Cached:')
         if CONF.libvirt.virt_type == 'xen':
             used = 0
-            for domain_id in self.list_instance_ids():
-                try:
-                    dom_mem = int(self._lookup_by_id(domain_id).info()[2])
-                except exception.InstanceNotFound:
-                    LOG.info(_("libvirt can't find a domain with id: %s")
-                             % domain_id)
+            for dom_stats in self.get_domain_stats_snapshot():
+                if not dom_stats.is_active():
                     continue
+                dom_mem = int(dom_stats.mem)
                 # skip dom0
-                if domain_id != 0:
+                if dom_stats.id != 0:
                     used += dom_mem
                 else:
                     # the mem reported by dom0 is be greater of what
@@ -4062,6 +4255,7 @@ class LibvirtDriver(driver.ComputeDriver):
            a given host.
         """
         vol_usage = []
+        snapshot = self.get_domain_stats_snapshot()
 
         for instance_bdms in compute_host_bdms:
             instance = instance_bdms['instance']
@@ -4075,7 +4269,8 @@ class LibvirtDriver(driver.ComputeDriver):
 
                 LOG.debug(_("Trying to get stats for the volume %s"),
                             volume_id)
-                vol_stats = self.block_stats(instance['name'], mountpoint)
+                vol_stats = self.block_stats(instance['name'], mountpoint,
+                                             snapshot=snapshot)
 
                 if vol_stats:
                     stats = dict(volume=volume_id,
@@ -4094,9 +4289,18 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return vol_usage
 
-    def block_stats(self, instance_name, disk):
-        """Note that this function takes an instance name."""
+    def block_stats(self, instance_name, disk, snapshot=None):
+        """Note that this function takes an instance name.
+
+        If a DomainStatsSnapshot is passed, the domain is taken from it
+        instead of being looked up.
+        """
         try:
+            if snapshot is not None:
+                dom_stats = snapshot.get(instance_name)
+                if dom_stats is None:
+                    raise exception.InstanceNotFound(instance_id=instance_name)
+                return dom_stats.block_stats(disk)
             domain = self._lookup_by_name(instance_name)
             return domain.blockStats(disk)
         except libvirt.libvirtError as e:
@@ -4115,6 +4319,37 @@ class LibvirtDriver(driver.ComputeDriver):
         domain = self._lookup_by_name(instance_name)
         return domain.interfaceStats(interface)
 
+    def get_all_bw_counters(self, instances):
+        """Return bandwidth usage counters for each interface on each
+           running VM.
+        """
+        if not CONF.libvirt.enable_bandwidth_polling:
+            raise NotImplementedError()
+
+        bw_counters = []
+        snapshot = self.get_domain_stats_snapshot()
+        for instance in instances:
+            dom_stats = snapshot.get(instance['name'])
+            if dom_stats is None or not dom_stats.is_active():
+                continue
+            try:
+                doc = etree.fromstring(dom_stats.xml())
+                for node in doc.findall('./devices/interface'):
+                    target = node.find('target')
+                    mac = node.find('mac')
+                    if target is None or mac is None:
+                        continue
+                    stats = dom_stats.interface_stats(target.get('dev'))
+                    bw_counters.append({'uuid': instance['uuid'],
+                                        'mac_address': mac.get('address'),
+                                        'bw_in': stats[0],
+                                        'bw_out': stats[4]})
+            except libvirt.libvirtError as e:
+                LOG.info(_('Getting interface stats failed, the domain '
+                           'might have been shut down: %s'), e,
+                         instance=instance)
+        return bw_counters
+
     def get_console_pool_info(self, console_type):
         #TODO(mdragon): console proxy should be implemented for libvirt,
         #               in case someone wants to use it with kvm or
@@ -4466,10 +4701,15 @@ class LibvirtDriver(driver.ComputeDriver):
             logical_sum = reduce(lambda x, y: x | y, flagvals)
 
             dom = self._lookup_by_name(instance["name"])
-            dom.migrateToURI(CONF.libvirt.live_migration_uri % dest,
-                             logical_sum,
-                             None,
-                             CONF.libvirt.live_migration_bandwidth)
+            monitor_timer = self._start_live_migration_monitor(
+                dom, instance, block_migration)
+            try:
+                dom.migrateToURI(CONF.libvirt.live_migration_uri % dest,
+                                 logical_sum,
+                                 None,
+                                 CONF.libvirt.live_migration_bandwidth)
+            finally:
+                monitor_timer.stop()
 
         except Exception as e:
             with excutils.save_and_reraise_exception():
@@ -4492,6 +4732,52 @@ class LibvirtDriver(driver.ComputeDriver):
         timer.f = wait_for_live_migration
         timer.start(interval=0.5).wait()
 
+    def _start_live_migration_monitor(self, dom, instance, block_migration):
+        """Start watching over the migration job of dom.
+
+        migrateToURI() blocks in a native thread until the migration is
+        over, so the job statistics are sampled from a looping call, which
+        the caller stops once migrateToURI() returns. Its first run, and
+        everything the monitor does, only happens once the migration is
+        underway; a failing monitor never fails the migration itself.
+        """
+        start = time.time()
+        monitors = []
+
+        def monitor_live_migration():
+            try:
+                if not monitors:
+                    data_gb = self._get_live_migration_data_gb(
+                        instance, block_migration)
+                    monitors.append(migration.LiveMigrationMonitor(
+                        dom, instance, data_gb, start))
+                monitors[0].update(dom.jobInfo(), time.time())
+            except libvirt.libvirtError as ex:
+                # The job may be over, and the domain gone with it
+                LOG.debug(_('Unable to check live migration progress: %s'),
+                          ex, instance=instance)
+            except Exception:
+                LOG.exception(_('Unable to monitor live migration'),
+                              instance=instance)
+
+        interval = CONF.libvirt.live_migration_monitor_interval
+        timer = loopingcall.FixedIntervalLoopingCall(monitor_live_migration)
+        timer.start(interval=interval, initial_delay=interval)
+        return timer
+
+    @staticmethod
+    def _get_live_migration_data_gb(instance, block_migration):
+        """Estimate the GiB of memory and disk a live migration sends.
+
+        Missing flavor values count as nothing, and the estimate is at least
+        2 GiB, so that the timeouts derived from it stay usable.
+        """
+        data_gb = (instance['memory_mb'] or 0) / float(units.Ki)
+        if block_migration:
+            data_gb += instance['root_gb'] or 0
+            data_gb += instance['ephemeral_gb'] or 0
+        return max(data_gb, 2)
+
     def _fetch_instance_kernel_ramdisk(self, context, instance):
         """Download kernel and ramdisk for instance in instance directory."""
         instance_dir = libvirt_utils.get_instance_path(instance)
@@ -26,6 +26,8 @@ import os
 import re
 import time
 
+import eventlet
+from eventlet import tpool
 from oslo.config import cfg
 
 from nova.openstack.common import fileutils
@@ -33,9 +35,11 @@ from nova.openstack.common.gettextutils import _
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import processutils
+from nova.openstack.common import units
 from nova import utils
 from nova.virt import imagecache
 from nova.virt.libvirt import utils as virtutils
+from nova.virt import storage_users
 
 LOG = logging.getLogger(__name__)
 
@@ -66,12 +70,29 @@ imagecache_opts = [
                default=3600,
                help='How frequently to checksum base images',
                deprecated_group='DEFAULT'),
+    cfg.IntOpt('image_cache_workers',
+               default=4,
+               help='Number of base images and instance disks examined '
+                    'concurrently by an image cache manager pass'),
+    cfg.IntOpt('checksum_budget_mb',
+               default=0,
+               help='Amount of data, in MiB, read for checksums by one image '
+                    'cache manager pass. Checksums not finished within it '
+                    'are continued by the next pass. 0 means no limit'),
+    cfg.BoolOpt('image_cache_coordinated',
+                default=False,
+                help='Let one compute node at a time verify and age the '
+                     'image cache shared by the compute nodes using the '
+                     'same instances_path. The others read the results it '
+                     'records instead of checking the images themselves'),
     ]
 
 CONF = cfg.CONF
 CONF.register_opts(imagecache_opts, 'libvirt')
 CONF.import_opt('instances_path', 'nova.compute.manager')
 CONF.import_opt('image_cache_subdirectory_name', 'nova.virt.imagecache')
+CONF.import_opt('image_cache_manager_interval', 'nova.virt.imagecache')
+CONF.import_opt('host', 'nova.netconf')
 
 
 def get_cache_fname(images, key):
@@ -223,6 +244,12 @@ def _hash_file(filename):
     return checksum.hexdigest()
 
 
+def _stat_file(filename):
+    """Return what tells whether a file changed since a checksum of it."""
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime]
+
+
 def read_stored_checksum(target, timestamped=True):
     """Read the checksum.
 
@@ -236,10 +263,50 @@ def write_stored_checksum(target):
     write_stored_info(target, field='sha1', value=_hash_file(target))
 
 
+def read_cache_index(base_dir):
+    """Read the results of the last pass over a shared image cache.
+
+    Returns an empty dictionary if no pass recorded its results yet.
+    """
+    index_file = os.path.join(base_dir, 'image_cache_index')
+    if not os.path.exists(index_file):
+        return {}
+
+    lock_path = os.path.join(CONF.instances_path, 'locks')
+
+    @utils.synchronized('image-cache-index', external=True,
+                        lock_path=lock_path)
+    def read_file(index_file):
+        with open(index_file, 'r') as f:
+            return f.read()
+
+    return _read_possible_json(read_file(index_file), index_file)
+
+
+def write_cache_index(base_dir, index):
+    """Record the results of a pass over a shared image cache."""
+    index_file = os.path.join(base_dir, 'image_cache_index')
+    lock_path = os.path.join(CONF.instances_path, 'locks')
+
+    @utils.synchronized('image-cache-index', external=True,
+                        lock_path=lock_path)
+    def write_file(index_file, index):
+        with open(index_file, 'w') as f:
+            f.write(json.dumps(index))
+
+    write_file(index_file, index)
+
+
 class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
         self.lock_path = os.path.join(CONF.instances_path, 'locks')
+        # Checksums the budget of a pass ran out in the middle of, by base
+        # file: (stat, sha1 object, bytes hashed)
+        self._checksums_in_progress = {}
+        # Modification times of verified base files touched because they
+        # are in use, by base file
+        self._touched = {}
         self._reset_state()
 
     def _reset_state(self):
@@ -255,6 +322,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.removable_base_files = []
         self.unexplained_images = []
 
+        self.checksum_budget = None
+        if CONF.libvirt.checksum_budget_mb > 0:
+            self.checksum_budget = CONF.libvirt.checksum_budget_mb * units.Mi
+
     def _store_image(self, base_dir, ent, original=False):
         """Store a base image for later examination."""
         entpath = os.path.join(base_dir, ent)
@@ -284,47 +355,56 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         return {'unexplained_images': self.unexplained_images,
                 'originals': self.originals}
 
+    def _get_backing_file(self, ent):
+        """Return the backing file of the disk of instance directory ent."""
+        disk_path = os.path.join(CONF.instances_path, ent, 'disk')
+        if not os.path.exists(disk_path):
+            return None
+        LOG.debug(_('%s has a disk file'), ent)
+        try:
+            backing_file = virtutils.get_disk_backing_file(disk_path)
+        except processutils.ProcessExecutionError:
+            # (for bug 1261442)
+            if not os.path.exists(disk_path):
+                LOG.debug(_('Failed to get disk backing file: %s'),
+                          disk_path)
+                return None
+            else:
+                raise
+        LOG.debug(_('Instance %(instance)s is backed by %(backing)s'),
+                  {'instance': ent,
+                   'backing': backing_file})
+        return backing_file
+
     def _list_backing_images(self):
         """List the backing images currently in use."""
         inuse_images = []
+        ents = []
         for ent in os.listdir(CONF.instances_path):
             if ent in self.instance_names:
                 LOG.debug(_('%s is a valid instance name'), ent)
-                disk_path = os.path.join(CONF.instances_path, ent, 'disk')
-                if os.path.exists(disk_path):
-                    LOG.debug(_('%s has a disk file'), ent)
-                    try:
-                        backing_file = virtutils.get_disk_backing_file(
-                            disk_path)
-                    except processutils.ProcessExecutionError:
-                        # (for bug 1261442)
-                        if not os.path.exists(disk_path):
-                            LOG.debug(_('Failed to get disk backing file: %s'),
-                                      disk_path)
-                            continue
-                        else:
-                            raise
-                    LOG.debug(_('Instance %(instance)s is backed by '
-                                '%(backing)s'),
-                              {'instance': ent,
-                               'backing': backing_file})
-
-                    if backing_file:
-                        backing_path = os.path.join(
-                            CONF.instances_path,
-                            CONF.image_cache_subdirectory_name,
-                            backing_file)
-                        if backing_path not in inuse_images:
-                            inuse_images.append(backing_path)
-
-                        if backing_path in self.unexplained_images:
-                            LOG.warning(_('Instance %(instance)s is using a '
-                                          'backing file %(backing)s which '
-                                          'does not appear in the image '
-                                          'service'),
-                                        {'instance': ent,
-                                         'backing': backing_file})
-                            self.unexplained_images.remove(backing_path)
+                ents.append(ent)
+
+        # qemu-img runs for every disk, so do several at a time
+        pool = eventlet.GreenPool(max(1, CONF.libvirt.image_cache_workers))
+        for ent, backing_file in zip(ents,
+                                     pool.imap(self._get_backing_file, ents)):
+            if backing_file:
+                backing_path = os.path.join(
+                    CONF.instances_path,
+                    CONF.image_cache_subdirectory_name,
+                    backing_file)
+                if backing_path not in inuse_images:
+                    inuse_images.append(backing_path)
+
+                if backing_path in self.unexplained_images:
+                    LOG.warning(_('Instance %(instance)s is using a '
+                                  'backing file %(backing)s which '
+                                  'does not appear in the image '
+                                  'service'),
+                                {'instance': ent,
+                                 'backing': backing_file})
+                    self.unexplained_images.remove(backing_path)
         return inuse_images
 
     def _find_base_file(self, base_dir, fingerprint):
@@ -388,7 +468,18 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     write_stored_info(base_file, field='sha1',
                                       value=stored_checksum)
 
-                current_checksum = _hash_file(base_file)
+                # Nothing can have changed if the file was not written to
+                # since it was last verified
+                stat = _stat_file(base_file)
+                stored_stat = read_stored_info(base_file, field='sha1-stat')
+                if stored_stat == stat or (
+                        stored_stat and stored_stat[0] == stat[0] and
+                        self._touched.get(base_file) == stat[1]):
+                    return True
+
+                current_checksum = self._hash_file(base_file, stat)
+                if current_checksum is None:
+                    return None
 
                 if current_checksum != stored_checksum:
                     LOG.error(_('image %(id)s at (%(base_file)s): image '
@@ -398,6 +489,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     return False
 
                 else:
+                    write_stored_info(base_file, field='sha1-stat',
+                                      value=stat)
                     return True
 
             else:
@@ -413,12 +506,54 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     LOG.info(_('%(id)s (%(base_file)s): generating checksum'),
                              {'id': img_id,
                               'base_file': base_file})
-                    write_stored_checksum(base_file)
+                    stat = _stat_file(base_file)
+                    checksum = self._hash_file(base_file, stat)
+                    if checksum is not None:
+                        write_stored_info(base_file, field='sha1',
+                                          value=checksum)
+                        write_stored_info(base_file, field='sha1-stat',
+                                          value=stat)
 
                 return None
 
         return inner_verify_checksum()
 
+    def _hash_file(self, base_file, stat):
+        """Hash base_file, within what is left of the budget of the pass.
+
+        Returns the checksum, or None if the budget ran out first. The part
+        hashed is then kept for the next pass, which continues from there
+        unless the file changed meanwhile.
+        """
+        progress = self._checksums_in_progress.pop(base_file, None)
+        if progress is None or progress[0] != stat:
+            progress = (stat, hashlib.sha1(), 0)
+        stat, checksum, offset = progress
+
+        with open(base_file, 'rb') as f:
+            f.seek(offset)
+            while True:
+                size = units.Mi
+                if self.checksum_budget is not None:
+                    if self.checksum_budget <= 0:
+                        LOG.info(_('Checksum of %(base_file)s continues in '
+                                   'the next pass, at %(offset)d bytes'),
+                                 {'base_file': base_file, 'offset': offset})
+                        self._checksums_in_progress[base_file] = (
+                            stat, checksum, offset)
+                        return None
+                    size = min(size, self.checksum_budget)
+                    self.checksum_budget -= size
+                # Read in a native thread so other checks can run meanwhile
+                chunk = tpool.execute(f.read, size)
+                if self.checksum_budget is not None:
+                    self.checksum_budget += size - len(chunk)
+                if not chunk:
+                    break
+                checksum.update(chunk)
+                offset += len(chunk)
+        return checksum.hexdigest()
+
     def _remove_base_file(self, base_file):
         """Remove a single base file if it is old enough.
 
@@ -457,6 +592,7 @@ class ImageCacheManager(imagecache.ImageCacheManager):
 
         image_bad = False
         image_in_use = False
+        checksum_result = None
 
         LOG.info(_('image %(id)s at (%(base_file)s): checking'),
                  {'id': img_id,
@@ -520,10 +656,15 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                 if os.path.exists(base_file):
                     virtutils.chown(base_file, os.getuid())
                     os.utime(base_file, None)
+                    if checksum_result:
+                        # Touching it is not a change to the contents
+                        self._touched[base_file] = os.path.getmtime(
+                            base_file)
 
     def _age_and_verify_cached_images(self, context, all_instances, base_dir):
         LOG.debug(_('Verify base images'))
         # Determine what images are on disk because they're in use
+        base_images = []
         for img in self.used_images:
             fingerprint = hashlib.sha1(img).hexdigest()
             LOG.debug(_('Image id %(id)s yields fingerprint %(fingerprint)s'),
@@ -531,11 +672,23 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                        'fingerprint': fingerprint})
             for result in self._find_base_file(base_dir, fingerprint):
                 base_file, image_small, image_resized = result
-                self._handle_base_image(img, base_file)
+                # _find_base_file() walks unexplained_images, so take the file
+                # out of it right away, as handling each base image in this
+                # loop used to. The files found for the following images stay
+                # the same.
+                if base_file in self.unexplained_images:
+                    self.unexplained_images.remove(base_file)
+                base_images.append((img, base_file))
 
                 if not image_small and not image_resized:
                     self.originals.append(base_file)
 
+        # Checksums read whole images, so check several at a time
+        pool = eventlet.GreenPool(max(1, CONF.libvirt.image_cache_workers))
+        list(pool.imap(self._handle_base_image,
+                       [img for img, _base_file in base_images],
+                       [base_file for _img, base_file in base_images]))
+
         # Elements remaining in unexplained_images might be in use
         inuse_backing_images = self._list_backing_images()
         for backing_path in inuse_backing_images:
@@ -566,6 +719,26 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         # That's it
         LOG.debug(_('Verification complete'))
 
+    def _read_cache_index(self, base_dir):
+        """Take the results of a pass from the host managing the cache."""
+        index = read_cache_index(base_dir)
+        if not index:
+            LOG.debug(_('No results recorded for the image cache in %s yet'),
+                      base_dir)
+            return
+
+        self.active_base_files = index.get('active', [])
+        self.corrupt_base_files = index.get('corrupt', [])
+        self.removable_base_files = index.get('removable', [])
+        LOG.debug(_('Image cache in %(base_dir)s verified by %(host)s '
+                    '%(age)d seconds ago'),
+                  {'base_dir': base_dir,
+                   'host': index.get('host'),
+                   'age': time.time() - index.get('timestamp', 0)})
+        if self.corrupt_base_files:
+            LOG.info(_('Corrupt base files: %s'),
+                     ' '.join(self.corrupt_base_files))
+
     def _get_base(self):
 
         # NOTE(mikal): The new scheme for base images is as follows -- an
@@ -592,6 +765,13 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             return
         # reset the local statistics
         self._reset_state()
+        # on shared storage, leave the cache to the host managing it
+        if (CONF.libvirt.image_cache_coordinated and
+                not storage_users.claim_image_cache(
+                    base_dir, CONF.host,
+                    2 * CONF.image_cache_manager_interval)):
+            self._read_cache_index(base_dir)
+            return
         # read the cached images
         self._list_base_images(base_dir)
         # read running instances data
@@ -601,3 +781,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.instance_names = running['instance_names']
         # perform the aging and image verification
         self._age_and_verify_cached_images(context, all_instances, base_dir)
+        if CONF.libvirt.image_cache_coordinated:
+            write_cache_index(base_dir,
+                              {'host': CONF.host,
+                               'timestamp': time.time(),
+                               'active': self.active_base_files,
+                               'corrupt': self.corrupt_base_files,
+                               'removable': self.removable_base_files})
@@ -0,0 +1,82 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Read-ahead streaming of disk images to the image service."""
+
+import hashlib
+
+import eventlet
+from eventlet import queue
+from eventlet import tpool
+
+from nova.openstack.common import units
+
+CHUNK_SIZE = 64 * units.Ki
+
+
+class ImageStream(object):
+    """A file-like object reading a file ahead into a bounded buffer.
+
+    The file is read in native threads while the consumer, typically the
+    image service client sending the data, works through what has been
+    read so far. Reading blocks once buffer_size bytes are waiting, so
+    memory use does not depend on the size of the file. The MD5 checksum of
+    the data is kept, for comparison with the one computed by the image
+    service.
+    """
+
+    def __init__(self, path, buffer_size, chunk_size=CHUNK_SIZE):
+        self._chunks = queue.LightQueue(
+            maxsize=max(1, buffer_size // chunk_size))
+        self._buffer = b''
+        self._eof = False
+        self._md5 = hashlib.md5()
+        self.bytes_read = 0
+        self._reader = eventlet.spawn(self._read_ahead, path, chunk_size)
+
+    def _read_ahead(self, path, chunk_size):
+        try:
+            with open(path, 'rb') as image_file:
+                while True:
+                    chunk = tpool.execute(image_file.read, chunk_size)
+                    self._chunks.put(chunk)
+                    if not chunk:
+                        return
+        except Exception as e:
+            self._chunks.put(e)
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            chunk = self._chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                self._eof = True
+                break
+            self._md5.update(chunk)
+            self.bytes_read += len(chunk)
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def checksum(self):
+        """Return the MD5 hex digest of the data read so far."""
+        return self._md5.hexdigest()
+
+    def close(self):
+        self._reader.kill()
@@ -0,0 +1,212 @@
+# Copyright 2014 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Monitoring of outgoing libvirt live migrations.
+
+While migrateToURI() runs, the driver periodically feeds the job
+statistics of the domain to a LiveMigrationMonitor. From the change between
+two samples the monitor works out how fast data is being sent and how fast
+the guest dirties its memory. It raises the maximum downtime allowed for
+the final switch over in steps, but only while the current downtime is too
+small for the migration to converge. If the remaining data stops going
+down, it first jumps straight to the largest downtime, and aborts the job
+if that does not help either.
+"""
+
+from oslo.config import cfg
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+migration_opts = [
+    cfg.IntOpt('live_migration_monitor_interval',
+               default=5,
+               help='Number of seconds between checks of the progress of '
+                    'an outgoing live migration'),
+    cfg.IntOpt('live_migration_downtime',
+               default=500,
+               help='Largest downtime, in milliseconds, allowed for the '
+                    'final switch over of a live migration'),
+    cfg.IntOpt('live_migration_downtime_steps',
+               default=10,
+               help='Number of steps in which the allowed downtime is '
+                    'raised to live_migration_downtime. 0 leaves the '
+                    'downtime to the hypervisor default'),
+    cfg.IntOpt('live_migration_downtime_delay',
+               default=75,
+               help='Number of seconds, per GiB of data to migrate, to wait '
+                    'between raising the allowed downtime'),
+    cfg.IntOpt('live_migration_progress_timeout',
+               default=150,
+               help='Number of seconds after which a live migration whose '
+                    'remaining data has not gone down is considered '
+                    'stalled. 0 disables stall detection'),
+    cfg.IntOpt('live_migration_completion_timeout',
+               default=800,
+               help='Number of seconds, per GiB of data to migrate, after '
+                    'which a live migration is aborted. 0 disables the '
+                    'timeout'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(migration_opts, 'libvirt')
+
+# Fields of virDomain.jobInfo()
+JOB_TYPE = 0
+JOB_DATA_TOTAL = 3
+JOB_DATA_PROCESSED = 4
+JOB_DATA_REMAINING = 5
+
+# virDomainJobType, VIR_DOMAIN_JOB_NONE and VIR_DOMAIN_JOB_UNBOUNDED
+JOB_NONE = 0
+JOB_UNBOUNDED = 2
+
+
+def downtime_steps(max_downtime, steps, delay):
+    """Return the (seconds, milliseconds) pairs of the downtime schedule.
+
+    The allowed downtime starts at a fraction of max_downtime and grows
+    linearly to it, one step every delay seconds.
+    """
+    return [(delay * step, max_downtime * (step + 1) // steps)
+            for step in range(steps)]
+
+
+class LiveMigrationMonitor(object):
+    """Tune and watch over one outgoing live migration."""
+
+    def __init__(self, dom, instance, data_gb, start):
+        """:param dom: the virDomain being migrated
+        :param instance: the nova.objects.instance.Instance migrated
+        :param data_gb: the GiB of memory and disk to migrate
+        :param start: the time the migration started, in seconds
+        """
+        self.dom = dom
+        self.instance = instance
+        self.start = start
+        self.steps = []
+        if CONF.libvirt.live_migration_downtime_steps > 0:
+            self.steps = downtime_steps(
+                CONF.libvirt.live_migration_downtime,
+                CONF.libvirt.live_migration_downtime_steps,
+                CONF.libvirt.live_migration_downtime_delay * data_gb)
+        self.completion_timeout = (
+            CONF.libvirt.live_migration_completion_timeout * data_gb)
+        self.downtime = None
+        self.stalled = False
+        self.last = None
+        self.lowest_remaining = None
+        self.progress_time = start
+        self.transfer_rate = None
+        self.dirty_rate = None
+
+    def update(self, job_info, now):
+        """Act on a sample of the job statistics of the domain.
+
+        :param job_info: the list returned by virDomain.jobInfo()
+        :param now: the time of the sample, in seconds
+        """
+        if job_info[JOB_TYPE] != JOB_UNBOUNDED:
+            # Not started yet, or already over
+            return
+        elapsed = now - self.start
+        total = job_info[JOB_DATA_TOTAL]
+        processed = job_info[JOB_DATA_PROCESSED]
+        remaining = job_info[JOB_DATA_REMAINING]
+
+        if self.last is not None and now > self.last[0]:
+            interval = float(now - self.last[0])
+            sent = processed - self.last[1]
+            # Whatever was sent without reducing the remaining data was
+            # dirtied again by the guest
+            dirtied = sent - (self.last[2] - remaining)
+            self.transfer_rate = sent / interval
+            self.dirty_rate = max(dirtied, 0) / interval
+        self.last = (now, processed, remaining)
+
+        LOG.debug(_('Migration running for %(elapsed)d secs, '
+                    '%(remaining)d of %(total)d bytes remaining, sending '
+                    '%(transfer)s bytes/sec, dirtying %(dirty)s bytes/sec'),
+                  {'elapsed': elapsed, 'remaining': remaining,
+                   'total': total, 'transfer': self.transfer_rate,
+                   'dirty': self.dirty_rate}, instance=self.instance)
+
+        if self.completion_timeout and elapsed > self.completion_timeout:
+            LOG.warn(_('Live migration not completed after %d secs, '
+                       'aborting'), elapsed, instance=self.instance)
+            self.dom.abortJob()
+            return
+
+        if self.lowest_remaining is None or remaining < self.lowest_remaining:
+            self.lowest_remaining = remaining
+            self.progress_time = now
+        elif (CONF.libvirt.live_migration_progress_timeout and
+              now - self.progress_time >
+              CONF.libvirt.live_migration_progress_timeout):
+            if self.stalled or not self.steps:
+                LOG.warn(_('Live migration stuck for %d secs, aborting'),
+                         now - self.progress_time, instance=self.instance)
+                self.dom.abortJob()
+                return
+            LOG.warn(_('Live migration stuck for %d secs, allowing the '
+                       'largest downtime'), now - self.progress_time,
+                     instance=self.instance)
+            self.stalled = True
+            self.progress_time = now
+            self._set_downtime(self.steps[-1][1])
+
+        self._step_downtime(elapsed, remaining)
+
+        self._update_progress(total, remaining)
+
+    def _expected_downtime(self, remaining):
+        """Return the milliseconds needed to send the remaining data."""
+        if not self.transfer_rate:
+            return None
+        return remaining * 1000 / self.transfer_rate
+
+    def _step_downtime(self, elapsed, remaining):
+        due = [downtime for after, downtime in self.steps if elapsed >= after]
+        if not due or (self.downtime is not None and
+                       due[-1] <= self.downtime):
+            return
+        expected = self._expected_downtime(remaining)
+        if (self.downtime is not None and expected is not None and
+                expected <= self.downtime):
+            # It will converge with the current downtime
+            return
+        self._set_downtime(due[-1])
+
+    def _set_downtime(self, downtime):
+        if downtime == self.downtime:
+            return
+        LOG.info(_('Increasing the allowed live migration downtime to '
+                   '%d ms'), downtime, instance=self.instance)
+        self.dom.migrateSetMaxDowntime(downtime, 0)
+        self.downtime = downtime
+
+    def _update_progress(self, total, remaining):
+        if not total:
+            return
+        progress = max(0, min(100, 100 - remaining * 100 // total))
+        if progress != self.instance.progress:
+            self.instance.progress = progress
+            try:
+                self.instance.save()
+            except Exception:
+                LOG.exception(_('Unable to save the live migration '
+                                'progress'), instance=self.instance)
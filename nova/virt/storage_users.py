@@ -29,6 +29,18 @@ CONF = cfg.CONF
 TWENTY_FOUR_HOURS = 3600 * 24
 
 
+def _read_json(path):
+    d = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            try:
+                d = json.loads(f.read())
+            except ValueError:
+                LOG.warning(_("Cannot decode JSON from %(path)s"),
+                            {"path": path})
+    return d
+
+
 # NOTE(morganfainberg): Due to circular import dependencies, the use of the
 # CONF.instances_path needs to be wrapped so that it can be resolved at the
 # appropriate time. Because compute.manager imports this file, we end up in
@@ -53,15 +65,8 @@ def register_storage_use(storage_path, hostname):
         # shared, which is something that the image cache manager needs to
         # know. I can imagine other uses as well though.
 
-        d = {}
         id_path = os.path.join(storage_path, 'compute_nodes')
-        if os.path.exists(id_path):
-            with open(id_path) as f:
-                try:
-                    d = json.loads(f.read())
-                except ValueError:
-                    LOG.warning(_("Cannot decode JSON from %(id_path)s"),
-                                {"id_path": id_path})
+        d = _read_json(id_path)
 
         d[hostname] = time.time()
 
@@ -91,15 +96,8 @@ def get_storage_users(storage_path):
     @utils.synchronized('storage-registry-lock', external=True,
                         lock_path=LOCK_PATH)
     def do_get_storage_users(storage_path):
-        d = {}
         id_path = os.path.join(storage_path, 'compute_nodes')
-        if os.path.exists(id_path):
-            with open(id_path) as f:
-                try:
-                    d = json.loads(f.read())
-                except ValueError:
-                    LOG.warning(_("Cannot decode JSON from %(id_path)s"),
-                                {"id_path": id_path})
+        d = _read_json(id_path)
 
         recent_users = []
         for node in d:
@@ -109,3 +107,43 @@ def get_storage_users(storage_path):
         return recent_users
 
     return do_get_storage_users(storage_path)
+
+
+# NOTE(morganfainberg): see the note on register_storage_use() for why the
+# lock is set up within the function.
+def claim_image_cache(storage_path, hostname, duration):
+    """Try to become the host managing the image cache in storage_path.
+
+    Of all the hosts sharing the storage, the one holding the lease on it
+    verifies and ages the image cache for all of them. The lease is held for
+    duration seconds and renewed by every claim of its holder, so another
+    host only takes over once the holder stops managing the cache.
+
+    Returns True if hostname holds the lease.
+    """
+
+    LOCK_PATH = os.path.join(CONF.instances_path, 'locks')
+
+    @utils.synchronized('image-cache-lease-lock', external=True,
+                        lock_path=LOCK_PATH)
+    def do_claim_image_cache(storage_path, hostname, duration):
+        lease_path = os.path.join(storage_path, 'image_cache_lease')
+        lease = _read_json(lease_path)
+
+        now = time.time()
+        holder = lease.get('host')
+        if (holder and holder != hostname and
+                lease.get('expires', 0) > now):
+            LOG.debug(_("Image cache in %(path)s is managed by %(host)s"),
+                      {"path": storage_path, "host": holder})
+            return False
+
+        if holder != hostname:
+            LOG.info(_("Taking over management of the image cache in "
+                       "%(path)s"), {"path": storage_path})
+        with open(lease_path, 'w') as f:
+            f.write(json.dumps({'host': hostname,
+                                'expires': now + duration}))
+        return True
+
+    return do_claim_image_cache(storage_path, hostname, duration)
@@ -35,6 +35,7 @@ from nova.openstack.common import uuidutils
 from nova.virt import driver
 from nova.virt.vmwareapi import error_util
 from nova.virt.vmwareapi import host
+from nova.virt.vmwareapi import inventory
 from nova.virt.vmwareapi import vim
 from nova.virt.vmwareapi import vim_util
 from nova.virt.vmwareapi import vm_util
@@ -125,6 +126,8 @@ class VMwareESXDriver(driver.ComputeDriver):
                     % CONF.vmware.datastore_regex)
 
         self._session = VMwareAPISession(scheme=scheme)
+        if CONF.vmware.use_inventory_cache:
+            inventory.set_cache(inventory.InventoryCache(self._session))
         self._volumeops = volumeops.VMwareVolumeOps(self._session)
         self._vmops = vmops.VMwareVMOps(self._session, self.virtapi,
                                         self._volumeops,
@@ -403,6 +403,7 @@ class VirtualMachine(ManagedObject):
             for optval in exconfig_do:
                 self.set('config.extraConfig["%s"]' % optval.key, optval)
         self.set('runtime.host', kwargs.get("runtime_host", None))
+        self.set('resourcePool', kwargs.get("res_pool", None))
         self.device = kwargs.get("virtual_device")
         # Sample of diagnostics data is below.
         config = [
@@ -1026,6 +1027,9 @@ class FakeVim(object):
         service_content.about = about_info
 
         self._service_content = service_content
+        # Property filters created through CreateFilter, by filter id
+        self._filters = {}
+        self._update_version = 0
 
     def get_service_content(self):
         return self._service_content
@@ -1093,7 +1097,8 @@ class FakeVim(object):
                   "mem": config_spec.memoryMB,
                   "extra_config": config_spec.extraConfig,
                   "virtual_device": config_spec.deviceChange,
-                  "instanceUuid": config_spec.instanceUuid}
+                  "instanceUuid": config_spec.instanceUuid,
+                  "res_pool": pool}
         virtual_machine = VirtualMachine(**vm_dict)
         _create_object("VirtualMachine", virtual_machine)
         res_pool = _get_object(pool)
@@ -1185,7 +1190,8 @@ class FakeVim(object):
          "mem": source_vm_mdo.get("summary.config.memorySizeMB"),
          "extra_config": source_vm_mdo.get("config.extraConfig").OptionValue,
          "virtual_device": source_vm_mdo.get("config.hardware.device"),
-         "instanceUuid": source_vm_mdo.get("summary.config.instanceUuid")}
+         "instanceUuid": source_vm_mdo.get("summary.config.instanceUuid"),
+         "res_pool": source_vm_mdo.get("resourcePool")}
 
         if clone_spec.config is not None:
             # Impose the config changes specified in the config property
@@ -1347,6 +1353,102 @@ class FakeVim(object):
                 continue
         return lst_ret_objs
 
+    def _create_filter(self, method, *args, **kwargs):
+        """Creates a property filter for update tracking."""
+        spec = kwargs.get("spec")
+        filter_ref = ManagedObjectReference("PropertyFilter",
+                                            "filter-%d" %
+                                            (len(self._filters) + 1))
+        self._filters[filter_ref.value] = {
+            'props': dict((prop_spec.type, prop_spec.pathSet)
+                          for prop_spec in spec.propSet),
+            'reported': {}}
+        return filter_ref
+
+    def _destroy_filter(self, method, *args, **kwargs):
+        """Destroys a property filter."""
+        self._filters.pop(args[0].value, None)
+
+    def _get_filter_updates(self, filter_ref, prop_filter):
+        """Diffs the db contents against what has been reported through
+        the filter so far and returns the ObjectUpdates.
+        """
+        current = {}
+        for type, properties in prop_filter['props'].iteritems():
+            for mdo in _db_content.get(type, {}).values():
+                props = dict((prop.name, prop.val) for prop in mdo.propSet
+                             if prop.name in properties)
+                current[(type, mdo.obj.value)] = (mdo.obj, props)
+
+        reported = prop_filter['reported']
+        object_updates = []
+        for key, (mor, props) in current.iteritems():
+            if key in reported:
+                kind = 'modify'
+                old_props = reported[key][1]
+            else:
+                kind = 'enter'
+                old_props = {}
+            changes = []
+            for name, val in props.iteritems():
+                if name not in old_props or old_props[name] != val:
+                    change = DataObject()
+                    change.name = name
+                    change.op = 'assign'
+                    change.val = val
+                    changes.append(change)
+            for name in set(old_props) - set(props):
+                change = DataObject()
+                change.name = name
+                change.op = 'remove'
+                changes.append(change)
+            if kind == 'enter' or changes:
+                object_update = DataObject()
+                object_update.kind = kind
+                object_update.obj = mor
+                object_update.changeSet = changes
+                object_updates.append(object_update)
+        for key in set(reported) - set(current):
+            object_update = DataObject()
+            object_update.kind = 'leave'
+            object_update.obj = reported[key][0]
+            object_updates.append(object_update)
+        prop_filter['reported'] = current
+
+        if object_updates:
+            filter_update = DataObject()
+            filter_update.filter = filter_ref
+            filter_update.objectSet = object_updates
+            return filter_update
+
+    def _wait_for_updates(self, method, *args, **kwargs):
+        """Returns the changes to the filtered properties since the
+        version given, or None if there are none.
+        """
+        version = kwargs.get("version") or ''
+        if version == '':
+            for prop_filter in self._filters.values():
+                prop_filter['reported'] = {}
+        elif version != str(self._update_version):
+            raise error_util.VimFaultException(
+                ['InvalidCollectorVersion'], 'Invalid collector version')
+
+        filter_updates = []
+        for filter_id, prop_filter in self._filters.iteritems():
+            filter_ref = ManagedObjectReference("PropertyFilter", filter_id)
+            filter_update = self._get_filter_updates(filter_ref, prop_filter)
+            if filter_update is not None:
+                filter_updates.append(filter_update)
+        if not filter_updates:
+            return None
+
+        self._update_version += 1
+        update_set = DataObject()
+        update_set.version = str(self._update_version)
+        update_set.filterSet = filter_updates
+        update_set.truncated = False
+        return update_set
+
     def _add_port_group(self, method, *args, **kwargs):
         """Adds a port group to the host system."""
         _host_sk = _db_content["HostSystem"].keys()[0]
@@ -1447,6 +1549,15 @@ class FakeVim(object):
         elif attr_name == "CancelRetrievePropertiesEx":
             return lambda *args, **kwargs: self._retrieve_properties_cancel(
                                                 attr_name, *args, **kwargs)
+        elif attr_name == "CreateFilter":
+            return lambda *args, **kwargs: self._create_filter(
+                                                attr_name, *args, **kwargs)
+        elif attr_name == "DestroyPropertyFilter":
+            return lambda *args, **kwargs: self._destroy_filter(
+                                                attr_name, *args, **kwargs)
+        elif attr_name == "WaitForUpdatesEx":
+            return lambda *args, **kwargs: self._wait_for_updates(
+                                                attr_name, *args, **kwargs)
         elif attr_name == "AcquireCloneTicket":
             return lambda *args, **kwargs: self._just_return()
         elif attr_name == "AddPortGroup":
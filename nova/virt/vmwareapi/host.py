@@ -102,11 +102,7 @@ class HostState(object):
         """Update the current state of the host.
         """
         host_mor = vm_util.get_host_ref(self._session)
-        summary = self._session._call_method(vim_util,
-                                             "get_dynamic_property",
-                                             host_mor,
-                                             "HostSystem",
-                                             "summary")
+        summary = vm_util.get_host_summary(self._session, host_mor)
 
         if summary is None:
             return
@@ -0,0 +1,190 @@
+# Copyright (c) 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Driver-wide cache of the vSphere inventory.
+
+Rather than paging through every VirtualMachine with RetrievePropertiesEx
+for each name lookup, instance listing or get_info call, the cache
+registers a single property filter on the inventory and then applies the
+incremental changes reported by WaitForUpdatesEx. An update with nothing
+to report is a single, small round trip.
+"""
+
+from eventlet import semaphore
+from oslo.config import cfg
+
+from nova.openstack.common.gettextutils import _
+from nova.openstack.common import log as logging
+from nova.virt.vmwareapi import vim_util
+
+inventory_opts = [
+    cfg.BoolOpt('use_inventory_cache',
+                default=False,
+                help='Keep a driver-wide cache of the VirtualMachine and '
+                     'HostSystem inventory, kept current through '
+                     'PropertyCollector update tracking, instead of '
+                     'querying the server for every VM lookup, instance '
+                     'listing and host stats update'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(inventory_opts, 'vmware')
+
+LOG = logging.getLogger(__name__)
+
+VM_PROPERTIES = ['name',
+                 'resourcePool',
+                 'runtime.connectionState',
+                 'runtime.powerState',
+                 'summary.config.instanceUuid',
+                 'summary.config.memorySizeMB',
+                 'summary.config.numCpu']
+HOST_PROPERTIES = ['summary']
+
+# The cache of the driver, registered by the driver when it is enabled.
+_INVENTORY_CACHE = None
+
+
+def get_cache(session):
+    """Return the inventory cache for session, if there is one."""
+    if _INVENTORY_CACHE is not None and _INVENTORY_CACHE.session is session:
+        return _INVENTORY_CACHE
+
+
+def set_cache(cache):
+    global _INVENTORY_CACHE
+    _INVENTORY_CACHE = cache
+
+
+def _mor_key(mor):
+    return (mor._type, mor.value)
+
+
+class InventoryCache(object):
+    """Cache of managed object properties kept current with
+    WaitForUpdatesEx.
+
+    Every accessor first applies the updates reported since the previous
+    call, so readers always see the state of the server as of that call.
+    If the incremental update fails (for instance because the session was
+    re-created and the filter lost) the cache resynchronizes from scratch.
+    """
+
+    def __init__(self, session, object_properties=None):
+        self.session = session
+        if object_properties is None:
+            object_properties = {'VirtualMachine': VM_PROPERTIES,
+                                 'HostSystem': HOST_PROPERTIES}
+        self._object_properties = object_properties
+        self._lock = semaphore.Semaphore()
+        self._filter = None
+        self._version = None
+        # (type, value) -> (managed object reference, {property: value})
+        self._objects = {}
+        # VM name -> (type, value)
+        self._vm_names = {}
+
+    def update(self):
+        """Apply the changes reported since the previous update."""
+        with self._lock:
+            if self._filter is None:
+                self._resync()
+                return
+            try:
+                self._wait_for_updates()
+            except Exception as excep:
+                LOG.warn(_("Incremental inventory update failed, "
+                           "resynchronizing: %s"), excep)
+                self._resync()
+
+    def _resync(self):
+        if self._filter is not None:
+            try:
+                self.session._call_method(vim_util, "destroy_filter",
+                                          self._filter)
+            except Exception as excep:
+                LOG.debug(_("Unable to destroy property filter: %s"), excep)
+        self._filter = None
+        self._objects = {}
+        self._vm_names = {}
+        self._filter = self.session._call_method(vim_util, "create_filter",
+                                                 self._object_properties)
+        self._version = ''
+        self._wait_for_updates()
+
+    def _wait_for_updates(self):
+        while True:
+            update_set = self.session._call_method(vim_util,
+                                                   "wait_for_updates_ex",
+                                                   self._version)
+            if not update_set:
+                return
+            for filter_update in update_set.filterSet:
+                for object_update in filter_update.objectSet:
+                    self._apply(object_update)
+            self._version = update_set.version
+            if not getattr(update_set, 'truncated', False):
+                return
+
+    def _apply(self, object_update):
+        key = _mor_key(object_update.obj)
+        old_name = self._get_name(key)
+        if object_update.kind == 'leave':
+            self._objects.pop(key, None)
+        else:
+            if object_update.kind == 'enter' or key not in self._objects:
+                self._objects[key] = (object_update.obj, {})
+            props = self._objects[key][1]
+            for change in getattr(object_update, 'changeSet', []):
+                if change.op in ('remove', 'indirectRemove'):
+                    props.pop(change.name, None)
+                else:
+                    props[change.name] = getattr(change, 'val', None)
+        if key[0] != 'VirtualMachine':
+            return
+        new_name = self._get_name(key)
+        if old_name != new_name:
+            if self._vm_names.get(old_name) == key:
+                del self._vm_names[old_name]
+            if new_name is not None:
+                self._vm_names[new_name] = key
+
+    def _get_name(self, key):
+        entry = self._objects.get(key)
+        if entry is not None:
+            return entry[1].get('name')
+
+    def get_vm_ref_from_name(self, vm_name):
+        """Return the reference of the VM named vm_name, or None."""
+        self.update()
+        key = self._vm_names.get(vm_name)
+        if key is not None:
+            return self._objects[key][0]
+
+    def get_properties(self, mor):
+        """Return a dict of the cached properties of mor, or None."""
+        self.update()
+        entry = self._objects.get(_mor_key(mor))
+        if entry is not None:
+            return dict(entry[1])
+
+    def get_objects(self, type):
+        """Return a list of (reference, properties) for every object of the
+        type specified.
+        """
+        self.update()
+        return [(mor, dict(props))
+                for (obj_type, _value), (mor, props)
+                in self._objects.iteritems() if obj_type == type]
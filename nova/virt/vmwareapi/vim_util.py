@@ -251,6 +251,45 @@ def continue_to_get_objects(vim, token):
             token=token)
 
 
+def create_filter(vim, object_properties):
+    """Creates a property filter covering the whole inventory.
+
+    object_properties maps a managed object type to the list of its
+    properties to track. Returns the reference of the new filter.
+    """
+    client_factory = vim.client.factory
+    object_spec = build_object_spec(client_factory,
+                        vim.get_service_content().rootFolder,
+                        [build_recursive_traversal_spec(client_factory)])
+    property_specs = [build_property_spec(client_factory, type=type,
+                                          properties_to_collect=properties)
+                      for type, properties in object_properties.iteritems()]
+    property_filter_spec = build_property_filter_spec(client_factory,
+                                property_specs, [object_spec])
+    return vim.CreateFilter(vim.get_service_content().propertyCollector,
+                            spec=property_filter_spec, partialUpdates=False)
+
+
+def destroy_filter(vim, filter_ref):
+    """Destroys a property filter."""
+    return vim.DestroyPropertyFilter(filter_ref)
+
+
+def wait_for_updates_ex(vim, version, max_wait=0):
+    """Gets the changes to the filtered properties since version.
+
+    An empty version gets the full state of every filtered object. With
+    the default max_wait of 0 the call does not block and returns None
+    when there is nothing to report.
+    """
+    client_factory = vim.client.factory
+    options = client_factory.create('ns0:WaitOptions')
+    options.maxWaitSeconds = max_wait
+    options.maxObjectUpdates = CONF.vmware.maximum_objects
+    return vim.WaitForUpdatesEx(vim.get_service_content().propertyCollector,
+                                version=version, options=options)
+
+
 def get_prop_spec(client_factory, spec_type, properties):
     """Builds the Property Spec Object."""
     prop_spec = client_factory.create('ns0:PropertySpec')
@@ -31,6 +31,7 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import units
 from nova import utils
 from nova.virt.vmwareapi import error_util
+from nova.virt.vmwareapi import inventory
 from nova.virt.vmwareapi import vim_util
 
 CONF = cfg.CONF
@@ -788,6 +789,9 @@ def _cancel_retrieve_if_necessary(session, results):
 
 def _get_vm_ref_from_name(session, vm_name):
     """Get reference to the VM with the name specified."""
+    cache = inventory.get_cache(session)
+    if cache is not None:
+        return cache.get_vm_ref_from_name(vm_name)
     vms = session._call_method(vim_util, "get_objects",
                 "VirtualMachine", ["name"])
     return _get_object_from_results(session, vms, vm_name,
@@ -808,6 +812,9 @@ def _get_vm_ref_from_uuid(session, instance_uuid):
     instance_uuid. It is far more optimal to use
     _get_vm_ref_from_vm_uuid.
     """
+    cache = inventory.get_cache(session)
+    if cache is not None:
+        return cache.get_vm_ref_from_name(instance_uuid)
     vms = session._call_method(vim_util, "get_objects",
                 "VirtualMachine", ["name"])
     return _get_object_from_results(session, vms, instance_uuid,
@@ -986,13 +993,8 @@ def get_stats_from_cluster(session, cluster):
         host_ret = prop_dict.get('host')
         if host_ret:
             host_mors = host_ret.ManagedObjectReference
-            result = session._call_method(vim_util,
-                         "get_properties_for_a_collection_of_objects",
-                         "HostSystem", host_mors,
-                         ["summary.hardware", "summary.runtime"])
-            for obj in result.objects:
-                hardware_summary = obj.propSet[0].val
-                runtime_summary = obj.propSet[1].val
+            for hardware_summary, runtime_summary in _get_host_summaries(
+                    session, host_mors):
                 if runtime_summary.connectionState == "connected":
                     # Total vcpus is the sum of all pCPUs of individual hosts
                     # The overcommitment ratio is factored in by the scheduler
@@ -1015,6 +1017,36 @@ def get_stats_from_cluster(session, cluster):
     return stats
 
 
+def _get_host_summaries(session, host_mors):
+    """Return (hardware summary, runtime summary) for each host."""
+    cache = inventory.get_cache(session)
+    if cache is not None:
+        summaries = []
+        for host_mor in host_mors:
+            props = cache.get_properties(host_mor)
+            if props and props.get('summary'):
+                summary = props['summary']
+                summaries.append((summary.hardware, summary.runtime))
+        return summaries
+
+    result = session._call_method(vim_util,
+                 "get_properties_for_a_collection_of_objects",
+                 "HostSystem", host_mors,
+                 ["summary.hardware", "summary.runtime"])
+    return [(obj.propSet[0].val, obj.propSet[1].val)
+            for obj in result.objects]
+
+
+def get_host_summary(session, host_mor):
+    """Get the summary of a host."""
+    cache = inventory.get_cache(session)
+    if cache is not None:
+        props = cache.get_properties(host_mor)
+        return props.get('summary') if props else None
+    return session._call_method(vim_util, "get_dynamic_property",
+                                host_mor, "HostSystem", "summary")
+
+
 def get_cluster_ref_from_name(session, cluster_name):
     """Get reference to the cluster with the name specified."""
     cls = session._call_method(vim_util, "get_objects",
@@ -46,6 +46,7 @@ from nova.virt import driver
 from nova.virt.vmwareapi import ds_util
 from nova.virt.vmwareapi import error_util
 from nova.virt.vmwareapi import imagecache
+from nova.virt.vmwareapi import inventory
 from nova.virt.vmwareapi import vif as vmwarevif
 from nova.virt.vmwareapi import vim
 from nova.virt.vmwareapi import vim_util
@@ -105,10 +106,14 @@ class VMwareVMOps(object):
     def list_instances(self):
         """Lists the VM instances that are registered with the ESX host."""
         LOG.debug(_("Getting list of instances"))
-        vms = self._session._call_method(vim_util, "get_objects",
-                     "VirtualMachine",
-                     ["name", "runtime.connectionState"])
-        lst_vm_names = self._get_valid_vms_from_retrieve_result(vms)
+        cache = inventory.get_cache(self._session)
+        if cache is not None:
+            lst_vm_names = self._get_valid_vms_from_cache(cache)
+        else:
+            vms = self._session._call_method(vim_util, "get_objects",
+                         "VirtualMachine",
+                         ["name", "runtime.connectionState"])
+            lst_vm_names = self._get_valid_vms_from_retrieve_result(vms)
 
         LOG.debug(_("Got total of %s instances") % str(len(lst_vm_names)))
         return lst_vm_names
@@ -1334,13 +1339,18 @@ class VMwareVMOps(object):
         lst_properties = ["summary.config.numCpu",
                     "summary.config.memorySizeMB",
                     "runtime.powerState"]
-        vm_props = self._session._call_method(vim_util,
-                    "get_object_properties", None, vm_ref, "VirtualMachine",
-                    lst_properties)
-        query = {'summary.config.numCpu': None,
-                 'summary.config.memorySizeMB': None,
-                 'runtime.powerState': None}
-        self._get_values_from_object_properties(vm_props, query)
+        query = dict.fromkeys(lst_properties)
+        cache = inventory.get_cache(self._session)
+        if cache is not None:
+            vm_props = cache.get_properties(vm_ref)
+            if vm_props is None:
+                raise exception.InstanceNotFound(instance_id=instance['uuid'])
+            query.update(vm_props)
+        else:
+            vm_props = self._session._call_method(vim_util,
+                        "get_object_properties", None, vm_ref,
+                        "VirtualMachine", lst_properties)
+            self._get_values_from_object_properties(vm_props, query)
         max_mem = int(query['summary.config.memorySizeMB']) * 1024
         return {'state': VMWARE_POWER_STATES[query['runtime.powerState']],
                 'max_mem': max_mem,
@@ -1594,6 +1604,23 @@ class VMwareVMOps(object):
                 break
         return lst_vm_names
 
+    def _get_valid_vms_from_cache(self, cache, res_pool=None):
+        """Returns list of valid vms from the inventory cache, optionally
+        only those in the resource pool specified.
+        """
+        lst_vm_names = []
+        for vm_ref, props in cache.get_objects('VirtualMachine'):
+            # Ignoring the orphaned or inaccessible VMs
+            if props.get('runtime.connectionState') in ["orphaned",
+                                                         "inaccessible"]:
+                continue
+            if res_pool is not None:
+                vm_pool = props.get('resourcePool')
+                if vm_pool is None or vm_pool.value != res_pool.value:
+                    continue
+            lst_vm_names.append(props.get('name'))
+        return lst_vm_names
+
 
 class VMwareVCVMOps(VMwareVMOps):
     """Management class for VM-related tasks.
@@ -1662,11 +1689,18 @@ class VMwareVCVMOps(VMwareVMOps):
         root_res_pool = self._session._call_method(
             vim_util, "get_dynamic_property", self._cluster,
             'ClusterComputeResource', 'resourcePool')
-        if root_res_pool:
-            vms = self._session._call_method(
-                vim_util, 'get_inner_objects', root_res_pool, 'vm',
-                'VirtualMachine', properties)
-        lst_vm_names = self._get_valid_vms_from_retrieve_result(vms)
+        cache = inventory.get_cache(self._session)
+        if cache is not None:
+            lst_vm_names = []
+            if root_res_pool:
+                lst_vm_names = self._get_valid_vms_from_cache(cache,
+                                                              root_res_pool)
+        else:
+            if root_res_pool:
+                vms = self._session._call_method(
+                    vim_util, 'get_inner_objects', root_res_pool, 'vm',
+                    'VirtualMachine', properties)
+            lst_vm_names = self._get_valid_vms_from_retrieve_result(vms)
 
         LOG.debug(_("Got total of %s instances") % str(len(lst_vm_names)))
         return lst_vm_names
@@ -179,6 +179,10 @@ def destroy_vdi(vdi_ref):
     for vbd_ref in vbd_refs[:]:
         destroy_vbd(vbd_ref)
 
+    sr_rec = _db_content['SR'].get(vdi_rec.get('SR'))
+    if sr_rec and vdi_ref in sr_rec.get('VDIs', []):
+        sr_rec['VDIs'].remove(vdi_ref)
+
     del _db_content['VDI'][vdi_ref]
 
 
@@ -204,7 +208,15 @@ def create_vdi(name_label, sr_ref, **kwargs):
 
 
 def after_VDI_create(vdi_ref, vdi_rec):
+    """Create read-only fields and backref from SR to VDI when VDI is
+    created.
+    """
     vdi_rec.setdefault('VBDs', [])
+    vdi_rec.setdefault('sm_config', {})
+
+    sr_rec = _db_content['SR'].get(vdi_rec.get('SR'))
+    if sr_rec is not None:
+        sr_rec.setdefault('VDIs', []).append(vdi_ref)
 
 
 def create_vbd(vm_ref, vdi_ref, userdevice=0):
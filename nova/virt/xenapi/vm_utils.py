@@ -792,7 +792,9 @@ def _snapshot_attached_here_impl(session, instance, vm_ref, label, userdevice,
                                original_parent_uuid)
 
         snapshot_uuid = _vdi_get_uuid(session, snapshot_ref)
-        chain = _walk_vdi_chain(session, snapshot_uuid)
+        _scan_sr(session, sr_ref)
+        inventory = SRInventory(session, sr_ref)
+        chain = _walk_vdi_chain(session, snapshot_uuid, inventory=inventory)
         vdi_uuids = [vdi_rec['uuid'] for vdi_rec in chain]
         yield vdi_uuids
     finally:
@@ -845,17 +847,21 @@ def destroy_cached_images(session, sr_ref, all_cached=False, dry_run=False):
     The default behavior of this function is to destroy only 'unused' cached
     images. To destroy all cached images, use the `all_cached=True` kwarg.
     """
-    cached_images = _find_cached_images(session, sr_ref)
+    # A single inventory of the SR serves every chain walk and sibling lookup
+    # below, instead of rescanning the SR per cached image.
+    inventory = SRInventory(session, sr_ref)
+    cached_images = _find_cached_images(session, sr_ref, inventory=inventory)
     destroyed = set()
 
     def destroy_cached_vdi(vdi_uuid, vdi_ref):
         LOG.debug(_("Destroying cached VDI '%(vdi_uuid)s'"))
         if not dry_run:
             destroy_vdi(session, vdi_ref)
+            inventory.forget(vdi_ref)
         destroyed.add(vdi_uuid)
 
     for vdi_ref in cached_images.values():
-        vdi_uuid = session.call_xenapi('VDI.get_uuid', vdi_ref)
+        vdi_uuid = inventory.get_rec(vdi_ref)['uuid']
 
         if all_cached:
             destroy_cached_vdi(vdi_uuid, vdi_ref)
@@ -866,13 +872,14 @@ def destroy_cached_images(session, sr_ref, all_cached=False, dry_run=False):
         # Chain length greater than two implies a VM must be holding a ref to
         # the base-copy (otherwise it would have coalesced), so consider this
         # cached image used.
-        chain = list(_walk_vdi_chain(session, vdi_uuid))
+        chain = list(_walk_vdi_chain(session, vdi_uuid, inventory=inventory))
         if len(chain) > 2:
             continue
         elif len(chain) == 2:
             # Siblings imply cached image is used
             root_vdi_rec = chain[-1]
-            children = _child_vhds(session, sr_ref, root_vdi_rec['uuid'])
+            children = _child_vhds(session, sr_ref, root_vdi_rec['uuid'],
+                                   inventory=inventory)
             if len(children) > 1:
                 continue
 
@@ -881,10 +888,12 @@ def destroy_cached_images(session, sr_ref, all_cached=False, dry_run=False):
     return destroyed
 
 
-def _find_cached_images(session, sr_ref):
+def _find_cached_images(session, sr_ref, inventory=None):
     """Return a dict(uuid=vdi_ref) representing all cached images."""
+    if inventory is None:
+        inventory = SRInventory(session, sr_ref)
     cached_images = {}
-    for vdi_ref, vdi_rec in _get_all_vdis_in_sr(session, sr_ref):
+    for vdi_ref, vdi_rec in inventory:
         try:
             image_id = vdi_rec['other_config']['image-id']
         except KeyError:
@@ -1993,13 +2002,74 @@ def _get_rrd(server, vm_uuid):
         return None
 
 
+class SRInventory(object):
+    """A point-in-time view of every VDI in an SR.
+
+    All the VDI records of the SR are fetched with a single
+    VDI.get_all_records_where call and indexed by uuid and by VHD parent,
+    so walking VHD chains and looking up children need no further XenAPI
+    round trips. An inventory is meant to live for a single operation;
+    call refresh() once the VHD tree may have changed (e.g. after an
+    SR scan).
+    """
+
+    def __init__(self, session, sr_ref):
+        self._session = session
+        self.sr_ref = sr_ref
+        self.refresh()
+
+    def refresh(self):
+        self._recs = self._session.call_xenapi(
+                "VDI.get_all_records_where", 'field "SR"="%s"' % self.sr_ref)
+        self._refs_by_uuid = {}
+        self._children = {}
+        for vdi_ref, vdi_rec in self._recs.iteritems():
+            self._index(vdi_ref, vdi_rec)
+
+    def _index(self, vdi_ref, vdi_rec):
+        vdi_uuid = vdi_rec['uuid']
+        self._refs_by_uuid[vdi_uuid] = vdi_ref
+        parent_uuid = vdi_rec['sm_config'].get('vhd-parent')
+        if parent_uuid:
+            self._children.setdefault(parent_uuid, set()).add(vdi_uuid)
+
+    def __iter__(self):
+        return self._recs.iteritems()
+
+    def __len__(self):
+        return len(self._recs)
+
+    def get_rec(self, vdi_ref):
+        """Return the record of vdi_ref, or None if it is not in the SR."""
+        return self._recs.get(vdi_ref)
+
+    def get_ref_by_uuid(self, vdi_uuid):
+        """Return the ref of vdi_uuid, or None if it is not in the SR."""
+        return self._refs_by_uuid.get(vdi_uuid)
+
+    def get_rec_by_uuid(self, vdi_uuid):
+        return self._recs.get(self._refs_by_uuid.get(vdi_uuid))
+
+    def child_uuids(self, vdi_uuid):
+        """Return the uuids of the immediate children of a VHD."""
+        return set(self._children.get(vdi_uuid, ()))
+
+    def forget(self, vdi_ref):
+        """Drop a VDI that was destroyed during the operation."""
+        vdi_rec = self._recs.pop(vdi_ref, None)
+        if vdi_rec is None:
+            return
+        vdi_uuid = vdi_rec['uuid']
+        self._refs_by_uuid.pop(vdi_uuid, None)
+        self._children.pop(vdi_uuid, None)
+        parent_uuid = vdi_rec['sm_config'].get('vhd-parent')
+        if parent_uuid in self._children:
+            self._children[parent_uuid].discard(vdi_uuid)
+
+
 def _get_all_vdis_in_sr(session, sr_ref):
-    for vdi_ref in session.call_xenapi('SR.get_VDIs', sr_ref):
-        vdi_rec = session.get_rec('VDI', vdi_ref)
-        # Check to make sure the record still exists. It may have
-        # been deleted between the get_all call and get_rec call
-        if vdi_rec:
-            yield vdi_ref, vdi_rec
+    for vdi_ref, vdi_rec in SRInventory(session, sr_ref):
+        yield vdi_ref, vdi_rec
 
 
 def get_instance_vdis_for_sr(session, vm_ref, sr_ref):
@@ -2027,12 +2097,23 @@ def _get_vhd_parent_uuid(session, vdi_ref, vdi_rec=None):
     return parent_uuid
 
 
-def _walk_vdi_chain(session, vdi_uuid):
-    """Yield vdi_recs for each element in a VDI chain."""
-    scan_default_sr(session)
+def _walk_vdi_chain(session, vdi_uuid, inventory=None):
+    """Yield vdi_recs for each element in a VDI chain.
+
+    VDIs found in the SRInventory given, if any, need no XenAPI calls.
+    Any other is looked up in turn, in whatever SR it is.
+    """
+    if inventory is None:
+        scan_default_sr(session)
     while True:
-        vdi_ref = session.call_xenapi("VDI.get_by_uuid", vdi_uuid)
-        vdi_rec = session.call_xenapi("VDI.get_record", vdi_ref)
+        vdi_ref = None
+        vdi_rec = None
+        if inventory is not None:
+            vdi_ref = inventory.get_ref_by_uuid(vdi_uuid)
+            vdi_rec = inventory.get_rec(vdi_ref)
+        if vdi_rec is None:
+            vdi_ref = session.call_xenapi("VDI.get_by_uuid", vdi_uuid)
+            vdi_rec = session.call_xenapi("VDI.get_record", vdi_ref)
         yield vdi_rec
 
         parent_uuid = _get_vhd_parent_uuid(session, vdi_ref, vdi_rec)
@@ -2042,24 +2123,15 @@ def _walk_vdi_chain(session, vdi_uuid):
         vdi_uuid = parent_uuid
 
 
-def _child_vhds(session, sr_ref, vdi_uuid):
+def _child_vhds(session, sr_ref, vdi_uuid, inventory=None):
     """Return the immediate children of a given VHD.
 
     This is not recursive, only the immediate children are returned.
     """
-    children = set()
-    for ref, rec in _get_all_vdis_in_sr(session, sr_ref):
-        rec_uuid = rec['uuid']
-
-        if rec_uuid == vdi_uuid:
-            continue
-
-        parent_uuid = _get_vhd_parent_uuid(session, ref, rec)
-        if parent_uuid != vdi_uuid:
-            continue
-
-        children.add(rec_uuid)
-
+    if inventory is None:
+        inventory = SRInventory(session, sr_ref)
+    children = inventory.child_uuids(vdi_uuid)
+    children.discard(vdi_uuid)
     return children
 
 
@@ -2069,14 +2141,10 @@ def _another_child_vhd(session, vdi_ref, sr_ref, original_parent_uuid):
     vdi_rec = session.call_xenapi('VDI.get_record', vdi_ref)
     vdi_uuid = vdi_rec['uuid']
     parent_vdi_uuid = _get_vhd_parent_uuid(session, vdi_ref, vdi_rec)
-    for _ref, rec in _get_all_vdis_in_sr(session, sr_ref):
-        if ((rec['uuid'] != vdi_uuid) and
-            (rec['uuid'] != parent_vdi_uuid) and
-            (rec['sm_config'].get('vhd-parent') == original_parent_uuid)):
-            # Found another vhd which too parents to original parent.
-            return True
-    # Found no other vdi with the same parent.
-    return False
+    siblings = _child_vhds(session, sr_ref, original_parent_uuid)
+    siblings.difference_update([vdi_uuid, parent_vdi_uuid])
+    # If any vhd is left, it too parents to original parent.
+    return bool(siblings)
 
 
 def _wait_for_vhd_coalesce(session, instance, sr_ref, vdi_ref,
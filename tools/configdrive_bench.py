@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare building config drives with the external tools and in process.
+
+Builds drives of a synthetic set of files shaped like the output of
+InstanceMetadata.metadata_for_config_drive() (every metadata version, a
+user_data blob and some injected files), with config_drive_inprocess off
+and on. The vfat format with the external tools needs root for the loop
+mount, so it is only timed when running as root.
+
+Run like:
+
+    ./tools/configdrive_bench.py [<iterations> [<user data bytes>]]
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from nova.openstack.common import jsonutils
+from nova.virt import configdrive
+
+CONF = cfg.CONF
+
+VERSIONS = ['2012-08-10', '2013-04-04', '2013-10-17', 'latest']
+EC2_VERSIONS = ['1.0', '2007-01-19', '2007-03-01', '2007-08-29',
+                '2007-10-10', '2007-12-15', '2008-02-01', '2008-09-01',
+                '2009-04-04', 'latest']
+
+
+def make_files(user_data_size):
+    meta_data = jsonutils.dumps({
+        'uuid': '00000000-0000-0000-0000-000000000000',
+        'hostname': 'bench', 'name': 'bench',
+        'availability_zone': 'nova', 'launch_index': 0,
+        'meta': dict(('key%d' % i, 'value%d' % i) for i in range(20)),
+        'public_keys': {'bench': 'ssh-rsa ' + 'A' * 372 + ' bench'},
+        'files': [{'path': '/etc/file%d' % i,
+                   'content_path': '/content/%04d' % i}
+                  for i in range(5)]})
+    user_data = 'x' * user_data_size
+    files = []
+    for version in EC2_VERSIONS:
+        files.append(('ec2/%s/meta-data.json' % version, meta_data))
+        files.append(('ec2/%s/user-data' % version, user_data))
+    for version in VERSIONS:
+        files.append(('openstack/%s/meta_data.json' % version, meta_data))
+        files.append(('openstack/%s/user_data' % version, user_data))
+        files.append(('openstack/%s/vendor_data.json' % version, '{}'))
+    for i in range(5):
+        files.append(('openstack/content/%04d' % i, 'content %d\n' % i * 50))
+    return files
+
+
+def build(files, fmt, inprocess):
+    CONF.set_override('config_drive_format', fmt)
+    CONF.set_override('config_drive_inprocess', inprocess)
+    fd, path = tempfile.mkstemp(prefix='cd_bench_')
+    os.close(fd)
+    try:
+        with configdrive.ConfigDriveBuilder() as cdb:
+            for name, data in files:
+                cdb._add_file(name, data)
+            cdb.make_drive(path)
+    finally:
+        os.unlink(path)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    user_data_size = int(sys.argv[2]) if len(sys.argv) > 2 else 16384
+    CONF([], project='nova')
+    files = make_files(user_data_size)
+    for fmt in ('iso9660', 'vfat'):
+        for inprocess in (False, True):
+            if fmt == 'vfat' and not inprocess and os.getuid() != 0:
+                print('%-8s %-10s skipped, needs root' % (fmt, 'external'))
+                continue
+            start = time.time()
+            for _i in range(iterations):
+                build(files, fmt, inprocess)
+            elapsed = (time.time() - start) / iterations
+            print('%-8s %-10s %8.2f ms' %
+                  (fmt, 'in-process' if inprocess else 'external',
+                   elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Compare the cost of listing instances with flattened and compact flavor
+information in system_metadata.
+
+For each form this builds the system_metadata rows an instance list joins
+in, then times turning them into dicts and extracting the current flavor
+of every instance, as the API does when building a server list.
+
+Run like:
+
+    ./tools/db/flavor_info_bench.py [<instances> [<flavors>]]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from oslo.config import cfg
+
+from nova.compute import flavors
+from nova import utils
+
+CONF = cfg.CONF
+
+
+def make_flavor(i):
+    return {'id': i, 'name': 'm1.bench%d' % i, 'memory_mb': 512 * (i + 1),
+            'vcpus': i + 1, 'root_gb': 10 * (i + 1), 'ephemeral_gb': 0,
+            'flavorid': str(i), 'swap': 0, 'rxtx_factor': 1.0,
+            'vcpu_weight': None, 'extra_specs': {}}
+
+
+def make_instances(count, flavor_count, compact):
+    CONF.set_override('compact_flavor_info', compact)
+    instances = []
+    for i in range(count):
+        sys_meta = {'image_base_image_ref': 'fake-image',
+                    'image_min_disk': '1'}
+        flavors.save_flavor_info(sys_meta, make_flavor(i % flavor_count))
+        instances.append({'system_metadata': [
+            {'key': k, 'value': v}
+            for k, v in sys_meta.items()]})
+    return instances
+
+
+def list_instances(instances):
+    start = time.time()
+    for instance in instances:
+        instance['system_metadata'] = utils.instance_sys_meta(instance)
+        flavors.extract_flavor(instance)
+    return time.time() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    flavor_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    CONF([], project='nova')
+    for compact in (False, True):
+        instances = make_instances(count, flavor_count, compact)
+        rows = sum(len(i['system_metadata']) for i in instances)
+        elapsed = list_instances(instances)
+        print('%-9s %8d rows %8.2f ms' %
+              ('compact' if compact else 'flattened', rows, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# Copyright 2014 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Microbenchmark of NovaObject serialization.
+
+Times obj_to_primitive() and obj_from_primitive() of an Instance (with
+system_metadata, info_cache and security_groups) and of an InstanceList,
+using both the per-class compiled codecs and the generic field-by-field
+implementation they replaced, and checks both produce the same primitives.
+
+Run like:
+
+    ./tools/object_serializer_bench.py [<iterations> [<list length>]]
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+
+from nova.network import model as network_model
+from nova.objects import base
+from nova.objects import instance as instance_obj
+from nova.objects import instance_info_cache
+from nova.objects import security_group
+from nova.openstack.common import timeutils
+
+
+def generic_to_primitive(self, target_version=None):
+    primitive = dict()
+    for name, field in self.fields.items():
+        if self.obj_attr_is_set(name):
+            primitive[name] = field.to_primitive(self, name,
+                                                 getattr(self, name))
+    if target_version:
+        self.obj_make_compatible(primitive, target_version)
+    obj = {'nova_object.name': self.obj_name(),
+           'nova_object.namespace': 'nova',
+           'nova_object.version': target_version or self.VERSION,
+           'nova_object.data': primitive}
+    if self.obj_what_changed():
+        obj['nova_object.changes'] = list(self.obj_what_changed())
+    return obj
+
+
+def generic_from_primitive(cls, context, objver, primitive):
+    self = cls()
+    self._context = context
+    self.VERSION = objver
+    objdata = primitive['nova_object.data']
+    changes = primitive.get('nova_object.changes', [])
+    for name, field in self.fields.items():
+        if name in objdata:
+            setattr(self, name, field.from_primitive(self, name,
+                                                     objdata[name]))
+    self._changed_fields = set([x for x in changes if x in self.fields])
+    return self
+
+
+def make_instance(i):
+    uuid = '00000000-0000-0000-0000-%012d' % i
+    inst = instance_obj.Instance()
+    inst.id = i
+    inst.uuid = uuid
+    inst.user_id = 'fake-user'
+    inst.project_id = 'fake-project'
+    inst.host = 'fake-host'
+    inst.node = 'fake-node'
+    inst.vm_state = 'active'
+    inst.power_state = 1
+    inst.memory_mb = 512
+    inst.vcpus = 1
+    inst.root_gb = 10
+    inst.display_name = 'server-%d' % i
+    inst.created_at = timeutils.utcnow()
+    inst.launched_at = timeutils.utcnow()
+    inst.deleted = False
+    inst.metadata = {'role': 'bench'}
+    inst.system_metadata = dict(('key%d' % x, 'value%d' % x)
+                                for x in range(30))
+    inst.info_cache = instance_info_cache.InstanceInfoCache(
+        instance_uuid=uuid, network_info=network_model.NetworkInfo())
+    inst.security_groups = security_group.SecurityGroupList(objects=[
+        security_group.SecurityGroup(id=1, name='default',
+                                     description='default',
+                                     user_id='fake-user',
+                                     project_id='fake-project')])
+    inst.obj_reset_changes()
+    return inst
+
+
+def timeit(fn, iterations):
+    start = time.time()
+    for _i in range(iterations):
+        fn()
+    return (time.time() - start) / iterations * 1000
+
+
+def bench(name, obj, iterations):
+    results = []
+    for generic in (True, False):
+        if generic:
+            base.NovaObject.obj_to_primitive = generic_to_primitive
+            base.NovaObject._obj_from_primitive = classmethod(
+                generic_from_primitive)
+        try:
+            primitive = obj.obj_to_primitive()
+            to_ms = timeit(obj.obj_to_primitive, iterations)
+            from_ms = timeit(
+                lambda: base.NovaObject.obj_from_primitive(primitive),
+                iterations)
+        finally:
+            base.NovaObject.obj_to_primitive = fast_to_primitive
+            base.NovaObject._obj_from_primitive = fast_from_primitive
+        results.append(primitive)
+        print('%-14s %-8s to_primitive %8.3f ms  from_primitive %8.3f ms' %
+              (name, 'generic' if generic else 'compiled', to_ms, from_ms))
+    if results[0] != results[1]:
+        print('%s: primitives differ!' % name)
+        sys.exit(1)
+
+
+fast_to_primitive = base.NovaObject.__dict__['obj_to_primitive']
+fast_from_primitive = base.NovaObject.__dict__['_obj_from_primitive']
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    length = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    bench('Instance', make_instance(0), iterations)
+    inst_list = instance_obj.InstanceList(
+        objects=[make_instance(i) for i in range(length)])
+    inst_list.obj_reset_changes()
+    bench('InstanceList', inst_list, max(1, iterations // length))
+
+
+if __name__ == '__main__':
+    main()